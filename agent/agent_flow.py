@@ -1,24 +1,130 @@
-from utils.supply_chain_agent import SupplyChainAgent
-from agent.general_agent import general_agent
-from agent.knowledge_agent import knowledge_agent
-from agent.intent_agent import router_agent
+import os
+import asyncio
+from loguru import logger
+
+from utils.agent_pool import get_agent_pool
+from utils.stage_timing import timed_stage
+from utils.event_loop import run_coroutine
+from agent.general_agent import general_agent, ageneral_agent
+from agent.intent_agent import router_agent, arouter_agent
+from agent.local_router import get_local_router, CONFIDENCE_THRESHOLD
+
+# Start the inventory agent and knowledge retrieval while the remote router classifies
+SPECULATIVE_ROUTING = os.environ.get("SPECULATIVE_ROUTING", "0") == "1"
 
 def handle_router(intent:str, question:str, chat_history:list = None, supply_chain_agent=None, thread_id=None):
     print(f"Intent on handle_router: {intent}")
     if 'inventory_question' in intent:
         if supply_chain_agent is None:
-            agent = SupplyChainAgent()
-            response = agent.process_query(question)
+            # Lease a worker of the shared pool instead of building an agent per call
+            with get_agent_pool().lease(thread_id or "default") as agent:
+                response = agent.process_query(question, thread_id=thread_id or "default")
         else:
             response = supply_chain_agent.process_query(question, thread_id=thread_id)
         return response
     elif 'general_question' in intent:
         return general_agent(question)
     elif 'knowledge_question' in intent:
+        # Imported on first use: builds the document index and needs GOOGLE_API_KEY
+        from agent.knowledge_agent import knowledge_agent
         return knowledge_agent(question, chat_history=[])
     else:
         return "Sorry, I couldn't understand your question. Please try again with a different query." 
 
+async def ahandle_router(intent:str, question:str, chat_history:list = None, supply_chain_agent=None, thread_id=None):
+    if 'inventory_question' in intent:
+        if supply_chain_agent is None:
+            async with get_agent_pool().alease(thread_id or "default") as agent:
+                return await agent.aprocess_query(question, thread_id=thread_id or "default")
+        return await supply_chain_agent.aprocess_query(question, thread_id=thread_id or "default")
+    elif 'general_question' in intent:
+        return await ageneral_agent(question)
+    elif 'knowledge_question' in intent:
+        from agent.knowledge_agent import knowledge_agent
+        # The RAG chain is synchronous, run it off the event loop
+        return await asyncio.to_thread(knowledge_agent, question, chat_history=[])
+    else:
+        return "Sorry, I couldn't understand your question. Please try again with a different query." 
+
+async def _prefetch_knowledge_context(question: str) -> str:
+    from agent.knowledge_agent import retrieve_context
+    return await asyncio.to_thread(retrieve_context, question)
+
+async def _discard(task: asyncio.Task):
+    """Cancel a speculative branch and wait until it has stopped"""
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+async def aspeculative_handle_router(question:str, supply_chain_agent=None, thread_id=None, router=arouter_agent):
+    """
+    Route and answer with the branches started before the intent is known
+
+    When the local router is confident this is plain ahandle_router. Otherwise the remote
+    router, the inventory agent (on the real thread) and knowledge retrieval start together;
+    once the intent arrives the branches it does not need are cancelled, and the thread's
+    messages are restored if the inventory agent's turn is discarded. Latency approaches the
+    slowest needed branch instead of router + answer.
+
+    Args:
+        question: User question
+        supply_chain_agent: Agent for inventory questions (leased from the agent pool if None)
+        thread_id: Conversation thread of the supply chain agent
+        router: Async intent classifier (arouter_agent; replaceable for benchmarks)
+
+    Returns:
+        (intent, response) with the response as returned by ahandle_router
+    """
+    with timed_stage("routing"):
+        intent, confidence = get_local_router().classify(question)
+    if confidence >= CONFIDENCE_THRESHOLD:
+        return intent, await ahandle_router(intent, question, supply_chain_agent=supply_chain_agent, thread_id=thread_id)
+
+    thread_id = thread_id or "default"
+    if supply_chain_agent is None:
+        async with get_agent_pool().alease(thread_id) as agent:
+            return await _aspeculative_branches(question, agent, thread_id, router)
+    return await _aspeculative_branches(question, supply_chain_agent, thread_id, router)
+
+async def _aspeculative_branches(question:str, supply_chain_agent, thread_id:str, router):
+    """The router, the inventory agent and knowledge retrieval run together (see aspeculative_handle_router)"""
+    previous_messages = await supply_chain_agent.athread_messages(thread_id)
+
+    inventory_task = asyncio.create_task(supply_chain_agent.aprocess_query(question, thread_id=thread_id))
+    knowledge_task = asyncio.create_task(_prefetch_knowledge_context(question))
+    try:
+        with timed_stage("routing"):
+            intent = await router(question)
+    except BaseException:
+        await _discard(knowledge_task)
+        await _discard(inventory_task)
+        await supply_chain_agent.arestore_thread(thread_id, previous_messages)
+        raise
+
+    if 'inventory_question' in intent:
+        await _discard(knowledge_task)
+        logger.info("Speculative routing: inventory_question, kept the agent run")
+        return intent, await inventory_task
+
+    await _discard(inventory_task)
+    await supply_chain_agent.arestore_thread(thread_id, previous_messages)
+    if 'knowledge_question' in intent:
+        try:
+            context = await knowledge_task
+        except Exception as e:
+            logger.warning(f"Knowledge prefetch failed, retrieving again: {e}")
+            context = None
+        logger.info("Speculative routing: knowledge_question, cancelled the agent run")
+        from agent.knowledge_agent import knowledge_agent
+        return intent, await asyncio.to_thread(knowledge_agent, question, chat_history=[], context=context)
+
+    await _discard(knowledge_task)
+    logger.info(f"Speculative routing: {intent}, cancelled the agent run and knowledge retrieval")
+    return intent, await ahandle_router(intent, question, supply_chain_agent=supply_chain_agent, thread_id=thread_id)
+
+def speculative_handle_router(question:str, supply_chain_agent=None, thread_id=None):
+    """Sync aspeculative_handle_router for callers without an event loop (runs on the shared background loop)"""
+    return run_coroutine(aspeculative_handle_router(question, supply_chain_agent=supply_chain_agent, thread_id=thread_id))
+
 if __name__ == "__main__":
 
     question = "what is Butyl"
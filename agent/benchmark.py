@@ -0,0 +1,457 @@
+"""
+Agent Benchmark
+
+Runs a question corpus through routing and handle_router ->
+SupplyChainAgent.process_query with a configurable number of concurrent
+requests, against local stand-ins:
+- a SQLite copy of the warehouse CSVs in utils/data (or --database URL)
+- the replay chat model from utils/fake_llm.py, scripted from the corpus and/or
+  fixtures recorded with LLM_FAKE_MODE=record, with injected latency
+- routing uses the local intent router; questions it is unsure about take the
+  corpus label after --router-latency instead of calling the remote n8n router
+
+Reports p50/p95/p99 latency per stage (routing, agent LLM, SQL generation, SQL
+execution, charting, each tool, total), throughput, error rate and coalesced
+requests as JSON, so runs can be compared. Knowledge/general questions are only routed: their agents
+are remote services without a local stand-in.
+
+    python -m agent.benchmark --concurrency 8 --repeat 3 --output bench.json
+    INTENT_CONFIDENCE_THRESHOLD=1.1 python -m agent.benchmark --speculative
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from loguru import logger
+
+from utils.database import QueryCapturingSQLDatabase, dispose_async_engines
+from utils.fake_llm import FixtureStore, replay_factory
+from utils.llm_pool import LLMClientPool, LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE
+from utils.stage_timing import capture_stages, timed_stage
+from utils.supply_chain_agent import SupplyChainAgent
+from agent.agent_flow import handle_router, ahandle_router, aspeculative_handle_router
+from agent.local_router import get_local_router, CONFIDENCE_THRESHOLD
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils", "data")
+PERCENTILES = (50, 95, 99)
+
+# Recorded stage names -> reported names
+STAGE_ALIASES = {
+    "llm:supply_chain_agent": "agent_llm",
+    "llm:sql_agent": "sql_generation",
+}
+CHART_TOOLS = ("create_bar_chart", "create_line_chart", "create_scatter_plot", "create_histogram",
+               "plot_monthly_transaction_trends")
+
+# Each inventory case scripts the agent model: a list of tool calls per step, then the answer.
+# Questions answered by canned queries need no script; "sql_agent" scripts the nested SQL agent.
+DEFAULT_CORPUS = [
+    {"question": "What are the top 5 materials by outbound volume?", "intent": "inventory_question"},
+    {"question": "Plot monthly transaction trends for singapore", "intent": "inventory_question"},
+    {"question": "Show transport cost by mode of transport", "intent": "inventory_question"},
+    {
+        "question": "Which materials have the lowest days of supply?",
+        "intent": "inventory_question",
+        "agent": [[["get_inventory_coverage", {"limit": 10}]],
+                  "These materials have the lowest days of supply at the current outbound rate."],
+    },
+    {
+        "question": "Show me materials with low stock levels in SINGAPORE-WAREHOUSE",
+        "intent": "inventory_question",
+        "agent": [[["find_low_stock_materials", {"plant_name": "SINGAPORE-WAREHOUSE"}]],
+                  "These Singapore materials are below the low stock threshold."],
+    },
+    {
+        "question": "How much could we save by switching transport mode per plant?",
+        "intent": "inventory_question",
+        "agent": [[["compare_transport_costs", {"group_by": "plant"}]],
+                  "Switching modes changes the transfer cost per plant as shown."],
+    },
+    {
+        "question": "Give me the ABC XYZ classification of materials in CHINA-WAREHOUSE",
+        "intent": "inventory_question",
+        "agent": [[["get_abc_xyz_classification", {"plant_name": "CHINA-WAREHOUSE"}]],
+                  "Here is the ABC/XYZ classification for CHINA-WAREHOUSE."],
+    },
+    {
+        "question": "What date is the last outbound sale on material MAT-0354?",
+        "intent": "inventory_question",
+        "agent": [[["analyze_supply_chain_data", {"query": "last outbound date of MAT-0354"}]],
+                  "The last outbound sale of MAT-0354 is shown above."],
+        "sql_agent": {
+            "input": "last outbound date of MAT-0354",
+            "sql": "SELECT MAX(outbound_date) AS last_outbound_date FROM outbound WHERE material_name = 'MAT-0354'",
+            "answer": "The last outbound sale of MAT-0354 was on the date returned.",
+        },
+    },
+    {
+        "question": "Which customers received the most MAT-0013 shipments from CHINA-WAREHOUSE?",
+        "intent": "inventory_question",
+        "agent": [[["analyze_supply_chain_data", {"query": "customers by MAT-0013 outbound volume at CHINA-WAREHOUSE"}]],
+                  "These customers received the most MAT-0013 from CHINA-WAREHOUSE."],
+        "sql_agent": {
+            "input": "customers by MAT-0013 outbound volume at CHINA-WAREHOUSE",
+            "sql": "SELECT customer_number, SUM(net_quantity_mt) AS total_mt FROM outbound "
+                   "WHERE material_name = 'MAT-0013' AND plant_name = 'CHINA-WAREHOUSE' "
+                   "GROUP BY customer_number ORDER BY total_mt DESC LIMIT 10",
+            "answer": "The top customers for MAT-0013 are listed with their volumes.",
+        },
+    },
+    {
+        "question": "Create a bar chart of outbound shipments by mode of transport",
+        "intent": "inventory_question",
+        "agent": [[["create_bar_chart", {
+                      "data_query": "SELECT mode_of_transport, COUNT(*) AS shipments FROM outbound GROUP BY mode_of_transport",
+                      "x_column": "mode_of_transport", "y_column": "shipments",
+                      "title": "Outbound shipments by mode of transport"}]],
+                  "The bar chart compares outbound shipments by mode of transport."],
+    },
+    {"question": "What is Butyl?", "intent": "knowledge_question"},
+    {"question": "Hello, what can you do?", "intent": "general_question"},
+]
+
+
+def build_local_database(path: str) -> str:
+    """
+    SQLite copy of the warehouse tables, loaded from the CSVs in utils/data
+
+    Returns:
+        SQLAlchemy URL of the database
+    """
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    for table, filename in [("inbound", "Inbound.csv"), ("outbound", "Outbound.csv"),
+                            ("inventory", "Inventory.csv"), ("material_master", "MaterialMaster.csv")]:
+        df = pd.read_csv(os.path.join(DATA_DIR, filename), encoding="utf-8-sig")
+        df.columns = [column.lower() for column in df.columns]
+        df.to_sql(table, engine, if_exists="replace", index=False)
+
+    costs = pd.read_csv(os.path.join(DATA_DIR, "OperationCost.csv"), encoding="utf-8-sig")
+    storage = costs["Operation"].str.startswith("Inventory Storage")
+    pd.DataFrame({
+        "operation_category": np.where(storage, "Storage", "Transfer"),
+        "cost_type": costs["Operation"],
+        "entity_name": costs["Plant/Mode of Transport"],
+        "entity_type": np.where(storage, "Plant", "Mode of Transport"),
+        "cost_amount": costs["Cost"],
+        "cost_unit": np.where(storage, "MT/day", "container"),
+        "container_capacity_mt": np.where(storage, None, 24.75),
+        "currency": costs["Currency"],
+    }).to_sql("operation_costs", engine, if_exists="replace", index=False)
+    engine.dispose()
+    logger.info(f"Local benchmark database built at {path}")
+    return url
+
+
+def load_corpus(path: Optional[str]) -> List[Dict[str, Any]]:
+    """Benchmark cases from a JSON lines file (same fields as DEFAULT_CORPUS), or the default corpus"""
+    if not path:
+        return DEFAULT_CORPUS
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _script(steps: List[Any], prefix: str) -> List[AIMessage]:
+    messages = []
+    for step_number, step in enumerate(steps):
+        if isinstance(step, str):
+            messages.append(AIMessage(content=step))
+        else:
+            messages.append(AIMessage(content="", tool_calls=[
+                {"name": name, "args": args, "id": f"{prefix}-{step_number}-{index}"}
+                for index, (name, args) in enumerate(step)
+            ]))
+    return messages
+
+
+def add_corpus_fixtures(store: FixtureStore, corpus: List[Dict[str, Any]]):
+    """Register the scripted model responses of the corpus"""
+    for number, case in enumerate(corpus):
+        if case.get("agent"):
+            store.add(case["question"], _script(case["agent"], f"case{number}"), caller="supply_chain_agent")
+        sql_agent = case.get("sql_agent")
+        if sql_agent:
+            steps = [[["sql_db_query", {"query": sql_agent["sql"]}]], sql_agent["answer"]]
+            # The SQL agent prompt has one AI message after the question ("I should look at the tables...")
+            store.add(sql_agent["input"], _script(steps, f"case{number}-sql"), caller="sql_agent", start_step=1)
+
+
+def _is_confident(question: str) -> bool:
+    return get_local_router().classify(question)[1] >= CONFIDENCE_THRESHOLD
+
+
+def route(question: str, expected: Optional[str], router_latency: float = 0.0) -> Dict[str, Any]:
+    """Local router decision; the corpus label stands in for the remote router below the threshold"""
+    intent, confidence = get_local_router().classify(question)
+    if confidence >= CONFIDENCE_THRESHOLD or not expected:
+        return {"intent": intent, "source": "local"}
+    time.sleep(router_latency)
+    return {"intent": expected, "source": "remote_stand_in"}
+
+
+async def aroute(question: str, expected: Optional[str], router_latency: float = 0.0) -> Dict[str, Any]:
+    """Async route"""
+    intent, confidence = get_local_router().classify(question)
+    if confidence >= CONFIDENCE_THRESHOLD or not expected:
+        return {"intent": intent, "source": "local"}
+    await asyncio.sleep(router_latency)
+    return {"intent": expected, "source": "remote_stand_in"}
+
+
+def _response_error(response: Any) -> Optional[str]:
+    if isinstance(response, dict) and response.get("type") == "error":
+        return str(response.get("content"))[:200]
+    return None
+
+
+def _result(case: Dict[str, Any], routing: Dict[str, Any], timings, start_time: float, error: Optional[str]) -> Dict[str, Any]:
+    return {
+        "question": case["question"],
+        "intent": routing["intent"],
+        "routing_source": routing["source"],
+        "routed_correctly": not case.get("intent") or routing["intent"] == case["intent"],
+        "dispatched": routing["intent"] == "inventory_question",
+        "seconds": time.perf_counter() - start_time,
+        "stages": timings.totals(),
+        "error": error,
+    }
+
+
+def run_case(agent: SupplyChainAgent, case: Dict[str, Any], thread_id: str, router_latency: float = 0.0) -> Dict[str, Any]:
+    """One request: route, then answer inventory questions through handle_router"""
+    start_time = time.perf_counter()
+    error = None
+    with capture_stages() as timings:
+        with timed_stage("routing"):
+            routing = route(case["question"], case.get("intent"), router_latency)
+        if routing["intent"] == "inventory_question":
+            try:
+                error = _response_error(
+                    handle_router(routing["intent"], case["question"], supply_chain_agent=agent, thread_id=thread_id)
+                )
+            except Exception as e:
+                error = str(e)[:200]
+    return _result(case, routing, timings, start_time, error)
+
+
+async def arun_case(
+    agent: SupplyChainAgent,
+    case: Dict[str, Any],
+    thread_id: str,
+    router_latency: float = 0.0,
+    speculative: bool = False
+) -> Dict[str, Any]:
+    """Async run_case through ahandle_router, or aspeculative_handle_router for inventory cases"""
+    start_time = time.perf_counter()
+    error = None
+    with capture_stages() as timings:
+        if speculative and case.get("intent") == "inventory_question":
+            async def _remote_stand_in(question: str) -> str:
+                await asyncio.sleep(router_latency)
+                return case["intent"]
+
+            routing = {"intent": case["intent"], "source": "local" if _is_confident(case["question"]) else "remote_stand_in"}
+            try:
+                intent, response = await aspeculative_handle_router(
+                    case["question"], supply_chain_agent=agent, thread_id=thread_id, router=_remote_stand_in
+                )
+                routing["intent"] = intent
+                error = _response_error(response)
+            except Exception as e:
+                error = str(e)[:200]
+            return _result(case, routing, timings, start_time, error)
+
+        with timed_stage("routing"):
+            routing = await aroute(case["question"], case.get("intent"), router_latency)
+        if routing["intent"] == "inventory_question":
+            try:
+                error = _response_error(
+                    await ahandle_router(routing["intent"], case["question"], supply_chain_agent=agent, thread_id=thread_id)
+                )
+            except Exception as e:
+                error = str(e)[:200]
+    return _result(case, routing, timings, start_time, error)
+
+
+def _stage_name(stage: str) -> str:
+    if stage in STAGE_ALIASES:
+        return STAGE_ALIASES[stage]
+    if stage.startswith("tool:") and stage[len("tool:"):] in CHART_TOOLS:
+        return "charting"
+    return stage
+
+
+def summarize(results: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """Latency percentiles per stage, throughput and error rate of a run"""
+    per_stage: Dict[str, List[float]] = {"total": []}
+    for result in results:
+        per_stage["total"].append(result["seconds"])
+        stages: Dict[str, float] = {}
+        for stage, seconds in result["stages"].items():
+            name = _stage_name(stage)
+            stages[name] = stages.get(name, 0.0) + seconds
+        for name, seconds in stages.items():
+            per_stage.setdefault(name, []).append(seconds)
+
+    stage_report = {}
+    for name, values in sorted(per_stage.items()):
+        values_ms = np.array(values) * 1000
+        stage_report[name] = {
+            "count": len(values),
+            **{f"p{p}_ms": round(float(np.percentile(values_ms, p)), 2) for p in PERCENTILES},
+            "mean_ms": round(float(values_ms.mean()), 2),
+            "max_ms": round(float(values_ms.max()), 2),
+        }
+
+    errors = [r for r in results if r["error"]]
+    return {
+        "requests": len(results),
+        "dispatched": sum(r["dispatched"] for r in results),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(results), 4) if results else 0.0,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(results) / wall_seconds, 3) if wall_seconds else 0.0,
+        "routing_accuracy": round(sum(r["routed_correctly"] for r in results) / len(results), 4) if results else 0.0,
+        "routing_local_share": round(sum(r["routing_source"] == "local" for r in results) / len(results), 4) if results else 0.0,
+        "stages": stage_report,
+        "error_samples": sorted({f"{r['question'][:60]}: {r['error']}" for r in errors})[:10],
+    }
+
+
+def run_benchmark(
+    agent: SupplyChainAgent,
+    corpus: List[Dict[str, Any]],
+    concurrency: int = 4,
+    repeat: int = 1,
+    use_async: bool = False,
+    router_latency: float = 0.0,
+    speculative: bool = False
+) -> Dict[str, Any]:
+    """
+    Run the corpus through the agent with concurrent requests
+
+    Args:
+        agent: Agent to benchmark (shared by all requests, one thread per request)
+        corpus: Benchmark cases
+        concurrency: Requests in flight at a time
+        repeat: Passes over the corpus
+        use_async: Use ahandle_router / aprocess_query instead of worker threads
+        router_latency: Seconds the remote router stand-in takes when the local router is unsure
+        speculative: Answer inventory cases through aspeculative_handle_router (implies use_async)
+
+    Returns:
+        Summary report (see summarize)
+    """
+    jobs = [(case, f"bench-{round_number}-{number}")
+            for round_number in range(repeat) for number, case in enumerate(corpus)]
+    start_time = time.perf_counter()
+    if use_async or speculative:
+        async def _run_all():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def _bounded(case, thread_id):
+                async with semaphore:
+                    return await arun_case(agent, case, thread_id, router_latency, speculative)
+            try:
+                return await asyncio.gather(*(_bounded(case, thread_id) for case, thread_id in jobs))
+            finally:
+                # asyncio.run closes this loop; close its connection pools first
+                await dispose_async_engines()
+        results = asyncio.run(_run_all())
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda job: run_case(agent, *job, router_latency), jobs))
+    report = summarize(results, time.perf_counter() - start_time)
+    report["llm_usage"] = agent.llm_pool.usage()
+    report["coalescing"] = agent.coalescer.metrics()
+    report["model_tiers"] = agent.model_router.metrics()
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="JSON lines corpus (default: built-in corpus)")
+    parser.add_argument("--fixtures", help="Recorded LLM fixtures (LLM_FAKE_MODE=record output) to replay")
+    parser.add_argument("--database", help="Database URL (default: SQLite copy of utils/data)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Use the async agent path")
+    parser.add_argument("--speculative", action="store_true",
+                        help="Overlap routing with the agent run (async); set INTENT_CONFIDENCE_THRESHOLD "
+                             "above 1 to send every question through the remote router stand-in")
+    parser.add_argument("--router-latency", type=float, default=1.0,
+                        help="Seconds the remote router stand-in takes")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Replayed model latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="Random extra latency in seconds")
+    parser.add_argument("--recorded-latency", action="store_true", help="Replay the latency measured while recording")
+    parser.add_argument("--llm-concurrency", type=int, default=LLM_MAX_CONCURRENCY)
+    parser.add_argument("--llm-rpm", type=float, default=LLM_REQUESTS_PER_MINUTE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file as well")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    store = FixtureStore(args.fixtures)
+    add_corpus_fixtures(store, corpus)
+    pool = LLMClientPool(
+        max_concurrency=args.llm_concurrency,
+        requests_per_minute=args.llm_rpm,
+        factory=replay_factory(
+            store,
+            latency_seconds=args.llm_latency,
+            latency_jitter_seconds=args.llm_jitter,
+            use_recorded_latency=args.recorded_latency,
+            seed=args.seed,
+        ),
+        requires_api_key=False,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_url = args.database or build_local_database(os.path.join(tmp_dir, "warehouse.db"))
+        agent = SupplyChainAgent(
+            llm_pool=pool, db=QueryCapturingSQLDatabase.from_uri(database_url), checkpointer=MemorySaver()
+        )
+        # Agents print progress (verbose chains, router logs); keep stdout for the report
+        with contextlib.redirect_stdout(sys.stderr):
+            report = run_benchmark(
+                agent, corpus, args.concurrency, args.repeat, args.use_async, args.router_latency, args.speculative
+            )
+        agent.db._engine.dispose()
+
+    report["config"] = {
+        "corpus": args.corpus or "default",
+        "fixtures": args.fixtures,
+        "database": args.database or "local sqlite",
+        "concurrency": args.concurrency,
+        "repeat": args.repeat,
+        "async": args.use_async or args.speculative,
+        "speculative": args.speculative,
+        "router_latency": args.router_latency,
+        "llm_latency": args.llm_latency,
+        "llm_jitter": args.llm_jitter,
+        "recorded_latency": args.recorded_latency,
+        "llm_concurrency": args.llm_concurrency,
+        "llm_rpm": args.llm_rpm,
+    }
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
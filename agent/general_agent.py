@@ -1,12 +1,23 @@
 import requests
 
+from agent.http_client import apost_json, webhook_timeout
+
+GENERAL_WEBHOOK_URL = "https://chanoot001.app.n8n.cloud/webhook/general-001"
+
 def general_agent(question):
     payload = {
         "user_query":question
     }
-    response = requests.post("https://chanoot001.app.n8n.cloud/webhook/general-001", json=payload)
+    response = requests.post(GENERAL_WEBHOOK_URL, json=payload, timeout=webhook_timeout())
     print(response.json())
     # print(response.json()[0]['output'])
     return response.json()[0]['output']
 
+async def ageneral_agent(question):
+    payload = {
+        "user_query":question
+    }
+    response = await apost_json(GENERAL_WEBHOOK_URL, payload)
+    return response[0]['output']
+
 # general_agent("how can did warehouse management system help in inventory management?")age
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+Async HTTP Client
+
+Shared httpx.AsyncClient for the async n8n webhook callers. Connections are
+pooled per event loop (an AsyncClient cannot be shared across loops).
+
+Webhook calls (sync and async) time out after WEBHOOK_TIMEOUT_SECONDS or when
+the request's deadline passes, whichever comes first.
+"""
+
+import os
+import asyncio
+import weakref
+import httpx
+
+from utils.deadline import timeout_for
+
+WEBHOOK_TIMEOUT_SECONDS = float(os.environ.get("WEBHOOK_TIMEOUT_SECONDS", "60"))
+
+_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def webhook_timeout() -> float:
+    """HTTP timeout for a webhook call of the current request"""
+    return timeout_for(WEBHOOK_TIMEOUT_SECONDS)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """AsyncClient for the running event loop"""
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        _clients[loop] = httpx.AsyncClient(
+            timeout=WEBHOOK_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+    return _clients[loop]
+
+
+async def apost_json(url: str, payload: dict):
+    """POST a JSON payload and return the decoded JSON response"""
+    response = await get_async_client().post(url, json=payload, timeout=webhook_timeout())
+    return response.json()
@@ -1,12 +1,39 @@
 import requests
 
+from agent.local_router import get_local_router, log_routing_decision, CONFIDENCE_THRESHOLD
+from agent.http_client import apost_json, webhook_timeout
+
+ROUTER_WEBHOOK_URL = "https://chanoot001.app.n8n.cloud/webhook/0698e909-a440-4648-87c7-29d27348caf5"
+
 def router_agent(question:str):
+    # Fast path: confident local classification skips the webhook round trip
+    intent, confidence = get_local_router().classify(question)
+    if confidence >= CONFIDENCE_THRESHOLD:
+        return intent
+
     payload = {
         "user_query": question,
         "chat_history": []
     }
-    response = requests.post("https://chanoot001.app.n8n.cloud/webhook/0698e909-a440-4648-87c7-29d27348caf5", json=payload)
+    response = requests.post(ROUTER_WEBHOOK_URL, json=payload, timeout=webhook_timeout())
     # print(f"router_agent Question: {question}")
     # print(f"From router_agent:")
     # print(response.json())
-    return response.json()[0]['output']
\ No newline at end of file
+    intent = response.json()[0]['output']
+    # Remote decisions become training data for the local router
+    log_routing_decision(question, intent, source="remote")
+    return intent
+
+async def arouter_agent(question:str):
+    intent, confidence = get_local_router().classify(question)
+    if confidence >= CONFIDENCE_THRESHOLD:
+        return intent
+
+    payload = {
+        "user_query": question,
+        "chat_history": []
+    }
+    response = await apost_json(ROUTER_WEBHOOK_URL, payload)
+    intent = response[0]['output']
+    log_routing_decision(question, intent, source="remote")
+    return intent
@@ -1,7 +1,7 @@
 from langchain_community.document_loaders import TextLoader
 from langchain_community.vectorstores import Chroma
 
-from langchain_google_genai import ChatGoogleGenerativeAI
+from utils.llm_pool import get_chat_model
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.prompts import ChatPromptTemplate
@@ -39,12 +39,8 @@ retriever = vectordb.as_retriever()
 
 # --- 3. LLM Setup ---
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=GOOGLE_API_KEY,
-    temperature=0.0,
-    verbose=True,
-)
+# Shared client from the process-wide pool (rate limited, usage reported as "knowledge_agent")
+llm = get_chat_model("knowledge_agent", google_api_key=GOOGLE_API_KEY, verbose=True)
 
 # --- 4. Prompt Templates ---
 
@@ -79,16 +75,22 @@ humanizer_chain = humanizer_prompt | llm | StrOutputParser()
 
 # --- 5. Define the RAG pipeline function ---
 
-def knowledge_agent(question: str, chat_history: list[tuple[str, str]] = None):
+def retrieve_context(question: str) -> str:
+    """Retrieve the documents relevant to the question, joined into one context string"""
+    relevant_docs = retriever.invoke(question)
+    return "\n\n".join(doc.page_content for doc in relevant_docs)
+
+def knowledge_agent(question: str, chat_history: list[tuple[str, str]] = None, context: str = None):
     """
     Retrieve relevant docs for the question and answer with LLM.
     Optionally rephrase answer into more natural language.
     
     chat_history currently not used, but you can extend to include it in prompt if needed.
+    context skips retrieval when it was already done (e.g. prefetched by speculative routing).
     """
     # 1. Retrieve documents
-    relevant_docs = retriever.invoke(question)
-    context = "\n\n".join(doc.page_content for doc in relevant_docs)
+    if context is None:
+        context = retrieve_context(question)
     
     # 2. Run prompt chain with context + question
     try:
@@ -1,17 +1,30 @@
+import asyncio
 import requests
 
 from agent.query_tools.notification import warehouse_capacity
+from agent.http_client import apost_json, webhook_timeout
+
+FORECAST_WEBHOOK_URL = "https://chanoot001.app.n8n.cloud/webhook/forecast"
 
 def forecast_agent():
     df = warehouse_capacity()
     payload = {
         "user_query":df.to_json(),
     }
-    response = requests.post("https://chanoot001.app.n8n.cloud/webhook/forecast", json=payload)
+    response = requests.post(FORECAST_WEBHOOK_URL, json=payload, timeout=webhook_timeout())
 
     print(response.text)
     # Return the actual response content
     return response.json()[0]['output']
 
+async def aforecast_agent():
+    # Reading the capacity workbook is blocking file I/O
+    df = await asyncio.to_thread(warehouse_capacity)
+    payload = {
+        "user_query":df.to_json(),
+    }
+    response = await apost_json(FORECAST_WEBHOOK_URL, payload)
+    return response[0]['output']
+
 if __name__ == "__main__":
     forecast_agent()
\ No newline at end of file
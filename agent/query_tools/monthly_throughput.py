@@ -1,14 +1,24 @@
 import requests
 import pandas as pd
 
+from agent.http_client import apost_json, webhook_timeout
+
+THROUGHPUT_WEBHOOK_URL = "https://chanoot001.app.n8n.cloud/webhook/monthly_thoughput"
+
 def analyst_thoughput(question:str = ""):
     payload = {
         "query": question,
     }
-    response =requests.post("https://chanoot001.app.n8n.cloud/webhook/monthly_thoughput", json=payload)
+    response =requests.post(THROUGHPUT_WEBHOOK_URL, json=payload, timeout=webhook_timeout())
     df = pd.DataFrame(response.json())
     print(df)
     return response.json()
 
+async def aanalyst_thoughput(question:str = ""):
+    payload = {
+        "query": question,
+    }
+    return await apost_json(THROUGHPUT_WEBHOOK_URL, payload)
+
 if __name__ == "__main__":
     analyst_thoughput()
\ No newline at end of file
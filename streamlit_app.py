@@ -4,9 +4,12 @@ import glob
 from datetime import datetime
 from dotenv import load_dotenv
 import sqlparse
-from utils.supply_chain_agent import SupplyChainAgent
+from utils.agent_pool import get_agent_pool
+from utils.admission import get_admission_controller, busy_response, AdmissionRejected, INTERACTIVE, BATCH
+from utils.deadline import deadline_scope
+from utils.low_stock import LOW_STOCK_QUESTION
 from agent.intent_agent import router_agent
-from agent.agent_flow import handle_router
+from agent.agent_flow import handle_router, speculative_handle_router, SPECULATIVE_ROUTING
 from agent.query_tools.monthly_throughput import analyst_thoughput
 from agent.query_tools.forecast import forecast_agent
 from agent.query_tools.notification import warehouse_capacity, calculate_capacity
@@ -34,6 +37,78 @@ def format_sql_query(sql_query: str) -> str:
     except Exception:
         return sql_query
 
+def show_busy_response(error: AdmissionRejected):
+    """Render the busy message of a request shed by admission control and keep it in the chat"""
+    content = f"⏳ {busy_response(error)['content']}"
+    st.warning(content)
+    st.session_state.messages.append({"role": "assistant", "type": "text", "content": content})
+    logger.warning(f"Request shed ({error.priority}, {error.reason}): {error}")
+
+def rerun_requested_check():
+    """
+    Check whether a newer script run started (the user sent a new message or clicked)
+    
+    Streamlit starts the new run right away and only stops this one at its next st.*
+    call; comparing the session's run generation lets the agent stop at its next LLM
+    call, tool call or SQL statement instead. The counter is captured here because the
+    agent's worker threads have no script run context to read st.session_state from.
+    """
+    script_runs = st.session_state.script_runs
+    generation = script_runs["generation"]
+    return lambda: script_runs["generation"] != generation
+
+def stream_agent_response(agent, question: str, thread_id: str) -> dict:
+    """
+    Render SupplyChainAgent.stream_query events progressively
+    
+    Tool steps go into a status box; answer tokens, the result DataFrame and the SQL
+    are drawn into placeholders as soon as they are known. The placeholders are cleared
+    at the end so the caller renders the final response in the usual layout.
+    
+    Returns:
+        The final response dict (same format as process_query)
+    """
+    status = st.status("🤔 Analyzing your data...", expanded=False)
+    live = st.empty()
+    with live.container():
+        text_placeholder = st.empty()
+        data_placeholder = st.empty()
+        sql_placeholder = st.empty()
+    
+    response = {"type": "error", "content": "No response received from the agent"}
+    streamed_text = ""
+    for event in agent.stream_query(question, thread_id=thread_id):
+        if event["event"] == "tool_start":
+            status.update(label=f"🔧 Running {event['tool']}...")
+            status.write(f"🔧 `{event['tool']}` {event['args']}")
+        elif event["event"] == "tool_timing":
+            status.write(f"✅ `{event['tool']}` finished in {event['seconds']:.2f}s")
+        elif event["event"] == "sql":
+            with sql_placeholder.container():
+                with st.expander("🔍 SQL Query Used"):
+                    st.code(format_sql_query(event["sql_query"]), language="sql")
+        elif event["event"] == "dataframe":
+            if event["dataframe"] is not None and not event["dataframe"].empty:
+                data_placeholder.dataframe(event["dataframe"], use_container_width=True)
+        elif event["event"] == "token":
+            streamed_text += event["content"]
+            text_placeholder.markdown(streamed_text + "▌")
+        elif event["event"] == "escalate":
+            # The answer so far is discarded and the question runs again on a stronger model
+            streamed_text = ""
+            text_placeholder.empty()
+            data_placeholder.empty()
+            sql_placeholder.empty()
+            status.write(f"↗️ Retrying with the {event['tier']} model")
+        elif event["event"] == "final":
+            response = event["response"]
+        elif event["event"] == "error":
+            response = {"type": "error", "content": event["content"]}
+    
+    status.update(label="✅ Analysis complete", state="complete")
+    live.empty()
+    return response
+
 def main():
     st.set_page_config(
         page_title="Supply Chain Analytics Assistant", 
@@ -41,6 +116,9 @@ def main():
         initial_sidebar_state="expanded"
     )
     
+    # Every script run bumps the generation, so a busy older run sees it was superseded
+    st.session_state.setdefault("script_runs", {"generation": 0})["generation"] += 1
+    
     # Header
     st.title("🏭 Supply Chain Analytics Assistant")
     st.markdown("Ask questions about inventory, transactions, costs, and get insights with visualizations")
@@ -62,7 +140,7 @@ def main():
             "Plot monthly transaction trends",
             "Give me the 5 latest snapshots of our inventory",
             "Which plants have the highest storage costs?",
-            "Show me materials with low stock levels"
+            LOW_STOCK_QUESTION
         ]
         
         for question in sample_questions:
@@ -83,9 +161,11 @@ def main():
         if st.button("🗑️ Clear Chat History"):
             logger.info("Chat history cleared by user")
             st.session_state.messages = []
-            if "agent" in st.session_state:
+            if "agent_pool" in st.session_state:
                 # Clear both LangChain and LangGraph memory
-                st.session_state.agent.clear_memory(st.session_state.get("thread_id", "default"))
+                thread_id = st.session_state.get("thread_id", "default")
+                with st.session_state.agent_pool.lease(thread_id) as agent:
+                    agent.clear_memory(thread_id)
             st.rerun()
         
         # Debug Panel
@@ -109,10 +189,12 @@ def main():
             
             # Real-time agent status
             st.subheader("Agent Status")
-            if "agent" in st.session_state:
+            if "agent_pool" in st.session_state:
                 st.success("✅ Agent initialized")
+                # Read-only lookups, safe on a worker that is serving another request
+                status_agent = st.session_state.agent_pool.workers[0]
                 try:
-                    table_names = st.session_state.agent.db.get_usable_table_names()
+                    table_names = status_agent.db.get_usable_table_names()
                     st.info(f"Database tables available: {len(table_names)}")
                     st.text(f"Tables: {', '.join(table_names)}")
                 except:
@@ -120,10 +202,15 @@ def main():
                 
                 # Show memory status
                 try:
-                    history = st.session_state.agent.get_conversation_history(st.session_state.thread_id)
+                    history = status_agent.get_conversation_history(st.session_state.thread_id)
                     st.info(f"Conversation messages in memory: {len(history)}")
                 except:
                     st.warning("Could not retrieve conversation history")
+                
+                # Shared worker pool usage, admission queues and model tier mix
+                st.json(st.session_state.agent_pool.metrics())
+                st.json(get_admission_controller().metrics())
+                st.json(status_agent.model_router.metrics())
             else:
                 st.warning("⚠️ Agent not initialized")
             
@@ -137,7 +224,7 @@ def main():
             
             # Memory info
             st.subheader("Memory Status")
-            if "agent" in st.session_state:
+            if "agent_pool" in st.session_state:
                 st.info("✅ LangGraph SQLite persistence enabled")
                 st.info("✅ LangChain window memory (5 exchanges)")
             else:
@@ -151,9 +238,10 @@ def main():
         import uuid
         st.session_state.thread_id = str(uuid.uuid4())
     
-    if "agent" not in st.session_state:
+    if "agent_pool" not in st.session_state:
+        # Agents are shared by all sessions; the first session builds the pool
         with st.spinner("🔄 Loading supply chain data and initializing agent..."):
-            st.session_state.agent = SupplyChainAgent()
+            st.session_state.agent_pool = get_agent_pool()
     
     # Display chat messages
     for idx, message in enumerate(st.session_state.messages):
@@ -197,7 +285,8 @@ def main():
         with st.chat_message("assistant"):
             with st.spinner("🔄 Analyzing monthly throughput..."):
                 try:
-                    throughput_data = analyst_thoughput()
+                    with deadline_scope(), get_admission_controller().admit(st.session_state.thread_id, BATCH):
+                        throughput_data = analyst_thoughput()
                     
                     # Convert to DataFrame for better display
                     import pandas as pd
@@ -214,6 +303,8 @@ def main():
                     
                     logger.info(f"Monthly throughput analysis completed with {len(throughput_data)} records")
                     
+                except AdmissionRejected as e:
+                    show_busy_response(e)
                 except Exception as e:
                     error_msg = f"❌ Error getting throughput analysis: {str(e)}"
                     st.error(error_msg)
@@ -243,7 +334,8 @@ def main():
         with st.chat_message("assistant"):
             with st.spinner("🔮 Analyzing warehouse forecast..."):
                 try:
-                    forecast_result = forecast_agent()
+                    with deadline_scope(), get_admission_controller().admit(st.session_state.thread_id, BATCH):
+                        forecast_result = forecast_agent()
                     
                     # Since forecast_agent returns text, display it directly
                     st.markdown("**Warehouse Forecast Analysis Results:**")
@@ -266,6 +358,8 @@ def main():
                     
                     logger.info("Warehouse forecast analysis completed")
                     
+                except AdmissionRejected as e:
+                    show_busy_response(e)
                 except Exception as e:
                     error_msg = f"❌ Error getting forecast analysis: {str(e)}"
                     st.error(error_msg)
@@ -296,8 +390,9 @@ def main():
             with st.spinner("🚨 Checking warehouse capacity..."):
                 try:
                     # Get warehouse capacity data
-                    df = warehouse_capacity()
-                    capacity_result = calculate_capacity(df)
+                    with deadline_scope(), get_admission_controller().admit(st.session_state.thread_id, BATCH):
+                        df = warehouse_capacity()
+                        capacity_result = calculate_capacity(df)
                     
                     st.markdown("**Warehouse Capacity Notification Results:**")
                     
@@ -322,6 +417,8 @@ def main():
                     
                     logger.info(f"Capacity notification check completed")
                     
+                except AdmissionRejected as e:
+                    show_busy_response(e)
                 except Exception as e:
                     error_msg = f"❌ Error checking capacity: {str(e)}"
                     st.error(error_msg)
@@ -344,95 +441,135 @@ def main():
         
         # Get assistant response
         with st.chat_message("assistant"):
-            with st.spinner("🤔 Analyzing your data..."):
+            try:
+                # Chat requests are scheduled ahead of the sidebar reports; shed when overloaded.
+                # The deadline covers routing and the agent run; a newer message cancels the request.
+                cancel_check = rerun_requested_check()
                 try:
-                    # Get intent classification and route to appropriate agent
-                    intent = router_agent(user_input)
-                    # print(f"Intent is: {intent}")
-                    response_text = handle_router(
-                        intent, 
-                        user_input, 
-                        chat_history=[], 
-                        supply_chain_agent=st.session_state.agent, 
-                        thread_id=st.session_state.thread_id
-                    )
-                    
-                    # Handle if response is already a dict (from supply chain agent)
-                    if isinstance(response_text, dict):
-                        response = response_text
-                    else:
-                        response = {"type": "text", "content": response_text}
-                    
-                    # Handle different response types
-                    if response["type"] == "text":
-                        st.markdown(response["content"])
-                        st.session_state.messages.append({
-                            "role": "assistant", 
-                            "type": "text", 
-                            "content": response["content"]
-                        })
-                        logger.info(f"Generated text response: {len(response['content'])} characters")
-                    
-                    elif response["type"] == "text_with_chart":
-                        st.markdown(response["text"])
-                        st.plotly_chart(response["chart"], use_container_width=True, key=f"chart_{st.session_state.thread_id}_{len(st.session_state.messages)}")
-                        st.session_state.messages.extend([
-                            {"role": "assistant", "type": "text", "content": response["text"]},
-                            {"role": "assistant", "type": "plotly", "content": response["chart"]}
-                        ])
-                        logger.info(f"Generated chart response with text: {len(response['text'])} characters")
+                    with deadline_scope(thread_id=st.session_state.thread_id, should_cancel=cancel_check), get_admission_controller().admit(st.session_state.thread_id, INTERACTIVE):
+                        if user_input.strip().lower() == LOW_STOCK_QUESTION.lower():
+                            # Served from the maintained low-stock index, no LLM round trip
+                            with st.session_state.agent_pool.lease(st.session_state.thread_id) as agent:
+                                response_text = agent.get_low_stock_response(
+                                    thread_id=st.session_state.thread_id,
+                                    query=user_input
+                                )
+                        elif SPECULATIVE_ROUTING:
+                            # Routing, the agent run and knowledge retrieval overlap; unused branches are cancelled
+                            with st.spinner("🤔 Analyzing your data..."):
+                                intent, response_text = speculative_handle_router(
+                                    user_input,
+                                    thread_id=st.session_state.thread_id
+                                )
+                        else:
+                            # Get intent classification and route to appropriate agent
+                            with st.spinner("🤔 Analyzing your data..."):
+                                intent = router_agent(user_input)
+                            # print(f"Intent is: {intent}")
+                            if 'inventory_question' in intent:
+                                # Stream tool steps, SQL, data and answer tokens as they arrive
+                                with st.session_state.agent_pool.lease(st.session_state.thread_id) as agent:
+                                    response_text = stream_agent_response(
+                                        agent,
+                                        user_input,
+                                        thread_id=st.session_state.thread_id
+                                    )
+                            else:
+                                with st.spinner("🤔 Analyzing your data..."):
+                                    response_text = handle_router(
+                                        intent, 
+                                        user_input, 
+                                        chat_history=[], 
+                                        thread_id=st.session_state.thread_id
+                                    )
+                except AdmissionRejected as e:
+                    logger.warning(f"Request shed ({e.priority}, {e.reason}): {e}")
+                    response_text = busy_response(e)
+                
+                # Handle if response is already a dict (from supply chain agent)
+                if isinstance(response_text, dict):
+                    response = response_text
+                else:
+                    response = {"type": "text", "content": response_text}
+                
+                # Handle different response types
+                if response["type"] == "text":
+                    st.markdown(response["content"])
+                    st.session_state.messages.append({
+                        "role": "assistant", 
+                        "type": "text", 
+                        "content": response["content"]
+                    })
+                    logger.info(f"Generated text response: {len(response['content'])} characters")
+                
+                elif response["type"] == "text_with_chart":
+                    st.markdown(response["text"])
+                    st.plotly_chart(response["chart"], use_container_width=True, key=f"chart_{st.session_state.thread_id}_{len(st.session_state.messages)}")
+                    st.session_state.messages.extend([
+                        {"role": "assistant", "type": "text", "content": response["text"]},
+                        {"role": "assistant", "type": "plotly", "content": response["chart"]}
+                    ])
+                    logger.info(f"Generated chart response with text: {len(response['text'])} characters")
+                
+                elif response["type"] == "text_with_dataframe":
+                    st.markdown(response["text"])
+                    st.dataframe(response["dataframe"], use_container_width=True)
+                    st.session_state.messages.extend([
+                        {"role": "assistant", "type": "text", "content": response["text"]},
+                        {"role": "assistant", "type": "dataframe", "content": response["dataframe"]}
+                    ])
+                    logger.info(f"Generated dataframe response with text: {len(response['text'])} characters")
+                
+                elif response["type"] == "text_with_sql_and_dataframe":
+                    # Display natural language answer
+                    st.markdown(response["text"])
                     
-                    elif response["type"] == "text_with_dataframe":
-                        st.markdown(response["text"])
+                    # Display DataFrame if available
+                    if response["dataframe"] is not None and not response["dataframe"].empty:
+                        st.subheader("📊 Raw Data Results")
                         st.dataframe(response["dataframe"], use_container_width=True)
-                        st.session_state.messages.extend([
-                            {"role": "assistant", "type": "text", "content": response["text"]},
-                            {"role": "assistant", "type": "dataframe", "content": response["dataframe"]}
-                        ])
-                        logger.info(f"Generated dataframe response with text: {len(response['text'])} characters")
                     
-                    elif response["type"] == "text_with_sql_and_dataframe":
-                        # Display natural language answer
-                        st.markdown(response["text"])
-                        
-                        # Display DataFrame if available
-                        if response["dataframe"] is not None and not response["dataframe"].empty:
-                            st.subheader("📊 Raw Data Results")
-                            st.dataframe(response["dataframe"], use_container_width=True)
-                        
-                        # Display SQL query in expandable section
-                        if response["sql_query"] and response["sql_query"] != "No SQL query captured":
-                            with st.expander("🔍 SQL Query Used"):
-                                st.code(format_sql_query(response["sql_query"]), language="sql")
-                        
-                        # Store in message history
-                        st.session_state.messages.extend([
-                            {"role": "assistant", "type": "text", "content": response["text"]},
-                            {"role": "assistant", "type": "dataframe", "content": response["dataframe"]},
-                            {"role": "assistant", "type": "sql_query", "content": response["sql_query"]}
-                        ])
-                        dataframe_shape = response["dataframe"].shape if response["dataframe"] is not None else None
-                        sql_length = len(response["sql_query"]) if response["sql_query"] else 0
-                        logger.info(f"Generated SQL and dataframe response: {len(response['text'])} chars, shape {dataframe_shape}, SQL {sql_length} chars")
+                    # Display SQL query in expandable section
+                    if response["sql_query"] and response["sql_query"] != "No SQL query captured":
+                        with st.expander("🔍 SQL Query Used"):
+                            st.code(format_sql_query(response["sql_query"]), language="sql")
                     
-                    elif response["type"] == "error":
-                        st.error(f"❌ {response['content']}")
-                        st.session_state.messages.append({
-                            "role": "assistant", 
-                            "type": "text", 
-                            "content": f"❌ {response['content']}"
-                        })
-                        logger.error(f"Response error: {response['content']}")
-                        
-                except Exception as e:
-                    error_msg = f"❌ An error occurred: {str(e)}"
-                    st.error(error_msg)
+                    # Store in message history
+                    st.session_state.messages.extend([
+                        {"role": "assistant", "type": "text", "content": response["text"]},
+                        {"role": "assistant", "type": "dataframe", "content": response["dataframe"]},
+                        {"role": "assistant", "type": "sql_query", "content": response["sql_query"]}
+                    ])
+                    dataframe_shape = response["dataframe"].shape if response["dataframe"] is not None else None
+                    sql_length = len(response["sql_query"]) if response["sql_query"] else 0
+                    logger.info(f"Generated SQL and dataframe response: {len(response['text'])} chars, shape {dataframe_shape}, SQL {sql_length} chars")
+                
+                elif response.get("busy"):
+                    st.warning(f"⏳ {response['content']}")
                     st.session_state.messages.append({
                         "role": "assistant", 
                         "type": "text", 
-                        "content": error_msg
+                        "content": f"⏳ {response['content']}"
                     })
-                    logger.error(f"Streamlit error: {str(e)}")
+                
+                elif response["type"] == "error":
+                    st.error(f"❌ {response['content']}")
+                    st.session_state.messages.append({
+                        "role": "assistant", 
+                        "type": "text", 
+                        "content": f"❌ {response['content']}"
+                    })
+                    logger.error(f"Response error: {response['content']}")
+                    
+            except Exception as e:
+                error_msg = f"❌ An error occurred: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append({
+                    "role": "assistant", 
+                    "type": "text", 
+                    "content": error_msg
+                })
+                logger.error(f"Streamlit error: {str(e)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
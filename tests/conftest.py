@@ -0,0 +1,42 @@
+"""
+Shared pytest setup
+
+utils/ and agent/ are imported as packages from the repository root, like
+streamlit_app.py does.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def warehouse_url(tmp_path_factory):
+    """SQLite copy of the warehouse tables (see agent.benchmark.build_local_database)"""
+    # Imported normally so a broken agent import fails the agent tests instead of skipping them
+    from agent.benchmark import build_local_database
+    return build_local_database(str(tmp_path_factory.mktemp("warehouse") / "warehouse.db"))
+
+
+@pytest.fixture
+def make_replay_agent(warehouse_url):
+    """Builds SupplyChainAgents whose models answer from a fixture store (utils/fake_llm.py)"""
+    from langgraph.checkpoint.memory import MemorySaver
+    from utils.database import QueryCapturingSQLDatabase
+    from utils.fake_llm import replay_factory
+    from utils.llm_pool import LLMClientPool
+    from utils.supply_chain_agent import SupplyChainAgent
+
+    def make(store, latency_seconds: float = 0.0):
+        pool = LLMClientPool(
+            factory=replay_factory(store, latency_seconds=latency_seconds),
+            requests_per_minute=6000,
+            requires_api_key=False,
+        )
+        return SupplyChainAgent(
+            llm_pool=pool, db=QueryCapturingSQLDatabase.from_uri(warehouse_url), checkpointer=MemorySaver()
+        )
+    return make
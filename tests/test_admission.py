@@ -0,0 +1,228 @@
+"""Tests for admission control (utils/admission.py)"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.admission import BATCH, INTERACTIVE, AdmissionController, AdmissionRejected, busy_response
+
+WAIT_SECONDS = 2.0
+
+
+def make_controller(**kwargs) -> AdmissionController:
+    settings = {
+        "max_queue": {INTERACTIVE: 4, BATCH: 4},
+        "max_wait_seconds": {INTERACTIVE: WAIT_SECONDS, BATCH: WAIT_SECONDS},
+    }
+    settings.update(kwargs)
+    return AdmissionController(**settings)
+
+
+def wait_until(predicate, timeout: float = WAIT_SECONDS):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        assert time.perf_counter() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+class Holder:
+    """Thread that enters admit() and keeps its slot until release()"""
+
+    def __init__(self, controller: AdmissionController, user_id: str, priority: str = INTERACTIVE, log=None):
+        self.admitted = threading.Event()
+        self.error = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(controller, user_id, priority, log), daemon=True)
+        self._thread.start()
+
+    def _run(self, controller, user_id, priority, log):
+        try:
+            with controller.admit(user_id, priority):
+                if log is not None:
+                    log.append(user_id)
+                self.admitted.set()
+                self._done.wait(WAIT_SECONDS)
+        except AdmissionRejected as e:
+            self.error = e
+
+    def release(self):
+        self._done.set()
+        self._thread.join(WAIT_SECONDS)
+
+
+def queued(controller: AdmissionController, priority: str, depth: int):
+    return lambda: controller.metrics()[priority]["queue_depth"] == depth
+
+
+def test_interactive_is_admitted_before_earlier_batch():
+    controller = make_controller(max_concurrent=1)
+    log = []
+    holder = Holder(controller, "user-0")
+    assert holder.admitted.wait(WAIT_SECONDS)
+    batch = Holder(controller, "user-1", BATCH, log)
+    wait_until(queued(controller, BATCH, 1))
+    interactive = Holder(controller, "user-2", INTERACTIVE, log)
+    wait_until(queued(controller, INTERACTIVE, 1))
+
+    holder.release()
+    assert interactive.admitted.wait(WAIT_SECONDS)
+    assert not batch.admitted.is_set()
+    interactive.release()
+    assert batch.admitted.wait(WAIT_SECONDS)
+    batch.release()
+
+    assert log == ["user-2", "user-1"]
+
+
+def test_batch_share_cap_leaves_slots_for_interactive():
+    controller = make_controller(max_concurrent=3, batch_max_concurrent=1)
+    first_batch = Holder(controller, "user-1", BATCH)
+    assert first_batch.admitted.wait(WAIT_SECONDS)
+    second_batch = Holder(controller, "user-2", BATCH)
+    wait_until(queued(controller, BATCH, 1))
+
+    interactive = Holder(controller, "user-3")
+    assert interactive.admitted.wait(WAIT_SECONDS)
+    metrics = controller.metrics()
+    assert metrics[BATCH]["running"] == 1
+    assert not second_batch.admitted.is_set()
+
+    first_batch.release()
+    assert second_batch.admitted.wait(WAIT_SECONDS)
+    second_batch.release()
+    interactive.release()
+
+
+def test_per_user_limit_lets_other_users_pass():
+    controller = make_controller(max_concurrent=2, max_per_user=1)
+    first = Holder(controller, "user-1")
+    assert first.admitted.wait(WAIT_SECONDS)
+    second = Holder(controller, "user-1")
+    wait_until(queued(controller, INTERACTIVE, 1))
+
+    other = Holder(controller, "user-2")
+    assert other.admitted.wait(WAIT_SECONDS)
+    assert not second.admitted.is_set()
+
+    first.release()
+    assert second.admitted.wait(WAIT_SECONDS)
+    second.release()
+    other.release()
+
+
+def test_full_queue_sheds_immediately():
+    controller = make_controller(max_concurrent=1, max_queue={INTERACTIVE: 1, BATCH: 1})
+    holder = Holder(controller, "user-0")
+    assert holder.admitted.wait(WAIT_SECONDS)
+    waiter = Holder(controller, "user-1")
+    wait_until(queued(controller, INTERACTIVE, 1))
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        with controller.admit("user-2"):
+            pass
+
+    assert rejected.value.reason == "queue_full"
+    assert controller.metrics()[INTERACTIVE]["rejected"] == 1
+    holder.release()
+    assert waiter.admitted.wait(WAIT_SECONDS)
+    waiter.release()
+
+
+def test_wait_limit_sheds_and_leaves_the_queue():
+    controller = make_controller(max_concurrent=1, max_wait_seconds={INTERACTIVE: 0.1, BATCH: 0.1})
+    holder = Holder(controller, "user-0")
+    assert holder.admitted.wait(WAIT_SECONDS)
+
+    start = time.perf_counter()
+    with pytest.raises(AdmissionRejected) as rejected:
+        with controller.admit("user-1"):
+            pass
+    waited = time.perf_counter() - start
+    holder.release()
+
+    assert rejected.value.reason == "timeout"
+    assert 0.1 <= waited < 1.0
+    assert busy_response(rejected.value)["busy"]
+    metrics = controller.metrics()[INTERACTIVE]
+    assert metrics["timeouts"] == 1
+    assert metrics["queue_depth"] == 0
+
+
+def test_interrupted_wait_leaves_the_queue():
+    controller = make_controller(max_concurrent=1)
+    holder = Holder(controller, "user-0")
+    assert holder.admitted.wait(WAIT_SECONDS)
+
+    def interrupted_wait(timeout=None):
+        raise KeyboardInterrupt
+
+    controller._condition.wait = interrupted_wait
+    with pytest.raises(KeyboardInterrupt):
+        with controller.admit("user-1"):
+            pass
+    del controller._condition.wait
+
+    assert controller.metrics()[INTERACTIVE]["queue_depth"] == 0
+    assert controller.metrics()[INTERACTIVE]["running"] == 1
+    holder.release()
+
+
+def test_slot_granted_just_before_interrupt_is_released():
+    controller = make_controller(max_concurrent=1)
+    holder = Holder(controller, "user-0")
+    assert holder.admitted.wait(WAIT_SECONDS)
+    wait = controller._condition.wait
+
+    def interrupted_after_grant(timeout=None):
+        # The holder finishes while we wait, so the interruption lands after the grant
+        wait(timeout)
+        raise KeyboardInterrupt
+
+    controller._condition.wait = interrupted_after_grant
+    threading.Timer(0.05, holder.release).start()
+    with pytest.raises(KeyboardInterrupt):
+        with controller.admit("user-1"):
+            pass
+    del controller._condition.wait
+
+    assert controller.metrics()[INTERACTIVE]["running"] == 0
+    with controller.admit("user-1"):
+        assert controller.metrics()[INTERACTIVE]["running"] == 1
+
+
+def test_slot_granted_just_before_cancellation_is_released():
+    controller = make_controller(max_concurrent=1)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.aadmit("user-0"):
+                await release.wait()
+
+        async def wait_for_slot():
+            async with controller.aadmit("user-1"):
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(wait_for_slot())
+        await asyncio.sleep(0.01)
+        assert controller.metrics()[INTERACTIVE]["queue_depth"] == 1
+
+        # The holder's release grants the waiter's ticket; cancel before its next poll sees it
+        release.set()
+        await holder
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(scenario())
+
+    metrics = controller.metrics()[INTERACTIVE]
+    assert metrics["running"] == 0
+    assert metrics["queue_depth"] == 0
+    with controller.admit("user-1"):
+        pass
@@ -0,0 +1,72 @@
+"""Tests for the agent worker pool (utils/agent_pool.py) and the per-thread memory its workers share"""
+
+from langchain_core.messages import AIMessage
+
+from utils.agent_pool import AgentPool
+from utils.fake_llm import FixtureStore
+
+CHART_QUESTION = "plot outbound by plant"
+FOLLOW_UP = "which plant is highest in the chart?"
+CHART_SQL = "SELECT plant_name, SUM(net_quantity_mt) AS total FROM outbound GROUP BY plant_name"
+
+
+def _tool_call(name, args, call_id):
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}])
+
+
+def _store():
+    store = FixtureStore(None)
+    store.add(CHART_QUESTION, [
+        _tool_call("create_bar_chart", {"data_query": CHART_SQL, "x_column": "plant_name",
+                                        "y_column": "total", "title": "Outbound by plant"}, "chart-1"),
+        AIMessage("Here is the outbound by plant."),
+    ], caller="supply_chain_agent")
+    store.add("hello", [AIMessage("Hi, how can I help?")], caller="supply_chain_agent")
+    store.add(FOLLOW_UP, [
+        _tool_call("analyze_existing_chart_data", {"question": FOLLOW_UP}, "analysis-1"),
+        AIMessage("See the chart analysis."),
+    ], caller="supply_chain_agent")
+    return store
+
+
+def _chart_analysis(agent):
+    """Full result of the last analyze_existing_chart_data call"""
+    results = [result for result in agent.artifacts._items.values()
+               if isinstance(result, dict) and result.get("type") in ("error", "chart_analysis")]
+    return results[-1]
+
+
+def test_threads_on_one_worker_keep_their_own_chart_memory(make_replay_agent):
+    agent = make_replay_agent(_store())
+    pool = AgentPool(size=1, factory=lambda: agent)
+
+    with pool.lease("thread-a") as worker:
+        worker.process_query(CHART_QUESTION, thread_id="thread-a")
+    with pool.lease("thread-b") as worker:
+        worker.process_query("hello", thread_id="thread-b")
+        worker.process_query(FOLLOW_UP, thread_id="thread-b")
+
+    # thread-b never made a chart, so it must not see thread-a's
+    assert agent.get_latest_chart_data("thread-b") is None
+    assert "No recent chart data" in _chart_analysis(agent)["message"]
+
+    with pool.lease("thread-a") as worker:
+        worker.process_query(FOLLOW_UP, thread_id="thread-a")
+    assert agent.get_latest_chart_data("thread-a")["type"] == "bar_chart"
+    assert _chart_analysis(agent)["chart_type"] == "bar_chart"
+
+
+def test_clear_memory_only_clears_its_thread(make_replay_agent):
+    agent = make_replay_agent(_store())
+    pool = AgentPool(size=1, factory=lambda: agent)
+
+    for thread_id in ("thread-a", "thread-b"):
+        with pool.lease(thread_id) as worker:
+            worker.process_query(CHART_QUESTION, thread_id=thread_id)
+    with pool.lease("thread-b") as worker:
+        worker.clear_memory("thread-b")
+
+    assert agent.get_latest_chart_data("thread-b") is None
+    assert agent.get_conversation_history("thread-b") == []
+    assert agent.get_latest_chart_data("thread-a") is not None
+    assert agent.get_conversation_history("thread-a")
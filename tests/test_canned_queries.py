@@ -0,0 +1,108 @@
+"""Tests for the canned query matcher and templates (utils/canned_queries.py)"""
+
+import pytest
+from sqlalchemy import create_engine
+
+from utils.canned_queries import DEFAULT_LIMIT, MAX_LIMIT, TEMPLATES, CannedQueries
+
+PLANTS = ["CHINA-WAREHOUSE", "SINGAPORE-WAREHOUSE"]
+
+
+@pytest.fixture
+def canned():
+    # Plant names are passed in, so matching never touches the database
+    return CannedQueries(engine=None, plants=PLANTS)
+
+
+@pytest.mark.parametrize("question, template, params", [
+    ("What are the top 5 materials by outbound volume?", "top_materials_by_outbound_volume", {"plant": None, "limit": 5}),
+    ("Top 10 plants by inbound volume", "top_plants_by_inbound_volume", {"plant": None, "limit": 10}),
+    ("Which materials have the highest volume?", "top_materials_by_total_volume", {"plant": None, "limit": DEFAULT_LIMIT}),
+    ("Top 500 materials shipped from the China warehouse", "top_materials_by_outbound_volume",
+     {"plant": "CHINA-WAREHOUSE", "limit": MAX_LIMIT}),
+    ("Plot monthly transaction trends", "monthly_transaction_trends", {"plant": None}),
+    ("Monthly inbound vs outbound for Singapore", "monthly_transaction_trends", {"plant": "SINGAPORE-WAREHOUSE"}),
+    ("Inventory by polymer type in Singapore", "inventory_by_polymer", {"plant": "SINGAPORE-WAREHOUSE"}),
+    ("What is the transport cost by mode?", "transport_cost_by_mode", {"plant": None}),
+])
+def test_matches_template_and_params(canned, question, template, params):
+    matched = canned.match(question)
+
+    assert matched is not None
+    assert matched[0].name == template
+    assert matched[1] == params
+
+
+@pytest.mark.parametrize("question", [
+    # The monthly template returns both flows, so single-flow questions go to the agent
+    "Show the monthly outbound volume for the China warehouse",
+    "Monthly inbound trends",
+    "Which plants have the highest storage costs?",
+    "How much would we save by switching transport mode?",
+    "Inventory of MAT-0013 by polymer",
+    "What is the weather in Singapore?",
+])
+def test_uncovered_questions_go_to_the_agent(canned, question):
+    assert canned.match(question) is None
+
+
+@pytest.mark.parametrize("question", [
+    "Top 5 materials shipped last month",
+    "Top 5 materials by outbound volume in 2024",
+    "Top 10 plants by inbound volume since March",
+    "What is the total quantity of MAT-0013 in CHINA-WAREHOUSE?",
+    "Top 5 customers by outbound volume",
+    "Top 5 materials by outbound volume excluding Singapore",
+    "What percent of outbound volume is from the top 5 materials?",
+])
+def test_unsupported_qualifiers_veto_the_match(canned, question):
+    assert canned.match(question) is None
+
+
+@pytest.mark.parametrize("question", [
+    "Inventory by polymer type in CHINA-WAREHOUSE",
+    "Inventory by polymer type in the china warehouse",
+    "Inventory by polymer type in China",
+])
+def test_plant_aliases_resolve_to_stored_name(canned, question):
+    assert canned.match(question)[1]["plant"] == "CHINA-WAREHOUSE"
+
+
+def test_alias_matches_whole_words_only(canned):
+    assert canned.match("Inventory by polymer type in chinatown")[1]["plant"] is None
+
+
+def test_two_plants_go_to_the_agent(canned):
+    assert canned.match("Inventory by polymer type in China and Singapore") is None
+
+
+def test_plant_rankings_scoped_to_one_plant_go_to_the_agent(canned):
+    assert canned.match("Top 5 plants by outbound volume in China") is None
+
+
+def test_match_stats(canned):
+    canned.match("Plot monthly transaction trends")
+    canned.match("Top 5 materials shipped last month")
+
+    assert canned.stats["matched"] == 1
+    assert canned.stats["unmatched"] == 1
+
+
+@pytest.mark.parametrize("template", sorted(TEMPLATES))
+def test_templates_run_against_the_warehouse(warehouse_url, template):
+    canned = CannedQueries(create_engine(warehouse_url))
+
+    df = canned.run(TEMPLATES[template], {"plant": None})
+
+    assert not df.empty
+    assert TEMPLATES[template].summarize(df, TEMPLATES[template].bind({}))
+
+
+def test_answer_includes_chart_when_asked(warehouse_url):
+    canned = CannedQueries(create_engine(warehouse_url))
+
+    response = canned.answer("Plot monthly transaction trends")
+
+    assert response["template"] == "monthly_transaction_trends"
+    assert "chart" in response
+    assert "SELECT" in response["sql_query"].upper()
@@ -0,0 +1,67 @@
+"""Tests for request coalescing (utils/coalescing.py)"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+import sqlalchemy
+from langchain_core.messages import AIMessage, HumanMessage
+
+from utils.coalescing import RequestCoalescer, conversation_fingerprint
+
+FOLLOW_UP = "and for last month?"
+
+
+@pytest.fixture
+def coalescer():
+    engine = sqlalchemy.create_engine("sqlite://")
+    for table in ("inbound", "outbound"):
+        pd.DataFrame({"outbound_date": ["2024/01/02"], "net_quantity_mt": [1.0]}).to_sql(table, engine, index=False)
+    pd.DataFrame({"unrestricted_stock": [1.0]}).to_sql("inventory", engine, index=False)
+    return RequestCoalescer(engine, enabled=True)
+
+
+def test_same_question_same_context_is_coalesced(coalescer):
+    context = conversation_fingerprint([HumanMessage("top plants by outbound"), AIMessage("CHINA-WAREHOUSE")])
+
+    _, first_leader = coalescer.join(FOLLOW_UP, context)
+    _, second_leader = coalescer.join(FOLLOW_UP, context)
+
+    assert first_leader and not second_leader
+
+
+def test_same_question_different_context_runs_separately(coalescer):
+    context_a = conversation_fingerprint([HumanMessage("top plants by outbound"), AIMessage("CHINA-WAREHOUSE")])
+    context_b = conversation_fingerprint([HumanMessage("inbound of MAT-0013"), AIMessage("120 MT")])
+
+    _, first_leader = coalescer.join(FOLLOW_UP, context_a)
+    _, second_leader = coalescer.join(FOLLOW_UP, context_b)
+
+    assert first_leader and second_leader
+    assert coalescer.metrics()["coalesced"] == 0
+
+
+def test_agent_runs_follow_up_once_per_thread_history(make_replay_agent):
+    from utils.fake_llm import FixtureStore
+
+    store = FixtureStore(None)
+    store.add("what is the outbound of china-warehouse?", [AIMessage("China shipped 10 MT.")], caller="supply_chain_agent")
+    store.add("what is the outbound of singapore-warehouse?", [AIMessage("Singapore shipped 7 MT.")], caller="supply_chain_agent")
+    store.add(FOLLOW_UP, [AIMessage("Last month's outbound.")], caller="supply_chain_agent")
+    agent = make_replay_agent(store, latency_seconds=0.3)
+    agent.process_query("What is the outbound of CHINA-WAREHOUSE?", thread_id="thread-a")
+    agent.process_query("What is the outbound of SINGAPORE-WAREHOUSE?", thread_id="thread-b")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        responses = list(executor.map(lambda thread_id: agent.process_query(FOLLOW_UP, thread_id=thread_id),
+                                      ["thread-a", "thread-b"]))
+
+    assert not any(response.get("coalesced") for response in responses)
+    assert agent.coalescer.metrics()["coalesced"] == 0
+
+    # First turns have no context to differ in and are still merged
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        responses = list(executor.map(lambda thread_id: agent.process_query(FOLLOW_UP, thread_id=thread_id),
+                                      ["thread-c", "thread-d"]))
+
+    assert sum(bool(response.get("coalesced")) for response in responses) == 1
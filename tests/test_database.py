@@ -0,0 +1,49 @@
+"""Tests for the request deadline guards of database engines (utils/database.py)"""
+
+from types import SimpleNamespace
+
+import pytest
+import sqlalchemy
+
+from utils.database import _begin, install_deadline_guards
+from utils.deadline import DeadlineExceeded, deadline_scope
+
+
+class _Connection:
+    """Stands in for a Postgres connection, recording the SQL it is given"""
+
+    def __init__(self):
+        self.dialect = SimpleNamespace(name="postgresql")
+        self.statements = []
+
+    def exec_driver_sql(self, statement):
+        self.statements.append(statement)
+
+
+def test_postgres_transaction_gets_local_statement_timeout():
+    conn = _Connection()
+    with deadline_scope(30):
+        _begin(conn)
+
+    assert len(conn.statements) == 1
+    assert conn.statements[0].startswith("SET LOCAL statement_timeout = ")
+    assert 29000 <= int(conn.statements[0].rsplit(" ", 1)[1]) <= 30000
+
+
+def test_no_statement_timeout_without_deadline():
+    conn = _Connection()
+    _begin(conn)
+
+    assert conn.statements == []
+
+
+def test_statements_of_cancelled_request_are_refused():
+    engine = sqlalchemy.create_engine("sqlite://")
+    install_deadline_guards(engine)
+
+    with deadline_scope(30) as deadline:
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT 1").scalar() == 1
+            deadline.cancel()
+            with pytest.raises(DeadlineExceeded):
+                conn.exec_driver_sql("SELECT 2")
@@ -0,0 +1,111 @@
+"""Tests for conversation history compaction (utils/history.py)"""
+
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES, add_messages
+
+from utils.history import SUMMARY_MESSAGE_ID, ConversationHistory
+
+WINDOW_TURNS = 2
+
+
+def run_turn(history: ConversationHistory, stored, n: int):
+    """One agent turn as the graph stores it: question, tool call and response, answer"""
+    graph_input, start = history.prepare(stored, [HumanMessage(content=f"question {n}")])
+    stored = add_messages(stored, graph_input)
+    assert stored[start].content == f"question {n}"
+    return add_messages(stored, [
+        AIMessage(content="", tool_calls=[{"name": "analyze_supply_chain_data", "args": {"query": f"q{n}"}, "id": f"call-{n}"}]),
+        ToolMessage(content=f"rows for {n}", tool_call_id=f"call-{n}"),
+        AIMessage(content=f"answer {n}"),
+    ])
+
+
+def summary_of(messages):
+    return next((m for m in messages if isinstance(m, SystemMessage) and m.id == SUMMARY_MESSAGE_ID), None)
+
+
+def test_prepare_replaces_the_stored_messages():
+    history = ConversationHistory(window_turns=WINDOW_TURNS)
+
+    graph_input, start = history.prepare([], [HumanMessage(content="question 0")])
+
+    assert isinstance(graph_input[0], RemoveMessage)
+    assert graph_input[0].id == REMOVE_ALL_MESSAGES
+    assert start == 0
+
+
+def test_stored_messages_stay_bounded():
+    history = ConversationHistory(window_turns=WINDOW_TURNS, summary_tokens=10_000)
+    stored = []
+    sizes = []
+
+    for n in range(12):
+        stored = run_turn(history, stored, n)
+        sizes.append(len(stored))
+
+    # Summary + condensed window turns + the current turn with its tool traffic
+    assert max(sizes) == 1 + 2 * WINDOW_TURNS + 4
+    assert sizes[-1] == sizes[-2]
+
+
+def test_summary_is_carried_forward():
+    history = ConversationHistory(window_turns=WINDOW_TURNS, summary_tokens=10_000)
+    stored = []
+
+    for n in range(8):
+        stored = run_turn(history, stored, n)
+
+    summary = summary_of(stored)
+    assert summary is not None
+    # Turns 0-4 left the window (5, 6 are in it, 7 is the current turn), each folded in once
+    for n in range(5):
+        assert summary.content.count(f"User: question {n} | Assistant: answer {n}") == 1
+    assert "question 5" not in summary.content
+    assert len([m for m in stored if isinstance(m, SystemMessage)]) == 1
+
+
+def test_window_drops_tool_traffic_of_finished_turns():
+    history = ConversationHistory(window_turns=WINDOW_TURNS)
+    stored = []
+    for n in range(3):
+        stored = run_turn(history, stored, n)
+
+    compacted = history.compact(stored)
+
+    assert not any(isinstance(m, ToolMessage) for m in compacted)
+    assert [m.content for m in compacted if not isinstance(m, SystemMessage)] == [
+        "question 1", "answer 1", "question 2", "answer 2"
+    ]
+
+
+def test_summary_drops_oldest_lines_over_budget():
+    history = ConversationHistory(window_turns=1, summary_tokens=40)
+    stored = []
+
+    for n in range(30):
+        stored = run_turn(history, stored, n)
+
+    summary = summary_of(stored).content
+    assert "question 0 " not in summary
+    # Turn 28 is in the window, 29 is the current turn
+    assert "question 27" in summary
+    assert len(summary) < 400
+
+
+def test_agent_checkpoint_stays_bounded(make_replay_agent):
+    from utils.fake_llm import FixtureStore
+
+    questions = [f"what is the outbound of china-warehouse in week {n}?" for n in range(6)]
+    store = FixtureStore(None)
+    for n, question in enumerate(questions):
+        store.add(question, [AIMessage(f"Week {n} outbound was {n} MT.")], caller="supply_chain_agent")
+    agent = make_replay_agent(store)
+    agent.history = ConversationHistory(window_turns=WINDOW_TURNS)
+
+    for question in questions:
+        agent.process_query(question, thread_id="history")
+
+    stored = agent.app.get_state({"configurable": {"thread_id": "history"}}).values["messages"]
+    assert len(stored) <= 1 + 2 * (WINDOW_TURNS + 1)
+    assert "week 0" in summary_of(stored).content
+    assert stored[-1].content == "Week 5 outbound was 5 MT."
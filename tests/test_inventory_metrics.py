@@ -0,0 +1,85 @@
+"""Tests for the inventory metrics engine (utils/inventory_metrics.py)"""
+
+import pandas as pd
+import pytest
+import sqlalchemy
+
+import utils.inventory_metrics as inventory_metrics
+from utils.inventory_metrics import INVENTORY_METRICS_TABLE, InventoryMetricsEngine
+from utils.warehouse_data import format_transaction_date
+
+PLANTS = ["CHINA-WAREHOUSE", "SINGAPORE-WAREHOUSE"]
+MATERIALS = ["MAT-0001", "MAT-0002", "MAT-0003"]
+
+
+def outbound_rows(dates, plants=PLANTS, materials=MATERIALS, scale: float = 1.0) -> pd.DataFrame:
+    rows = [
+        {
+            "outbound_date": format_transaction_date(date),
+            "plant_name": plant,
+            "mode_of_transport": "Truck",
+            "material_name": material,
+            "customer_number": f"CST-{i:05d}",
+            "net_quantity_mt": scale * (1 + (i * 7) % 5),
+        }
+        for i, (date, plant, material) in enumerate(
+            (date, plant, material) for date in dates for plant in plants for material in materials
+        )
+    ]
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'warehouse.db'}")
+    outbound_rows(pd.date_range("2024-01-01", "2024-03-31", freq="2D")).to_sql("outbound", engine, index=False)
+    inventory = pd.DataFrame([
+        {"balance_as_of_date": date, "plant_name": plant, "material_name": material, "unrestricted_stock": 50_000.0 + i}
+        for i, (date, plant, material) in enumerate(
+            (date, plant, material)
+            for date in ("02/29/2024", "03/31/2024")
+            for plant in PLANTS for material in MATERIALS
+        )
+    ])
+    inventory.to_sql("inventory", engine, index=False)
+    return engine
+
+
+def test_incremental_load_matches_full_recompute(engine, monkeypatch):
+    metrics_engine = InventoryMetricsEngine(engine)
+    metrics_engine.refresh(full=True)
+    watermark = metrics_engine._watermark
+
+    # Late rows for the watermark day, new days past it, and a material never shipped before
+    pd.concat([
+        outbound_rows([watermark], scale=0.5),
+        outbound_rows(pd.date_range(watermark + pd.Timedelta(days=1), periods=20, freq="D")),
+        outbound_rows(pd.date_range(watermark + pd.Timedelta(days=1), periods=5, freq="D"), materials=["MAT-0099"]),
+    ]).to_sql("outbound", engine, index=False, if_exists="append")
+
+    loads = []
+    load_outbound = inventory_metrics.load_outbound
+
+    def recording_load_outbound(engine, since=None):
+        df = load_outbound(engine, since=since)
+        loads.append((since, len(df)))
+        return df
+
+    monkeypatch.setattr(inventory_metrics, "load_outbound", recording_load_outbound)
+    incremental = metrics_engine.refresh()
+    full = InventoryMetricsEngine(engine, publish=False).refresh(full=True)
+
+    assert loads[0][0] == format_transaction_date(watermark)
+    assert loads[0][1] < loads[1][1]
+    assert metrics_engine._watermark == watermark + pd.Timedelta(days=20)
+    assert "MAT-0099" in set(incremental["material_name"])
+    pd.testing.assert_frame_equal(incremental, full)
+
+
+def test_refresh_publishes_table(engine):
+    metrics = InventoryMetricsEngine(engine).refresh(full=True)
+
+    published = pd.read_sql_query(f"SELECT * FROM {INVENTORY_METRICS_TABLE}", engine)
+
+    assert len(published) == len(metrics) == len(PLANTS) * len(MATERIALS)
+    assert (published["days_of_supply"] > 0).all()
@@ -0,0 +1,41 @@
+"""Tests for the local intent router (agent/local_router.py)"""
+
+import pytest
+
+from agent.local_router import (
+    CALIBRATION_EXAMPLES, CONFIDENCE_THRESHOLD, SEED_EXAMPLES, LocalIntentRouter, calibrate_threshold
+)
+
+
+@pytest.fixture(scope="module")
+def router():
+    return LocalIntentRouter(examples=SEED_EXAMPLES)
+
+
+@pytest.mark.parametrize("question", [
+    "What are our best selling materials?",
+    "What is the downgrade value lost percent for P-001 materials?",
+    "What is the stock level of MAT-0102 today?",
+])
+def test_data_questions_not_confidently_knowledge(router, question):
+    intent, confidence = router.classify(question)
+
+    assert not (intent == "knowledge_question" and confidence >= CONFIDENCE_THRESHOLD)
+
+
+def test_data_vocabulary_vetoes_knowledge_rules(router):
+    votes = router.rule_votes("What are our best selling materials?")
+
+    assert votes[1] == 0
+
+
+@pytest.mark.parametrize("question", ["Define safety stock", "What is Butyl?"])
+def test_concept_questions_keep_knowledge_rules(router, question):
+    assert router.classify(question)[0] == "knowledge_question"
+
+
+def test_threshold_meets_target_on_calibration_set(router):
+    calibration = calibrate_threshold(router, CALIBRATION_EXAMPLES)
+
+    assert CONFIDENCE_THRESHOLD >= calibration["threshold"]
+    assert calibration["accuracy_at_threshold"] >= 0.98
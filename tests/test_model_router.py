@@ -0,0 +1,52 @@
+"""Tests for tiered model routing and escalation (utils/model_router.py)"""
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from utils.fake_llm import FixtureStore, ReplayChatModel
+from utils.model_router import ModelRouter, ModelTier
+
+QUESTION = "which materials have the lowest coverage?"
+STRONG_ANSWER = "MAT-0008 has the lowest coverage."
+
+
+def _routed_agent(make_replay_agent, fast_steps):
+    """Agent whose fast tier replays fast_steps and whose standard tier answers STRONG_ANSWER"""
+    fast_store, standard_store = FixtureStore(None), FixtureStore(None)
+    fast_store.add(QUESTION, fast_steps)
+    standard_store.add(QUESTION, [AIMessage(STRONG_ANSWER)])
+    agent = make_replay_agent(FixtureStore(None))
+    agent.model_router = ModelRouter(
+        tiers=[ModelTier("fast", ReplayChatModel(store=fast_store, model="fast"), max_complexity=1.0),
+               ModelTier("standard", ReplayChatModel(store=standard_store, model="standard"))],
+        llm_pool=agent.llm_pool,
+        enabled=True
+    )
+    return agent
+
+
+def test_run_without_tool_calls_escalates(make_replay_agent):
+    agent = _routed_agent(make_replay_agent, [AIMessage("")])
+
+    response = agent.process_query(QUESTION, thread_id="escalate")
+
+    assert response["content"] == STRONG_ANSWER
+    metrics = agent.model_router.metrics()
+    assert metrics["fast"]["escalations"] == 1
+    # The discarded run left nothing in the thread
+    history = agent.get_conversation_history("escalate")
+    assert [type(m) for m in history] == [HumanMessage, AIMessage]
+    assert history[-1].content == STRONG_ANSWER
+
+
+def test_run_with_tool_calls_is_not_repeated(make_replay_agent):
+    tool_call = AIMessage(content="", tool_calls=[
+        {"name": "get_inventory_coverage", "args": {"limit": 3}, "id": "coverage-1"}
+    ])
+    agent = _routed_agent(make_replay_agent, [tool_call, AIMessage("")])
+
+    agent.process_query(QUESTION, thread_id="no-escalate")
+
+    metrics = agent.model_router.metrics()
+    assert metrics["fast"]["failures"] == 1
+    assert metrics["fast"]["escalations"] == 0
+    assert metrics["standard"]["runs"] == 0
@@ -0,0 +1,178 @@
+"""Tests for the semantic NL-to-SQL cache (utils/sql_cache.py)"""
+
+import time
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+import sqlalchemy
+from langchain_core.messages import AIMessage
+
+from utils.artifacts import ArtifactStore
+from utils.database import QueryCapturingSQLDatabase, query_scope
+from utils.fake_llm import FixtureStore, replay_factory
+from utils.llm_pool import LLMClientPool
+from utils.sql_cache import SemanticSQLCache, compute_schema_version
+from utils.warehouse_data import cached_data_version, data_version
+
+TOTALS_SQL = "SELECT plant_name, SUM(net_quantity_mt) AS total FROM outbound GROUP BY plant_name"
+MODEL_LATENCY_SECONDS = 0.3
+
+
+def _load_tables(engine):
+    pd.DataFrame({
+        "outbound_date": ["2024/01/02"] * 10,
+        "plant_name": ["CHINA-WAREHOUSE", "SINGAPORE-WAREHOUSE"] * 5,
+        "net_quantity_mt": np.arange(10, dtype=float)
+    }).to_sql("outbound", engine, index=False)
+    pd.DataFrame({"net_quantity_mt": [1.0]}).to_sql("inbound", engine, index=False)
+    pd.DataFrame({"unrestricted_stock": [1.0]}).to_sql("inventory", engine, index=False)
+
+
+@pytest.fixture
+def engine():
+    engine = sqlalchemy.create_engine("sqlite://")
+    _load_tables(engine)
+    return engine
+
+
+@pytest.fixture
+def cache(engine):
+    # Re-read the data version on every check, so appended rows are seen right away
+    return SemanticSQLCache(schema_version=compute_schema_version(engine), version_ttl_seconds=0)
+
+
+def test_hit_above_threshold(cache):
+    cache.store("total outbound by plant", TOTALS_SQL, "Outbound totals per plant.")
+
+    entry = cache.lookup("outbound totals per plant")
+
+    assert entry is not None
+    assert entry["sql_query"] == TOTALS_SQL
+    assert entry["similarity"] >= cache.threshold
+    assert cache.stats["hits"] == 1
+
+
+def test_miss_below_threshold(cache):
+    cache.store("total outbound by plant", TOTALS_SQL)
+
+    assert cache.lookup("average inventory coverage of each material") is None
+    assert cache.stats["misses"] == 1
+
+
+def test_miss_when_literals_differ(cache):
+    cache.store("top 5 materials by outbound", TOTALS_SQL + " LIMIT 5")
+
+    assert cache.lookup("top 10 materials by outbound") is None
+
+
+def test_answer_refreshed_when_data_version_changes(cache, engine):
+    cache.store("total outbound by plant", TOTALS_SQL, "Outbound totals per plant.", data_version(engine))
+    assert cache.answer_from_cache("total outbound by plant", engine)["text"] == "Outbound totals per plant."
+
+    pd.DataFrame({
+        "outbound_date": ["2024/02/01"],
+        "plant_name": ["MALAYSIA-WAREHOUSE"],
+        "net_quantity_mt": [5.0]
+    }).to_sql("outbound", engine, index=False, if_exists="append")
+    result = cache.answer_from_cache("total outbound by plant", engine)
+
+    # Cached SQL re-run on the new data; the stale answer text is not reused
+    assert result["text"] == "Query returned 3 rows."
+    assert len(result["dataframe"]) == 3
+
+
+def test_data_version_reused_within_ttl(engine):
+    version = cached_data_version(engine, ttl_seconds=60)
+    pd.DataFrame({"net_quantity_mt": [2.0]}).to_sql("inbound", engine, index=False, if_exists="append")
+
+    # No table scan within the TTL; a zero TTL reads the new fingerprint
+    assert cached_data_version(engine, ttl_seconds=60) == version
+    assert cached_data_version(engine, ttl_seconds=0) == data_version(engine) != version
+
+
+def test_invalidate_on_schema_change(cache):
+    cache.store("total outbound by plant", TOTALS_SQL)
+
+    cache.invalidate(schema_version="new-schema")
+
+    assert cache.lookup("total outbound by plant") is None
+
+
+def test_lru_eviction(engine):
+    cache = SemanticSQLCache(schema_version=compute_schema_version(engine), max_entries=2)
+    cache.store("total outbound by plant", TOTALS_SQL)
+    cache.store("inventory stock by material", "SELECT material_name, SUM(unrestricted_stock) FROM inventory GROUP BY 1")
+    # Touch the first entry so the second is the least recently used
+    assert cache.lookup("total outbound by plant") is not None
+
+    cache.store("inbound quantity by month", "SELECT SUBSTR(inbound_date, 1, 7), SUM(net_quantity_mt) FROM inbound GROUP BY 1")
+
+    assert cache.lookup("inventory stock by material") is None
+    assert cache.lookup("total outbound by plant") is not None
+    assert cache.lookup("inbound quantity by month") is not None
+
+
+def test_concurrent_store_and_lookup(engine):
+    cache = SemanticSQLCache(schema_version=compute_schema_version(engine), max_entries=20)
+    errors = []
+
+    def worker(number):
+        try:
+            for i in range(50):
+                cache.store(f"outbound of plant {number} week {i}", TOTALS_SQL)
+                cache.lookup(f"outbound of plant {number} week {i}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(cache._entries) == 20
+
+
+def test_hit_skips_the_sql_agent_model(tmp_path):
+    """A repeated question is answered from the cache without the SQL agent's model round trips"""
+    from utils.tools import create_supply_chain_tools
+
+    url = f"sqlite:///{tmp_path / 'warehouse.db'}"
+    _load_tables(sqlalchemy.create_engine(url))
+    question = "sum of outbound quantity for each plant"
+    store = FixtureStore(None)
+    # The SQL agent prompt ends with one message after the user's question
+    store.add(question, [
+        AIMessage(content="", tool_calls=[{"name": "sql_db_query", "args": {"query": TOTALS_SQL}, "id": "query-1"}]),
+        AIMessage("CHINA-WAREHOUSE shipped 20 MT and SINGAPORE-WAREHOUSE 25 MT."),
+    ], caller="sql_agent", start_step=1)
+    pool = LLMClientPool(
+        factory=replay_factory(store, latency_seconds=MODEL_LATENCY_SECONDS),
+        requests_per_minute=6000,
+        requires_api_key=False
+    )
+    db = QueryCapturingSQLDatabase.from_uri(url)
+    agent = SimpleNamespace(artifacts=ArtifactStore(), sql_cache=SemanticSQLCache(compute_schema_version(db._engine)))
+    analyze_tool = create_supply_chain_tools(db=db, llm=pool.get_chat_model("sql_agent"), memory=None, agent=agent)[0]
+
+    def ask(call_id):
+        start_time = time.perf_counter()
+        with query_scope():
+            message = analyze_tool.invoke({"type": "tool_call", "name": analyze_tool.name, "args": {"query": question}, "id": call_id})
+        return agent.artifacts.get(message.artifact), time.perf_counter() - start_time
+
+    miss, miss_seconds = ask("miss")
+    model_calls = pool.usage()["sql_agent"]["calls"]
+    hit, hit_seconds = ask("hit")
+
+    assert model_calls == 2
+    assert miss["sql_query"] == TOTALS_SQL
+    assert agent.sql_cache.stats["hits"] == 1
+    assert pool.usage()["sql_agent"]["calls"] == model_calls
+    assert hit["sql_query"] == TOTALS_SQL and hit["text"] == miss["text"]
+    assert miss_seconds >= 2 * MODEL_LATENCY_SECONDS
+    assert hit_seconds < miss_seconds / 5
@@ -0,0 +1,170 @@
+"""
+ABC/XYZ Classification Engine
+
+This module classifies materials and customers per plant from the outbound history:
+- ABC by cumulative share of outbound volume (A = top ~80%, B = next ~15%, C = rest)
+- XYZ by coefficient of variation of monthly demand (X = stable, Y = variable, Z = erratic)
+
+Results are computed with vectorized pandas, cached per (entity, month, data version)
+and published to the abc_xyz_classification table.
+"""
+
+import time
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from .warehouse_data import load_outbound, cached_data_version
+
+ABC_XYZ_TABLE = "abc_xyz_classification"
+
+# entity type -> outbound column
+ENTITY_COLUMNS = {
+    "material": "material_name",
+    "customer": "customer_number",
+}
+
+A_SHARE = 0.80
+B_SHARE = 0.95
+X_MAX_CV = 0.5
+Y_MAX_CV = 1.0
+DEFAULT_HISTORY_MONTHS = 12
+
+
+def classify_abc_xyz(
+    outbound: pd.DataFrame,
+    entity: str = "material",
+    month: Optional[str] = None,
+    history_months: int = DEFAULT_HISTORY_MONTHS
+) -> pd.DataFrame:
+    """
+    Classify entities per plant over the trailing history ending at month.
+
+    Args:
+        outbound: Outbound rows from load_outbound()
+        entity: 'material' or 'customer'
+        month: Last month of the history ('YYYY-MM'), defaults to the last complete month
+        history_months: Number of months used for both volume share and demand variability
+
+    Returns:
+        DataFrame with plant_name, entity, total volume, cumulative share, CV and ABC/XYZ classes
+    """
+    if entity not in ENTITY_COLUMNS:
+        raise ValueError(f"Unknown entity '{entity}', expected one of {list(ENTITY_COLUMNS)}")
+    column = ENTITY_COLUMNS[entity]
+
+    end_month = pd.Period(month, freq="M") if month else default_month(outbound)
+    months = pd.period_range(end=end_month, periods=history_months, freq="M")
+
+    df = outbound[[column, "plant_name", "net_quantity_mt"]].copy()
+    df["month"] = outbound["outbound_date"].dt.to_period("M")
+    df = df[df["month"].isin(months)]
+
+    # Monthly demand matrix per plant x entity, with zero-demand months filled in
+    monthly = (
+        df.groupby(["plant_name", column, "month"])["net_quantity_mt"].sum()
+        .unstack("month")
+        .reindex(columns=months, fill_value=0.0)
+        .fillna(0.0)
+    )
+    demand = monthly.to_numpy()
+    total = demand.sum(axis=1)
+    mean = demand.mean(axis=1)
+    std = demand.std(axis=1)
+
+    result = monthly.index.to_frame(index=False).rename(columns={column: "entity"})
+    result["total_volume_mt"] = total
+    result["avg_monthly_mt"] = mean
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result["demand_cv"] = np.where(mean > 0, std / mean, np.nan)
+
+    # ABC: share of plant volume accumulated before each entity, largest first
+    result = result.sort_values(["plant_name", "total_volume_mt"], ascending=[True, False]).reset_index(drop=True)
+    plant_total = result.groupby("plant_name")["total_volume_mt"].transform("sum")
+    result["volume_share"] = result["total_volume_mt"] / plant_total
+    result["cumulative_share"] = result.groupby("plant_name")["volume_share"].cumsum()
+    share_before = result["cumulative_share"] - result["volume_share"]
+    result["abc_class"] = np.select([share_before < A_SHARE, share_before < B_SHARE], ["A", "B"], default="C")
+
+    cv = result["demand_cv"].to_numpy()
+    result["xyz_class"] = np.select([cv <= X_MAX_CV, cv <= Y_MAX_CV], ["X", "Y"], default="Z")
+    result["abc_xyz_class"] = result["abc_class"] + result["xyz_class"]
+
+    result.insert(0, "entity_type", entity)
+    result.insert(0, "month", str(end_month))
+    result["history_months"] = history_months
+    return result
+
+
+def default_month(outbound: pd.DataFrame) -> pd.Period:
+    """Last complete month of the outbound history"""
+    last_date = outbound["outbound_date"].max()
+    return (last_date + pd.Timedelta(days=1)).to_period("M") - 1
+
+
+class ABCXYZClassifier:
+    """
+    Caches ABC/XYZ results per (entity, month) for the current data version.
+
+    Outbound history is loaded once per data version; the cache is dropped when
+    the data fingerprint changes.
+    """
+
+    def __init__(self, engine, history_months: int = DEFAULT_HISTORY_MONTHS, publish: bool = True):
+        self.engine = engine
+        self.history_months = history_months
+        self.publish = publish
+        self._cache: Dict[Tuple[str, str], pd.DataFrame] = {}
+        self._outbound: Optional[pd.DataFrame] = None
+        self._data_version: Optional[str] = None
+
+    def _ensure_current(self):
+        """Drop cached results and reload outbound history when the data changed"""
+        version = cached_data_version(self.engine)
+        if version != self._data_version:
+            self._outbound = load_outbound(self.engine)
+            self._cache.clear()
+            self._data_version = version
+
+    def classify(self, entity: str = "material", month: Optional[str] = None) -> pd.DataFrame:
+        """
+        Get the classification for an entity type and month, computing it on a cache miss.
+
+        Args:
+            entity: 'material' or 'customer'
+            month: 'YYYY-MM', defaults to the last complete month
+
+        Returns:
+            Classification DataFrame (see classify_abc_xyz)
+        """
+        self._ensure_current()
+        month_key = month or str(default_month(self._outbound))
+        cache_key = (entity, month_key)
+
+        if cache_key not in self._cache:
+            start_time = time.time()
+            self._cache[cache_key] = classify_abc_xyz(self._outbound, entity, month_key, self.history_months)
+            if self.publish:
+                self._publish()
+            execution_time = time.time() - start_time
+            logger.info(f"ABC/XYZ classification computed for {entity} {month_key}: {len(self._cache[cache_key])} rows in {execution_time:.2f}s")
+
+        return self._cache[cache_key]
+
+    def _publish(self):
+        """Write all cached classifications to the database table"""
+        try:
+            table = pd.concat(self._cache.values(), ignore_index=True)
+            table.to_sql(ABC_XYZ_TABLE, self.engine, if_exists="replace", index=False)
+        except Exception as e:
+            logger.error(f"Publishing {ABC_XYZ_TABLE} failed: {e}")
+
+
+if __name__ == "__main__":
+    from .database import create_database_connection
+
+    db = create_database_connection()
+    classifier = ABCXYZClassifier(db._engine)
+    for entity_type in ENTITY_COLUMNS:
+        print(classifier.classify(entity_type).groupby(["plant_name", "abc_xyz_class"]).size())
@@ -0,0 +1,290 @@
+"""
+Admission Control
+
+Scheduler in front of the chat agent and the sidebar reports. Requests are
+admitted into a limited number of running slots by priority class:
+- interactive: chat questions and follow-ups, always scheduled first
+- batch: long analytical reports (throughput, forecast, capacity check), which
+  may hold at most a share of the slots so they cannot starve chat requests
+
+Each user (chat session) can run a limited number of requests at once; their
+further requests wait behind other users'. Queues are bounded per class, and a
+request is shed when its queue is full or it waited longer than the class
+allows. Callers turn the AdmissionRejected error into a "busy" response
+(busy_response) instead of letting requests pile up behind LLM quota and
+database connections.
+
+Configure with ADMISSION_MAX_CONCURRENT (default 4), ADMISSION_MAX_PER_USER
+(default 1), ADMISSION_BATCH_MAX_CONCURRENT (default 2), and per-class queue
+sizes and wait limits:
+    ADMISSION_MAX_QUEUE="interactive=32,batch=8"
+    ADMISSION_MAX_WAIT_SECONDS="interactive=30,batch=120"
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Any, Dict, Iterator, AsyncIterator, Optional
+
+import numpy as np
+from loguru import logger
+
+from .stage_timing import record_stage
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+# Scheduling order
+PRIORITY_CLASSES = (INTERACTIVE, BATCH)
+
+ADMISSION_MAX_CONCURRENT = int(os.environ.get("ADMISSION_MAX_CONCURRENT", "4"))
+ADMISSION_MAX_PER_USER = int(os.environ.get("ADMISSION_MAX_PER_USER", "1"))
+ADMISSION_BATCH_MAX_CONCURRENT = int(os.environ.get("ADMISSION_BATCH_MAX_CONCURRENT", "2"))
+DEFAULT_MAX_QUEUE = {INTERACTIVE: 32, BATCH: 8}
+DEFAULT_MAX_WAIT_SECONDS = {INTERACTIVE: 30.0, BATCH: 120.0}
+ADMISSION_POLL_SECONDS = 0.05
+# Recent waits and run times kept for the metrics
+RECENT_SAMPLES = 1000
+
+
+def class_settings_from_env(name: str, defaults: Dict[str, float]) -> Dict[str, float]:
+    """Per-class numbers from NAME="interactive=32,batch=8", falling back to the defaults"""
+    settings = dict(defaults)
+    for pair in os.environ.get(name, "").split(","):
+        if "=" in pair:
+            priority, value = pair.split("=", 1)
+            settings[priority.strip()] = float(value)
+    return settings
+
+
+class AdmissionRejected(RuntimeError):
+    """A request was shed: its queue was full or it waited too long"""
+
+    def __init__(self, message: str, priority: str, reason: str, retry_after_seconds: float):
+        super().__init__(message)
+        self.priority = priority
+        self.reason = reason
+        self.retry_after_seconds = retry_after_seconds
+
+
+def busy_response(error: AdmissionRejected) -> Dict[str, Any]:
+    """Chat response telling the user to retry later"""
+    return {
+        "type": "error",
+        "content": f"The assistant is busy right now, please try again in {error.retry_after_seconds:.0f}s.",
+        "busy": True,
+        "retry_after_seconds": error.retry_after_seconds,
+    }
+
+
+class _Ticket:
+    def __init__(self, user_id: str, priority: str):
+        self.user_id = user_id
+        self.priority = priority
+        self.enqueued = time.perf_counter()
+        self.granted = False
+
+
+class AdmissionController:
+    """Bounded priority queues with global, per-class and per-user concurrency limits"""
+
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        max_per_user: int = ADMISSION_MAX_PER_USER,
+        batch_max_concurrent: int = ADMISSION_BATCH_MAX_CONCURRENT,
+        max_queue: Optional[Dict[str, float]] = None,
+        max_wait_seconds: Optional[Dict[str, float]] = None
+    ):
+        """
+        Args:
+            max_concurrent: Requests running at once
+            max_per_user: Requests one user can run at once
+            batch_max_concurrent: Running slots batch requests can hold
+            max_queue: Waiting requests allowed per class
+            max_wait_seconds: Longest wait per class before a request is shed
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_user = max(1, max_per_user)
+        self.class_limits = {INTERACTIVE: self.max_concurrent, BATCH: max(1, min(batch_max_concurrent, self.max_concurrent))}
+        self.max_queue = max_queue or class_settings_from_env("ADMISSION_MAX_QUEUE", DEFAULT_MAX_QUEUE)
+        self.max_wait_seconds = max_wait_seconds or class_settings_from_env("ADMISSION_MAX_WAIT_SECONDS", DEFAULT_MAX_WAIT_SECONDS)
+
+        self._condition = threading.Condition()
+        self._queues: Dict[str, deque] = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._running = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._running_by_user: Dict[str, int] = {}
+        self._waits = {priority: deque(maxlen=RECENT_SAMPLES) for priority in PRIORITY_CLASSES}
+        self._run_seconds: deque = deque(maxlen=RECENT_SAMPLES)
+        self.stats = {
+            priority: {"admitted": 0, "rejected": 0, "timeouts": 0, "max_queue_depth": 0}
+            for priority in PRIORITY_CLASSES
+        }
+
+    def _check_priority(self, priority: str):
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority} (expected one of {', '.join(PRIORITY_CLASSES)})")
+
+    def _retry_after(self) -> float:
+        """Rough time until a slot frees up: the recent mean run time (lock held)"""
+        mean = float(np.mean(self._run_seconds)) if self._run_seconds else 1.0
+        return max(1.0, mean)
+
+    def _grant(self):
+        """Admit waiting requests into free slots, interactive first, FIFO within a class (lock held)"""
+        granted = False
+        for priority in PRIORITY_CLASSES:
+            queue = self._queues[priority]
+            for ticket in list(queue):
+                if sum(self._running.values()) >= self.max_concurrent:
+                    break
+                if self._running[priority] >= self.class_limits[priority]:
+                    break
+                if self._running_by_user.get(ticket.user_id, 0) >= self.max_per_user:
+                    continue
+                queue.remove(ticket)
+                ticket.granted = True
+                self._running[priority] += 1
+                self._running_by_user[ticket.user_id] = self._running_by_user.get(ticket.user_id, 0) + 1
+                granted = True
+        if granted:
+            self._condition.notify_all()
+
+    def _enqueue(self, user_id: str, priority: str) -> _Ticket:
+        self._check_priority(priority)
+        queue = self._queues[priority]
+        if len(queue) >= self.max_queue.get(priority, 0):
+            self.stats[priority]["rejected"] += 1
+            logger.warning(f"Admission rejected ({priority} queue full, {len(queue)} waiting) for user {user_id}")
+            raise AdmissionRejected(
+                f"Too many {priority} requests waiting ({len(queue)})", priority, "queue_full", self._retry_after()
+            )
+        ticket = _Ticket(user_id, priority)
+        queue.append(ticket)
+        self.stats[priority]["max_queue_depth"] = max(self.stats[priority]["max_queue_depth"], len(queue))
+        self._grant()
+        return ticket
+
+    def _abandon(self, ticket: _Ticket, timed_out: bool):
+        """Remove a ticket that stopped waiting (lock held)"""
+        queue = self._queues[ticket.priority]
+        if ticket.granted or ticket not in queue:
+            return
+        queue.remove(ticket)
+        if timed_out:
+            waited = time.perf_counter() - ticket.enqueued
+            self.stats[ticket.priority]["timeouts"] += 1
+            logger.warning(f"Admission timed out after {waited:.1f}s ({ticket.priority}) for user {ticket.user_id}")
+            raise AdmissionRejected(
+                f"Waited {waited:.0f}s for a free slot", ticket.priority, "timeout", self._retry_after()
+            )
+
+    def _admitted(self, ticket: _Ticket):
+        waited = time.perf_counter() - ticket.enqueued
+        with self._condition:
+            self._waits[ticket.priority].append(waited)
+            self.stats[ticket.priority]["admitted"] += 1
+        record_stage("admission_wait", waited)
+
+    def _release(self, ticket: _Ticket, started: float):
+        with self._condition:
+            self._running[ticket.priority] -= 1
+            remaining = self._running_by_user.get(ticket.user_id, 1) - 1
+            if remaining > 0:
+                self._running_by_user[ticket.user_id] = remaining
+            else:
+                self._running_by_user.pop(ticket.user_id, None)
+            self._run_seconds.append(time.perf_counter() - started)
+            self._grant()
+
+    @contextmanager
+    def admit(self, user_id: str, priority: str = INTERACTIVE) -> Iterator[None]:
+        """
+        Run the block once the request is admitted
+
+        Args:
+            user_id: Per-user limit key (the chat session's thread_id)
+            priority: INTERACTIVE or BATCH
+
+        Raises:
+            AdmissionRejected: The class's queue is full or the wait exceeded its limit
+        """
+        with self._condition:
+            ticket = self._enqueue(user_id, priority)
+            deadline = ticket.enqueued + self.max_wait_seconds.get(priority, 0)
+            try:
+                while not ticket.granted:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._abandon(ticket, timed_out=True)
+                    self._condition.wait(remaining)
+            except BaseException:
+                self._abandon(ticket, timed_out=False)
+                if ticket.granted:
+                    # Admitted just before the interruption
+                    self._release(ticket, time.perf_counter())
+                raise
+        self._admitted(ticket)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(ticket, started)
+
+    @asynccontextmanager
+    async def aadmit(self, user_id: str, priority: str = INTERACTIVE) -> AsyncIterator[None]:
+        """admit() for event loop callers (polls instead of holding a worker thread)"""
+        with self._condition:
+            ticket = self._enqueue(user_id, priority)
+        deadline = ticket.enqueued + self.max_wait_seconds.get(priority, 0)
+        try:
+            while not ticket.granted:
+                if time.perf_counter() >= deadline:
+                    with self._condition:
+                        self._abandon(ticket, timed_out=True)
+                await asyncio.sleep(ADMISSION_POLL_SECONDS)
+        except asyncio.CancelledError:
+            with self._condition:
+                self._abandon(ticket, timed_out=False)
+            if ticket.granted:
+                # Admitted just before the cancellation landed
+                self._release(ticket, time.perf_counter())
+            raise
+        self._admitted(ticket)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(ticket, started)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, running requests, wait-time percentiles (ms) and totals per class"""
+        with self._condition:
+            report = {}
+            for priority in PRIORITY_CLASSES:
+                waits = np.array(self._waits[priority]) * 1000
+                report[priority] = {
+                    **self.stats[priority],
+                    "queue_depth": len(self._queues[priority]),
+                    "running": self._running[priority],
+                    "wait_ms": {
+                        f"p{p}": round(float(np.percentile(waits, p)), 1) if len(waits) else None
+                        for p in (50, 95, 99)
+                    },
+                }
+            return report
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Process-wide admission controller (created on first use)"""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+        return _controller
@@ -0,0 +1,203 @@
+"""
+Agent Worker Pool
+
+A fixed set of pre-built SupplyChainAgent workers shared by all chat sessions,
+instead of one agent (engine, connections, LLM clients, compiled graph) per
+browser session. The first worker is built normally and the others are spawned
+from it, so they share its database, LLM clients, checkpointer, engines and
+caches; startup and memory cost depend on the pool size, not the user count.
+
+A request leases a worker for its thread_id:
+- conversation state lives in the shared checkpointer and the per-thread
+  LangChain and chart memory in a store shared by the workers
+  (thread_memory.py), so any worker can serve any thread; the worker that
+  served the thread last is preferred
+- requests of one thread run one at a time, in the order they were leased
+- when every worker is busy, requests wait in a bounded queue; a full queue or
+  a wait longer than the lease timeout raises instead of piling up
+
+Configure with AGENT_POOL_SIZE (default 2), AGENT_POOL_MAX_WAITING (default 32)
+and AGENT_POOL_LEASE_TIMEOUT_SECONDS (default 120).
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from typing import Any, Callable, Dict, Iterator, AsyncIterator, List, Optional
+
+from loguru import logger
+
+from .stage_timing import record_stage
+
+AGENT_POOL_SIZE = int(os.environ.get("AGENT_POOL_SIZE", "2"))
+AGENT_POOL_MAX_WAITING = int(os.environ.get("AGENT_POOL_MAX_WAITING", "32"))
+AGENT_POOL_LEASE_TIMEOUT_SECONDS = float(os.environ.get("AGENT_POOL_LEASE_TIMEOUT_SECONDS", "120"))
+LEASE_POLL_SECONDS = 0.05
+# Threads whose last worker is remembered (least recently used are forgotten first)
+MAX_AFFINITY_ENTRIES = 4096
+
+
+def _default_factory():
+    from .supply_chain_agent import SupplyChainAgent
+    return SupplyChainAgent()
+
+
+class AgentPool:
+    """Pre-built agent workers leased per request, keyed by thread_id"""
+
+    def __init__(
+        self,
+        size: int = AGENT_POOL_SIZE,
+        max_waiting: int = AGENT_POOL_MAX_WAITING,
+        lease_timeout_seconds: float = AGENT_POOL_LEASE_TIMEOUT_SECONDS,
+        factory: Optional[Callable[[], Any]] = None
+    ):
+        """
+        Args:
+            size: Number of workers
+            max_waiting: Requests allowed to wait for a worker before new ones are rejected
+            lease_timeout_seconds: Longest wait for a worker
+            factory: Builds the first worker; defaults to SupplyChainAgent()
+        """
+        start_time = time.time()
+        self.size = max(1, size)
+        self.max_waiting = max_waiting
+        self.lease_timeout_seconds = lease_timeout_seconds
+
+        first = (factory or _default_factory)()
+        self.workers: List[Any] = [first] + [first.spawn_worker() for _ in range(self.size - 1)]
+
+        self._condition = threading.Condition()
+        self._idle: List[int] = list(range(self.size))
+        self._active_threads: set = set()
+        self._affinity: "OrderedDict[str, int]" = OrderedDict()
+        self._waiting = 0
+        self.stats = {"leases": 0, "affinity_hits": 0, "rejected": 0, "timeouts": 0, "wait_seconds": 0.0}
+        logger.info(f"Agent pool ready: {self.size} workers in {time.time() - start_time:.2f}s")
+
+    def _try_acquire(self, thread_id: str) -> Optional[int]:
+        """Take a worker for the thread if one is idle and the thread has no request running (lock held)"""
+        if not self._idle or thread_id in self._active_threads:
+            return None
+        preferred = self._affinity.get(thread_id)
+        if preferred in self._idle:
+            index = preferred
+            self.stats["affinity_hits"] += 1
+        else:
+            # Idle workers are kept least recently released first
+            index = self._idle[0]
+        self._idle.remove(index)
+        self._active_threads.add(thread_id)
+        self._affinity[thread_id] = index
+        self._affinity.move_to_end(thread_id)
+        while len(self._affinity) > MAX_AFFINITY_ENTRIES:
+            self._affinity.popitem(last=False)
+        self.stats["leases"] += 1
+        return index
+
+    def _release(self, index: int, thread_id: str):
+        with self._condition:
+            self._idle.append(index)
+            self._active_threads.discard(thread_id)
+            self._condition.notify_all()
+
+    def _enqueue(self, thread_id: str) -> Optional[int]:
+        """A worker if one is free now, else register as waiting (lock held)"""
+        index = self._try_acquire(thread_id)
+        if index is None:
+            if self._waiting >= self.max_waiting:
+                self.stats["rejected"] += 1
+                raise RuntimeError(f"Agent pool queue is full ({self._waiting} requests waiting)")
+            self._waiting += 1
+        return index
+
+    def _timed_out(self, thread_id: str, waited: float):
+        self.stats["timeouts"] += 1
+        raise TimeoutError(f"No agent worker free for thread {thread_id} after {waited:.1f}s")
+
+    def _leased(self, index: int, waited: float):
+        self.stats["wait_seconds"] += waited
+        record_stage("agent_pool_wait", waited)
+        if waited > 1:
+            logger.info(f"Agent worker {index} leased after waiting {waited:.2f}s")
+
+    @contextmanager
+    def lease(self, thread_id: str = "default", timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        Hold a worker for one request of a thread
+
+        Raises:
+            RuntimeError: The wait queue is full
+            TimeoutError: No worker became free within the timeout
+        """
+        timeout = self.lease_timeout_seconds if timeout is None else timeout
+        start_time = time.perf_counter()
+        with self._condition:
+            index = self._enqueue(thread_id)
+            if index is None:
+                try:
+                    while index is None:
+                        remaining = timeout - (time.perf_counter() - start_time)
+                        if remaining <= 0:
+                            self._timed_out(thread_id, time.perf_counter() - start_time)
+                        self._condition.wait(remaining)
+                        index = self._try_acquire(thread_id)
+                finally:
+                    self._waiting -= 1
+            self._leased(index, time.perf_counter() - start_time)
+        try:
+            yield self.workers[index]
+        finally:
+            self._release(index, thread_id)
+
+    @asynccontextmanager
+    async def alease(self, thread_id: str = "default", timeout: Optional[float] = None) -> AsyncIterator[Any]:
+        """lease() for event loop callers (polls instead of holding a worker thread)"""
+        timeout = self.lease_timeout_seconds if timeout is None else timeout
+        start_time = time.perf_counter()
+        with self._condition:
+            index = self._enqueue(thread_id)
+        if index is None:
+            try:
+                while index is None:
+                    if time.perf_counter() - start_time >= timeout:
+                        with self._condition:
+                            self._timed_out(thread_id, time.perf_counter() - start_time)
+                    await asyncio.sleep(LEASE_POLL_SECONDS)
+                    with self._condition:
+                        index = self._try_acquire(thread_id)
+            finally:
+                with self._condition:
+                    self._waiting -= 1
+        with self._condition:
+            self._leased(index, time.perf_counter() - start_time)
+        try:
+            yield self.workers[index]
+        finally:
+            self._release(index, thread_id)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Pool size, busy workers, waiting requests and lease totals"""
+        with self._condition:
+            return {
+                **self.stats,
+                "size": self.size,
+                "busy": self.size - len(self._idle),
+                "waiting": self._waiting,
+            }
+
+
+_pool: Optional[AgentPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_agent_pool() -> AgentPool:
+    """Process-wide agent pool (built on first use)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = AgentPool()
+        return _pool
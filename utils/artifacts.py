@@ -0,0 +1,133 @@
+"""
+Tool Result Artifacts
+
+Tools return rich dicts (DataFrames, Plotly figures). Instead of letting LangGraph
+stringify them into ToolMessage content, every tool is wrapped to use LangChain's
+content_and_artifact response format:
+- content: a short text summary for the LLM, with DataFrames reduced to a
+  bounded preview (result_preview.py)
+- artifact: a small reference {"artifact_id", "type"} to the full result, which
+  stays server-side in an ArtifactStore
+
+process_query resolves the references from the ToolMessages of the current turn,
+so no message text has to be parsed back and nothing large reaches the LLM
+context or the conversation checkpoint.
+"""
+
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import pandas as pd
+from langchain_core.tools import BaseTool, StructuredTool
+from loguru import logger
+
+from .result_preview import RESULT_PREVIEW_TOKENS, preview_dataframe, truncate_text
+from .schema_selector import estimate_tokens
+
+DEFAULT_MAX_ARTIFACTS = 256
+MIN_PREVIEW_TOKENS = 120
+
+
+class ArtifactStore:
+    """Thread-safe LRU store of full tool results, keyed by artifact id"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ARTIFACTS):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, result: Any) -> Dict[str, Any]:
+        """Store a result and return the reference carried as the ToolMessage artifact"""
+        artifact_id = uuid.uuid4().hex
+        with self._lock:
+            self._items[artifact_id] = result
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return {"artifact_id": artifact_id, "type": result.get("type") if isinstance(result, dict) else None}
+
+    def get(self, reference: Optional[Dict[str, Any]]) -> Any:
+        """Resolve an artifact reference (None if missing or evicted)"""
+        if not isinstance(reference, dict) or "artifact_id" not in reference:
+            return None
+        with self._lock:
+            return self._items.get(reference["artifact_id"])
+
+    @property
+    def size(self) -> int:
+        return len(self._items)
+
+
+def _with_frame(text: str, df: Optional[pd.DataFrame], token_budget: int) -> str:
+    """Text followed by a DataFrame preview sized to the budget left after the text"""
+    text = truncate_text(text, token_budget // 2) if text else ""
+    remaining = max(token_budget - estimate_tokens(text), MIN_PREVIEW_TOKENS)
+    return (text + "\n" if text else "") + preview_dataframe(df, remaining)
+
+
+def summarize_tool_result(result: Any, token_budget: int = RESULT_PREVIEW_TOKENS) -> str:
+    """
+    LLM-facing text for a tool result dict
+
+    Args:
+        result: Full tool result
+        token_budget: Approximate maximum tokens of the summary
+
+    Returns:
+        Bounded summary; DataFrames are reduced to a preview
+    """
+    if not isinstance(result, dict):
+        return truncate_text(str(result), token_budget)
+
+    result_type = result.get("type")
+    if result_type == "error":
+        summary = f"Error: {result.get('message') or result.get('content')}"
+    elif result_type == "text":
+        summary = str(result.get("content", ""))
+    elif result_type == "text_with_sql_and_dataframe":
+        text = f"{result.get('text', '')}\n\nSQL: {result.get('sql_query')}"
+        summary = _with_frame(text, result.get("dataframe"), token_budget)
+    elif result_type == "dataframe":
+        text = result.get("description") or (f"SQL: {result['sql_query']}" if result.get("sql_query") else "")
+        summary = _with_frame(text, result.get("data"), token_budget)
+    elif result_type == "plotly":
+        summary = f"{result.get('description', 'Chart')} created and displayed to the user."
+    elif result_type == "chart_analysis":
+        summary = f"{result.get('analysis', '')}\n({result.get('chart_type')} data, {result.get('data_points')} points)"
+    else:
+        # Unknown shape: show scalar fields only
+        summary = str({k: v for k, v in result.items() if isinstance(v, (str, int, float, bool, type(None)))})
+    return truncate_text(summary, token_budget)
+
+
+def with_artifacts(tool: BaseTool, store: ArtifactStore, token_budget: int = RESULT_PREVIEW_TOKENS) -> StructuredTool:
+    """
+    Wrap a dict-returning tool so it answers with (summary, artifact reference)
+
+    Args:
+        tool: Tool created with @tool (sync func, optional coroutine)
+        store: Where full results are kept
+        token_budget: Approximate maximum tokens of the LLM-facing summary
+
+    Returns:
+        StructuredTool with the same name, description and arguments
+    """
+    def run(**kwargs):
+        result = tool.func(**kwargs)
+        return summarize_tool_result(result, token_budget), store.put(result)
+
+    async def arun(**kwargs):
+        result = await tool.coroutine(**kwargs)
+        return summarize_tool_result(result, token_budget), store.put(result)
+
+    wrapped = StructuredTool.from_function(
+        func=run,
+        coroutine=arun if tool.coroutine is not None else None,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        response_format="content_and_artifact",
+    )
+    logger.debug(f"Tool {tool.name} returns content and artifact")
+    return wrapped
@@ -0,0 +1,425 @@
+"""
+Canned Analytics Queries
+
+Registry of parameterized, hand-written SQL templates for the most common
+questions (top-N materials/plants by volume, monthly inbound vs outbound trends,
+inventory by polymer type, transfer cost by mode of transport), plus a rule-based
+matcher that maps a question to a template and its parameters without the LLM.
+
+Each template is compiled once as a SQLAlchemy text() statement with bound
+parameters, so repeated executions reuse the cached compiled statement and
+differ only in their bind values. A matched question is answered in tens of
+milliseconds; anything the rules are not sure about returns None and goes
+through the SQL agent as before.
+"""
+
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+import plotly.express as px
+from sqlalchemy import text
+from loguru import logger
+
+from .warehouse_data import KG_PER_MT
+from .stage_timing import record_stage, timed_stage
+from .deadline import DeadlineExceeded
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+# Inventory snapshot dates are stored as 'MM/DD/YYYY' text; this expression sorts them chronologically
+SNAPSHOT_SORT_KEY = "SUBSTR({col}, 7, 4) || SUBSTR({col}, 1, 2) || SUBSTR({col}, 4, 2)"
+
+# Qualifiers none of the templates can express; questions containing them go to the SQL agent
+UNSUPPORTED_PATTERNS = [
+    r"\b(?:19|20)\d\d\b", r"\b(?:last|this|past|previous|next)\s+(?:\d+\s+)?(?:day|week|month|quarter|year)s?\b",
+    r"\b(?:since|between|before|after|during|yesterday|today|ytd)\b",
+    r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b",
+    r"\bcst-\d+", r"\bmat-\d+", r"\bcustomers?\b", r"\bbatch", r"\baverage\b", r"\bavg\b", r"\bratio\b",
+    r"%", r"\bpercent", r"\bshare\b", r"\bexcept\b", r"\bexclud", r"\bwithout\b", r"\bnot\b", r"\bforecast",
+]
+
+
+class QueryTemplate:
+    """A pre-validated SQL statement with named parameters, a text summary and a chart spec"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        sql: str,
+        summarize: Callable[[pd.DataFrame, Dict[str, Any]], str],
+        chart: Dict[str, Any],
+        defaults: Optional[Dict[str, Any]] = None
+    ):
+        self.name = name
+        self.description = description
+        self.statement = text(sql)
+        self.summarize = summarize
+        self.chart = chart
+        self.defaults = defaults or {}
+
+    def bind(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Template defaults overridden by the given parameters"""
+        return {**self.defaults, **(params or {})}
+
+    def render(self, engine, params: Dict[str, Any]) -> str:
+        """SQL with literal parameter values, for record_query() and the chat UI"""
+        compiled = self.statement.bindparams(**self.bind(params)).compile(
+            engine, compile_kwargs={"literal_binds": True}
+        )
+        return str(compiled).strip()
+
+    def run(self, engine, params: Dict[str, Any]) -> pd.DataFrame:
+        return pd.read_sql_query(self.statement, engine, params=self.bind(params))
+
+    def build_chart(self, df: pd.DataFrame, params: Dict[str, Any]):
+        """Plotly figure for the template's result"""
+        spec = self.chart
+        title = spec["title"].format(**self.bind(params))
+        if spec["kind"] == "line":
+            fig = px.line(df, x=spec["x"], y=spec["y"], color=spec.get("color"), title=title,
+                          labels=spec.get("labels"), markers=True)
+        else:
+            fig = px.bar(df, x=spec["x"], y=spec["y"], color=spec.get("color"), title=title,
+                         labels=spec.get("labels"))
+        fig.update_layout(xaxis_tickangle=-45)
+        return fig
+
+
+def _scope(params: Dict[str, Any]) -> str:
+    return f" at {params['plant']}" if params.get("plant") else ""
+
+
+def _ranking_sql(entity: str, flow: str) -> str:
+    """Top-N entity by inbound, outbound or combined transaction volume"""
+    sources = {
+        "inbound": ["inbound"],
+        "outbound": ["outbound"],
+        "total": ["inbound", "outbound"],
+    }[flow]
+    union = "\n        UNION ALL\n".join(
+        f"        SELECT {entity}_name, net_quantity_mt FROM {table}\n"
+        f"        WHERE (:plant IS NULL OR plant_name = :plant)"
+        for table in sources
+    )
+    return f"""
+    WITH transactions AS (
+{union}
+    )
+    SELECT {entity}_name, SUM(net_quantity_mt) AS total_volume_mt
+    FROM transactions
+    WHERE {entity}_name IS NOT NULL AND net_quantity_mt IS NOT NULL
+    GROUP BY {entity}_name
+    ORDER BY total_volume_mt DESC
+    LIMIT :limit
+    """
+
+
+def _ranking_summary(entity: str, flow: str):
+    label = "combined inbound and outbound" if flow == "total" else flow
+
+    def summarize(df: pd.DataFrame, params: Dict[str, Any]) -> str:
+        if df.empty:
+            return f"No {label} transactions found{_scope(params)}."
+        ranking = ", ".join(
+            f"{row[f'{entity}_name']} ({row['total_volume_mt']:,.1f} MT)" for _, row in df.iterrows()
+        )
+        return f"Top {len(df)} {entity}s by {label} volume{_scope(params)}: {ranking}."
+    return summarize
+
+
+MONTHLY_TRENDS_SQL = """
+WITH transactions AS (
+    SELECT REPLACE(SUBSTR(inbound_date, 1, 7), '/', '-') AS month, 'Inbound' AS transaction_type, net_quantity_mt
+    FROM inbound
+    WHERE inbound_date IS NOT NULL AND (:plant IS NULL OR plant_name = :plant)
+    UNION ALL
+    SELECT REPLACE(SUBSTR(outbound_date, 1, 7), '/', '-') AS month, 'Outbound' AS transaction_type, net_quantity_mt
+    FROM outbound
+    WHERE outbound_date IS NOT NULL AND (:plant IS NULL OR plant_name = :plant)
+)
+SELECT month, transaction_type, SUM(net_quantity_mt) AS total_quantity
+FROM transactions
+GROUP BY month, transaction_type
+ORDER BY month, transaction_type
+"""
+
+
+def _monthly_trends_summary(df: pd.DataFrame, params: Dict[str, Any]) -> str:
+    if df.empty:
+        return f"No inbound or outbound transactions found{_scope(params)}."
+    totals = df.pivot_table(index="month", columns="transaction_type", values="total_quantity", aggfunc="sum").fillna(0)
+    latest = totals.index.max()
+    parts = [f"{flow} {totals.loc[latest, flow]:,.1f} MT" for flow in totals.columns]
+    return (
+        f"Monthly inbound vs outbound volume{_scope(params)} over {len(totals)} months "
+        f"({totals.index.min()} to {latest}). Latest month {latest}: {', '.join(parts)}."
+    )
+
+
+INVENTORY_BY_POLYMER_SQL = f"""
+WITH latest AS (
+    SELECT plant_name, MAX({SNAPSHOT_SORT_KEY.format(col='balance_as_of_date')}) AS snapshot_key
+    FROM inventory
+    WHERE balance_as_of_date IS NOT NULL AND (:plant IS NULL OR plant_name = :plant)
+    GROUP BY plant_name
+)
+SELECT m.polymer_type, SUM(i.unrestricted_stock) / {KG_PER_MT} AS stock_mt
+FROM inventory i
+JOIN latest l
+  ON l.plant_name = i.plant_name
+ AND l.snapshot_key = {SNAPSHOT_SORT_KEY.format(col='i.balance_as_of_date')}
+JOIN material_master m ON m.material_name = i.material_name
+GROUP BY m.polymer_type
+ORDER BY stock_mt DESC
+"""
+
+
+def _inventory_by_polymer_summary(df: pd.DataFrame, params: Dict[str, Any]) -> str:
+    if df.empty:
+        return f"No inventory snapshot found{_scope(params)}."
+    breakdown = ", ".join(f"{row['polymer_type']} {row['stock_mt']:,.1f} MT" for _, row in df.iterrows())
+    return f"Unrestricted stock by polymer type in the latest snapshot{_scope(params)}: {breakdown}."
+
+
+# Each shipment line uses ceil(quantity / capacity) containers; ROUND(x + 0.4999999) is a portable ceil
+TRANSPORT_COST_BY_MODE_SQL = """
+SELECT o.mode_of_transport,
+       COUNT(*) AS shipments,
+       SUM(o.net_quantity_mt) AS total_volume_mt,
+       SUM(ROUND(o.net_quantity_mt / c.container_capacity_mt + 0.4999999)) AS containers,
+       c.cost_amount AS cost_per_container,
+       c.currency,
+       SUM(ROUND(o.net_quantity_mt / c.container_capacity_mt + 0.4999999)) * c.cost_amount AS transfer_cost
+FROM outbound o
+JOIN operation_costs c
+  ON c.operation_category = 'Transfer' AND c.entity_name = o.mode_of_transport
+WHERE o.net_quantity_mt IS NOT NULL AND (:plant IS NULL OR o.plant_name = :plant)
+GROUP BY o.mode_of_transport, c.cost_amount, c.currency
+ORDER BY transfer_cost DESC
+"""
+
+
+def _transport_cost_summary(df: pd.DataFrame, params: Dict[str, Any]) -> str:
+    if df.empty:
+        return f"No outbound shipments found{_scope(params)}."
+    breakdown = "; ".join(
+        f"{row['mode_of_transport']}: {int(row['shipments'])} shipments, {row['total_volume_mt']:,.1f} MT, "
+        f"{int(row['containers'])} containers, {row['transfer_cost']:,.0f} {row['currency']}"
+        for _, row in df.iterrows()
+    )
+    return f"Transfer cost by mode of transport{_scope(params)}: {breakdown}."
+
+
+def _build_templates() -> Dict[str, QueryTemplate]:
+    templates = {}
+    flow_titles = {"inbound": "Inbound", "outbound": "Outbound", "total": "Total"}
+    for entity in ("material", "plant"):
+        for flow in ("inbound", "outbound", "total"):
+            name = f"top_{entity}s_by_{flow}_volume"
+            templates[name] = QueryTemplate(
+                name=name,
+                description=f"Top N {entity}s by {flow} volume, optionally for one plant",
+                sql=_ranking_sql(entity, flow),
+                summarize=_ranking_summary(entity, flow),
+                chart={
+                    "kind": "bar", "x": f"{entity}_name", "y": "total_volume_mt",
+                    "title": f"Top {{limit}} {entity.title()}s by {flow_titles[flow]} Volume",
+                    "labels": {"total_volume_mt": "Volume (MT)", f"{entity}_name": entity.title()},
+                },
+                defaults={"limit": DEFAULT_LIMIT, "plant": None},
+            )
+    templates["monthly_transaction_trends"] = QueryTemplate(
+        name="monthly_transaction_trends",
+        description="Monthly inbound vs outbound volume, optionally for one plant",
+        sql=MONTHLY_TRENDS_SQL,
+        summarize=_monthly_trends_summary,
+        chart={
+            "kind": "line", "x": "month", "y": "total_quantity", "color": "transaction_type",
+            "title": "Monthly Transaction Trends: Inbound vs Outbound",
+            "labels": {"total_quantity": "Quantity (MT)", "month": "Month", "transaction_type": "Transaction Type"},
+        },
+        defaults={"plant": None},
+    )
+    templates["inventory_by_polymer"] = QueryTemplate(
+        name="inventory_by_polymer",
+        description="Latest unrestricted stock (MT) per polymer type, optionally for one plant",
+        sql=INVENTORY_BY_POLYMER_SQL,
+        summarize=_inventory_by_polymer_summary,
+        chart={
+            "kind": "bar", "x": "polymer_type", "y": "stock_mt", "title": "Inventory by Polymer Type",
+            "labels": {"stock_mt": "Stock (MT)", "polymer_type": "Polymer Type"},
+        },
+        defaults={"plant": None},
+    )
+    templates["transport_cost_by_mode"] = QueryTemplate(
+        name="transport_cost_by_mode",
+        description="Outbound shipments, containers and transfer cost per mode of transport",
+        sql=TRANSPORT_COST_BY_MODE_SQL,
+        summarize=_transport_cost_summary,
+        chart={
+            "kind": "bar", "x": "mode_of_transport", "y": "transfer_cost", "color": "currency",
+            "title": "Transfer Cost by Mode of Transport",
+            "labels": {"transfer_cost": "Transfer Cost", "mode_of_transport": "Mode of Transport"},
+        },
+        defaults={"plant": None},
+    )
+    return templates
+
+
+TEMPLATES = _build_templates()
+
+CHART_PATTERN = re.compile(r"\b(?:plot|chart|graph|visuali[sz]e|draw)")
+
+
+def _any(patterns: List[str], text: str) -> bool:
+    return any(re.search(p, text) for p in patterns)
+
+
+class CannedQueries:
+    """
+    Matcher and executor for the canned query templates.
+
+    match() is pure rules: it returns (template, params) only when the question is
+    fully described by one template, otherwise None. Plant names are read from the
+    database on first use so "china" or "singapore warehouse" resolve to the stored name.
+    """
+
+    def __init__(self, engine, templates: Optional[Dict[str, QueryTemplate]] = None, plants: Optional[List[str]] = None):
+        self.engine = engine
+        self.templates = templates or TEMPLATES
+        self._plants = plants
+        self.stats = {"matched": 0, "unmatched": 0, "executions": 0, "total_ms": 0.0}
+
+    @property
+    def plants(self) -> List[str]:
+        if self._plants is None:
+            try:
+                df = pd.read_sql_query(
+                    "SELECT DISTINCT plant_name FROM outbound UNION SELECT DISTINCT plant_name FROM inventory",
+                    self.engine
+                )
+                self._plants = [p for p in df["plant_name"].dropna()]
+            except DeadlineExceeded:
+                # The request ran out of time, not a reason to cache an empty plant list
+                raise
+            except Exception as e:
+                logger.error(f"Could not load plant names for canned queries: {e}")
+                self._plants = []
+        return self._plants
+
+    def _plant_mentions(self, question: str) -> List[str]:
+        mentioned = []
+        for plant in self.plants:
+            name = plant.lower()
+            aliases = {name, name.replace("-", " "), name.split("-")[0]}
+            if any(re.search(rf"\b{re.escape(alias)}\b", question) for alias in aliases):
+                mentioned.append(plant)
+        return mentioned
+
+    def match(self, question: str) -> Optional[Tuple[QueryTemplate, Dict[str, Any]]]:
+        """
+        Map a question to a template and parameters
+
+        Returns:
+            (template, params), or None when no template fully covers the question
+        """
+        q = question.lower().strip()
+        result = self._match(q)
+        self.stats["matched" if result else "unmatched"] += 1
+        if result:
+            logger.info(f"Canned query match: {result[0].name} {result[1]}")
+        return result
+
+    def _match(self, q: str) -> Optional[Tuple[QueryTemplate, Dict[str, Any]]]:
+        if _any(UNSUPPORTED_PATTERNS, q):
+            return None
+
+        plants = self._plant_mentions(q)
+        if len(plants) > 1:
+            return None
+        params: Dict[str, Any] = {"plant": plants[0] if plants else None}
+
+        mentions_cost = _any([r"\bcosts?\b", r"\bspend", r"\bexpens"], q)
+        mentions_stock = _any([r"\binventory\b", r"\bstock\b", r"\bon hand\b"], q)
+        inbound = _any([r"\binbound\b", r"\breceiv", r"\breceipts?\b"], q)
+        outbound = _any([r"\boutbound\b", r"\bship(?:ped|ments?)\b", r"\bsold\b", r"\bsales\b", r"\bdeliver"], q)
+
+        # Transfer cost per mode of transport
+        if mentions_cost and _any([r"\bmodes?\b", r"\btransport", r"\btransfer\b", r"\btruck\b", r"\bmarine\b"], q):
+            if _any([r"\bsav", r"\bcheap", r"\blanes?\b", r"\bcounterfactual\b", r"\bswitch"], q) or mentions_stock:
+                return None
+            return self.templates["transport_cost_by_mode"], params
+        if mentions_cost:
+            return None
+
+        # Stock per polymer type
+        if re.search(r"\bpolymer", q) and mentions_stock:
+            return self.templates["inventory_by_polymer"], params
+        if mentions_stock:
+            return None
+
+        # Monthly inbound vs outbound trends (the template always returns both flows)
+        if _any([r"\bmonthly\b", r"\b(?:by|per|each) month\b", r"\bover time\b", r"\btrends?\b"], q):
+            if _any([r"\btop\b", r"\bmaterials?\b", r"\bproducts?\b", r"\bmodes?\b", r"\bpolymer"], q):
+                return None
+            if inbound != outbound:
+                return None
+            return self.templates["monthly_transaction_trends"], params
+
+        # Top-N materials/plants by volume
+        top = re.search(r"\btop\s+(\d+)\b", q)
+        ranking = top or _any([r"\bhighest\b", r"\bmost\b", r"\blargest\b", r"\bbiggest\b", r"\btop\b", r"\branks?\b", r"\branking\b"], q)
+        volume = inbound or outbound or _any([r"\bvolumes?\b", r"\bquantit", r"\btonnage\b", r"\btransactions?\b"], q)
+        if not (ranking and volume):
+            return None
+        if _any([r"\bmaterials?\b", r"\bproducts?\b", r"\bgrades?\b"], q):
+            entity = "material"
+        elif _any([r"\bplants?\b", r"\bwarehouses?\b", r"\bsites?\b"], q) and not plants:
+            entity = "plant"
+        else:
+            return None
+        flow = "total" if inbound == outbound else ("inbound" if inbound else "outbound")
+        params["limit"] = min(int(top.group(1)), MAX_LIMIT) if top else DEFAULT_LIMIT
+        return self.templates[f"top_{entity}s_by_{flow}_volume"], params
+
+    def run(self, template: QueryTemplate, params: Dict[str, Any]) -> pd.DataFrame:
+        """Execute a template and record its latency"""
+        start = time.perf_counter()
+        df = template.run(self.engine, params)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        record_stage("sql_execution", elapsed_ms / 1000)
+        self.stats["executions"] += 1
+        self.stats["total_ms"] += elapsed_ms
+        logger.info(f"Canned query {template.name} returned {len(df)} rows in {elapsed_ms:.1f}ms")
+        return df
+
+    def answer(self, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Answer a question from a canned template, without the LLM
+
+        Returns:
+            Dict in the analyze_supply_chain_data format (plus template/params/chart),
+            or None when no template matches
+        """
+        matched = self.match(question)
+        if matched is None:
+            return None
+        template, params = matched
+        df = self.run(template, params)
+        response = {
+            "type": "text_with_sql_and_dataframe",
+            "text": template.summarize(df, template.bind(params)),
+            "sql_query": template.render(self.engine, params),
+            "dataframe": df,
+            "template": template.name,
+            "params": template.bind(params),
+        }
+        if CHART_PATTERN.search(question.lower()) and not df.empty:
+            with timed_stage("charting"):
+                response["chart"] = template.build_chart(df, params)
+        return response
+
@@ -0,0 +1,45 @@
+"""
+Thread-Offloaded SQLite Checkpointer
+
+SqliteSaver only implements the sync checkpoint API, so a graph compiled with it
+cannot be awaited (ainvoke/astream). ThreadedSqliteSaver serves the async API by
+running the sync methods in worker threads. The sync saver already serializes
+access to its connection with a lock, and local SQLite checkpoint I/O is short,
+so one compiled graph serves both process_query and aprocess_query on the same
+conversations.db without per-event-loop aiosqlite connections.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional, Sequence
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+class ThreadedSqliteSaver(SqliteSaver):
+    """SqliteSaver whose async methods run the sync implementation in a worker thread"""
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config,
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before=None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator:
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes: Sequence, task_id: str, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
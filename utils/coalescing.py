@@ -0,0 +1,184 @@
+"""
+Request Coalescing
+
+Singleflight for agent queries: concurrent requests for the same question
+(normalized as in the SQL cache) against the same data version and with the
+same conversation context share one execution. The context is a fingerprint of
+the thread's stored messages, so a follow-up ("and for last month?") asked in
+two threads with different histories runs once per thread, while first turns
+and threads with identical histories are still merged.
+
+The first request runs the agent; requests arriving while it runs wait for its
+result instead of starting their own run, and streaming followers receive the
+leader's events as they are produced.
+
+If the leader is cancelled or abandoned before it finishes, its followers run the
+question themselves. Finished answers are not reused; this only merges requests
+that overlap in time.
+
+Configure with REQUEST_COALESCING (default 1) and COALESCING_VERSION_TTL_SECONDS
+(default 5; how long a data version fingerprint is reused before re-reading it).
+"""
+
+import os
+import hashlib
+import asyncio
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from .sql_cache import normalize_question
+from .warehouse_data import cached_data_version
+
+REQUEST_COALESCING = os.environ.get("REQUEST_COALESCING", "1") == "1"
+COALESCING_VERSION_TTL_SECONDS = float(os.environ.get("COALESCING_VERSION_TTL_SECONDS", "5"))
+FOLLOWER_POLL_SECONDS = 0.05
+
+
+def conversation_fingerprint(messages: Sequence[Any]) -> str:
+    """Hash of a thread's stored messages (empty string for a new thread)"""
+    if not messages:
+        return ""
+    digest = hashlib.sha1()
+    for message in messages:
+        digest.update(f"{getattr(message, 'type', '')}:{getattr(message, 'content', message)}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+class Flight:
+    """One shared execution: the leader publishes events and the result, followers read them"""
+
+    def __init__(self, key: Tuple[str, str, str]):
+        self.key = key
+        self.followers = 0
+        self._events: List[Dict[str, Any]] = []
+        self._result: Optional[Dict[str, Any]] = None
+        self._done = False
+        self._condition = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def publish(self, event: Dict[str, Any]):
+        """Add a stream event (leader only)"""
+        with self._condition:
+            self._events.append(event)
+            self._condition.notify_all()
+
+    def finish(self, result: Optional[Dict[str, Any]]):
+        """Complete the flight; None means the leader did not produce an answer"""
+        with self._condition:
+            self._result = result
+            self._done = True
+            self._condition.notify_all()
+
+    def wait(self) -> Optional[Dict[str, Any]]:
+        """Block until the leader finishes; its response, or None if it produced none"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._done)
+            return self._result
+
+    async def await_result(self) -> Optional[Dict[str, Any]]:
+        """wait() for event loop callers (polls instead of holding a worker thread)"""
+        while not self._done:
+            await asyncio.sleep(FOLLOWER_POLL_SECONDS)
+        return self._result
+
+    def events(self) -> Iterator[Dict[str, Any]]:
+        """
+        The leader's stream events from the start, blocking for new ones until it finishes
+
+        Ends with a "final" event when the leader did not stream one (e.g. it ran process_query).
+        Yields nothing more if the leader produced no answer.
+        """
+        index = 0
+        saw_final = False
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._done or index < len(self._events))
+                pending = self._events[index:]
+                index += len(pending)
+                finished = self._done and index == len(self._events)
+                result = self._result
+            for event in pending:
+                saw_final = saw_final or event.get("event") in ("final", "error")
+                yield event
+            if finished:
+                if result is not None and not saw_final:
+                    yield {"event": "final", "response": result}
+                return
+
+
+class RequestCoalescer:
+    """In-flight registry keyed by (normalized question, data version, conversation fingerprint)"""
+
+    def __init__(
+        self,
+        engine,
+        enabled: bool = REQUEST_COALESCING,
+        version_ttl_seconds: float = COALESCING_VERSION_TTL_SECONDS
+    ):
+        self.engine = engine
+        self.enabled = enabled
+        self.version_ttl_seconds = version_ttl_seconds
+        self._flights: Dict[Tuple[str, str, str], Flight] = {}
+        self._lock = threading.Lock()
+        self.stats = {"executions": 0, "coalesced": 0, "fallbacks": 0}
+
+    def _data_version(self) -> str:
+        try:
+            return cached_data_version(self.engine, self.version_ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Data version unavailable for request coalescing: {e}")
+            return "unknown"
+
+    def key(self, question: str, context: str = "") -> Tuple[str, str, str]:
+        return " ".join(normalize_question(question)), self._data_version(), context
+
+    def join(self, question: str, context: str = "") -> Tuple[Optional[Flight], bool]:
+        """
+        Register a request for a question
+
+        Args:
+            question: The user's question
+            context: Fingerprint of the conversation it is asked in (conversation_fingerprint)
+
+        Returns:
+            (flight, is_leader). The leader must call complete(); followers read the flight.
+            (None, True) when coalescing is disabled.
+        """
+        if not self.enabled:
+            return None, True
+        key = self.key(question, context)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and not flight.done:
+                flight.followers += 1
+                self.stats["coalesced"] += 1
+                logger.info(f"Coalesced request with in-flight question ({flight.followers} waiting): {question[:80]}")
+                return flight, False
+            flight = Flight(key)
+            self._flights[key] = flight
+            self.stats["executions"] += 1
+            return flight, True
+
+    def complete(self, flight: Optional[Flight], result: Optional[Dict[str, Any]]):
+        """Finish a leader's flight and release its followers"""
+        if flight is None:
+            return
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.finish(result)
+
+    def record_fallback(self):
+        """A follower ran the question itself because its leader produced no answer"""
+        with self._lock:
+            self.stats["fallbacks"] += 1
+
+    def metrics(self) -> Dict[str, int]:
+        """Executions, coalesced requests, fallbacks and questions currently in flight"""
+        with self._lock:
+            return {**self.stats, "in_flight": len(self._flights)}
@@ -6,48 +6,255 @@ Separated from the main agent for better code organization and maintainability.
 """
 
 import os
+import asyncio
+import weakref
+import contextvars
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import pandas as pd
+from sqlalchemy import event
 from langchain_community.utilities import SQLDatabase
 from loguru import logger
 
+from .streaming import emit_event
+from .stage_timing import timed_stage
+from .deadline import current_deadline
+
+
+class QueryCapture:
+    """
+    Last query executed or served within one scope (a request, or one tool call in it)
+
+    A scope without its own query reports its parent's, so a chart tool's "use_last"
+    sees the query of an earlier tool call in the same request. A tool call's query is
+    handed to the request scope when the call ends.
+    """
+
+    def __init__(self, parent: Optional["QueryCapture"] = None):
+        self.parent = parent
+        self.query: Optional[str] = None
+        self.result = None
+
+    def record(self, query: Optional[str], result=None):
+        self.query = query
+        self.result = result
+
+    def clear(self):
+        """Forget the scope's query; the parent's is no longer visible either"""
+        self.parent = None
+        self.query = None
+        self.result = None
+
+    def info(self) -> dict:
+        if self.query is None and self.parent is not None:
+            return self.parent.info()
+        return {"query": self.query, "result": self.result}
+
+
+# Capture of the running request / tool call. Context variables follow the request into
+# LangGraph's tool threads and tasks, and parallel tool calls each get their own copy.
+_current_capture: contextvars.ContextVar[Optional[QueryCapture]] = contextvars.ContextVar(
+    "query_capture", default=None
+)
+
+
+@contextmanager
+def query_scope() -> Iterator[QueryCapture]:
+    """
+    Capture the queries of the code run inside the block separately from concurrent requests
+
+    Nested scopes (one per tool call) read through to the enclosing scope and report their
+    last query to it on exit.
+    """
+    parent = _current_capture.get()
+    capture = QueryCapture(parent)
+    token = _current_capture.set(capture)
+    try:
+        yield capture
+    finally:
+        _current_capture.reset(token)
+        if parent is not None and capture.query is not None:
+            parent.record(capture.query, capture.result)
+
+
+def iterate_in_query_scope(iterator: Iterator) -> Iterator:
+    """
+    Drive a generator inside its own query scope
+
+    Each step runs in a private copy of the context, so the scope is not left set in
+    the consumer's context between items (or when the consumer abandons the generator).
+    """
+    context = contextvars.copy_context()
+    context.run(_current_capture.set, QueryCapture(_current_capture.get()))
+    try:
+        while True:
+            try:
+                item = context.run(next, iterator)
+            except StopIteration:
+                return
+            yield item
+    finally:
+        # An abandoned generator's cleanup (e.g. resetting its own context variables) runs in its context too
+        if hasattr(iterator, "close"):
+            context.run(iterator.close)
+
+
+# SQLite VM instructions between deadline checks of a running statement
+SQLITE_PROGRESS_STEPS = 10000
+
+
+def _sqlite_progress():
+    # Non-zero interrupts the statement (sqlite3.OperationalError: interrupted)
+    deadline = current_deadline()
+    return 1 if deadline is not None and deadline.stop_reason() is not None else 0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Refuse statements of stopped requests and interrupt long SQLite statements"""
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check()
+    if conn.dialect.name == "sqlite" and not conn.info.get("deadline_progress_handler"):
+        conn.connection.dbapi_connection.set_progress_handler(_sqlite_progress, SQLITE_PROGRESS_STEPS)
+        conn.info["deadline_progress_handler"] = True
+
+
+def _begin(conn):
+    """Bound a Postgres transaction's statements by the request deadline"""
+    deadline = current_deadline()
+    remaining = deadline.remaining() if deadline is not None else None
+    if conn.dialect.name == "postgresql" and remaining is not None:
+        # Once per transaction, not per statement; SET LOCAL ends with the transaction,
+        # so a pooled connection never carries the timeout to its next user
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}")
+
+
+def install_deadline_guards(engine):
+    """Apply request deadlines (deadline.py) to the statements run through an engine"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    if not event.contains(engine, "begin", _begin):
+        event.listen(engine, "begin", _begin)
+
 
 class QueryCapturingSQLDatabase(SQLDatabase):
-    """Custom SQLDatabase wrapper that captures executed queries"""
+    """
+    Custom SQLDatabase wrapper that captures executed queries
+    
+    Captured queries are scoped with query_scope(), so one instance can serve concurrent
+    requests; outside any scope they go to an instance-wide capture as before.
+    """
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.last_executed_query = None
-        self.last_query_result = None
+        self._shared_capture = QueryCapture()
+        install_deadline_guards(self._engine)
+    
+    def _capture(self) -> QueryCapture:
+        return _current_capture.get() or self._shared_capture
+    
+    @property
+    def last_executed_query(self) -> Optional[str]:
+        return self._capture().info()["query"]
+    
+    @property
+    def last_query_result(self):
+        return self._capture().info()["result"]
     
     def run(self, command: str, fetch: str = "all", **kwargs) -> str:
         """Override run method to capture queries"""
+        capture = self._capture()
         try:
             # Store the query being executed
-            self.last_executed_query = command.strip()
+            capture.record(command.strip())
+            emit_event("sql", sql_query=capture.query)
             
             # Execute the query using parent method with all parameters
-            result = super().run(command, fetch, **kwargs)
+            with timed_stage("sql_execution"):
+                result = super().run(command, fetch, **kwargs)
             
             # Store the result
-            self.last_query_result = result
+            capture.record(capture.query, result)
             
             return result
         except Exception as e:
             # Reset on error
-            self.last_executed_query = None
-            self.last_query_result = None
+            capture.clear()
             raise e
     
     def get_last_query_info(self):
         """Get the last executed query and its results"""
-        return {
-            "query": self.last_executed_query,
-            "result": self.last_query_result
-        }
+        return self._capture().info()
+    
+    def record_query(self, command: str, result=None):
+        """Record a query served outside run(), e.g. reads of precomputed tables"""
+        capture = self._capture()
+        capture.record(command.strip(), result)
+        emit_event("sql", sql_query=capture.query)
     
     def clear_query_cache(self):
         """Clear stored query information"""
-        self.last_executed_query = None
-        self.last_query_result = None
+        self._capture().clear()
+
+
+# Async drivers for the sync dialects in use. Local SQLite files are read in worker
+# threads instead (aiosqlite keeps a non-daemon thread per pooled connection).
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+}
+
+# Async engines pool connections bound to one event loop, so keep one engine per loop.
+# Sync callers share one long-lived loop (event_loop.run_coroutine); code running its own
+# short-lived loop must call dispose_async_engines() before the loop closes.
+_async_engines: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_async_engine(engine):
+    """
+    Async SQLAlchemy engine for the same database as a sync engine, for the running event loop
+    
+    Args:
+        engine: Sync SQLAlchemy engine (e.g. db._engine)
+        
+    Returns:
+        AsyncEngine, or None if the dialect has no async driver or the driver is not installed
+    """
+    loop = asyncio.get_running_loop()
+    engines = _async_engines.setdefault(loop, {})
+    if engine not in engines:
+        async_engine = None
+        driver = ASYNC_DRIVERS.get(engine.url.get_backend_name())
+        if driver:
+            try:
+                from sqlalchemy.ext.asyncio import create_async_engine
+                async_engine = create_async_engine(engine.url.set(drivername=driver))
+                install_deadline_guards(async_engine.sync_engine)
+            except Exception as e:
+                logger.warning(f"Async engine unavailable ({driver}), falling back to worker threads: {e}")
+        engines[engine] = async_engine
+    return engines[engine]
+
+
+async def dispose_async_engines():
+    """Close the async engines (and their pooled connections) of the running event loop"""
+    engines = _async_engines.pop(asyncio.get_running_loop(), {})
+    for async_engine in engines.values():
+        if async_engine is not None:
+            await async_engine.dispose()
+
+
+async def read_sql_async(sql_query: str, engine) -> pd.DataFrame:
+    """
+    Non-blocking pd.read_sql_query
+    
+    Uses the async engine when available, otherwise runs the sync read in a worker thread.
+    """
+    with timed_stage("sql_execution"):
+        async_engine = get_async_engine(engine)
+        if async_engine is None:
+            return await asyncio.to_thread(pd.read_sql_query, sql_query, engine)
+        async with async_engine.connect() as conn:
+            return await conn.run_sync(lambda sync_conn: pd.read_sql_query(sql_query, sync_conn))
 
 
 def create_database_connection():
@@ -0,0 +1,207 @@
+"""
+Request Deadlines
+
+A per-request deadline that follows the request through routing, the agent
+graph, every tool call, SQL execution and outbound HTTP calls. Like the stage
+timings it lives in a context variable, so LangGraph's tool threads and async
+tasks see the deadline of the request they run for.
+
+Work stops cooperatively: the checkpoints (LLM calls through the pool, tool
+calls, SQL statements) raise DeadlineExceeded once the deadline has passed or
+the request was cancelled, e.g. because the user sent a new message in the same
+conversation (cancel_thread). Blocking waits are bounded by timeout_for():
+webhook POSTs use it as their HTTP timeout and SQL statements as their
+statement_timeout (a progress handler on SQLite). Tool results finished before
+the stop are kept so the agent can return them as a partial answer.
+
+Configure with REQUEST_DEADLINE_SECONDS (default 90).
+"""
+
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "90"))
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request ran out of time or was cancelled"""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class Deadline:
+    """Expiry time and cancellation state of one request"""
+
+    def __init__(
+        self,
+        seconds: Optional[float],
+        parent: Optional["Deadline"] = None,
+        should_cancel: Optional[Callable[[], bool]] = None
+    ):
+        """
+        Args:
+            seconds: Time budget from now, or None for no limit of its own
+            parent: Enclosing request's deadline; expiring or cancelling it stops this one too
+            should_cancel: Polled at the checkpoints; returning True cancels the request
+        """
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds if seconds is not None else None
+        if parent is not None and parent.expires_at is not None:
+            self.expires_at = parent.expires_at if self.expires_at is None else min(self.expires_at, parent.expires_at)
+        self.parent = parent
+        self.should_cancel = should_cancel
+        self.cancel_reason: Optional[str] = None
+        self._partial: List[Any] = []
+        self._lock = threading.Lock()
+
+    def cancel(self, reason: str = "cancelled"):
+        """Stop the request at its next checkpoint"""
+        if self.cancel_reason is None:
+            self.cancel_reason = reason
+
+    def stop_reason(self) -> Optional[str]:
+        """'cancelled' (or the reason given), 'deadline', or None while the request may continue"""
+        if self.cancel_reason is None and self.should_cancel is not None and self.should_cancel():
+            self.cancel("cancelled")
+        if self.cancel_reason is not None:
+            return self.cancel_reason
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            return "deadline"
+        return self.parent.stop_reason() if self.parent is not None else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (0 when stopped), or None without a time limit"""
+        if self.stop_reason() is not None:
+            return 0.0
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self):
+        """Raise DeadlineExceeded if the request should stop"""
+        reason = self.stop_reason()
+        if reason is not None:
+            elapsed = time.monotonic() - self.started
+            if reason == "deadline":
+                raise DeadlineExceeded(f"Request deadline exceeded after {elapsed:.1f}s", reason)
+            raise DeadlineExceeded(f"Request {reason} after {elapsed:.1f}s", reason)
+
+    def add_partial(self, result: Any):
+        """Keep a finished intermediate result (e.g. a ToolMessage) for a partial answer"""
+        with self._lock:
+            self._partial.append(result)
+
+    def partial_results(self) -> List[Any]:
+        with self._lock:
+            return list(self._partial)
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("request_deadline", default=None)
+
+# Running requests per conversation, for cancel_thread
+_active: Dict[str, List[Deadline]] = {}
+_active_lock = threading.Lock()
+
+
+@contextmanager
+def deadline_scope(
+    seconds: Optional[float] = REQUEST_DEADLINE_SECONDS,
+    thread_id: Optional[str] = None,
+    should_cancel: Optional[Callable[[], bool]] = None
+) -> Iterator[Deadline]:
+    """
+    Run the block under a deadline (never later than the enclosing one)
+
+    Args:
+        seconds: Time budget, or None to only inherit the enclosing deadline
+        thread_id: Conversation the request belongs to, so cancel_thread() can stop it
+        should_cancel: Polled at the checkpoints; returning True cancels the request
+    """
+    deadline = Deadline(seconds, parent=_current.get(), should_cancel=should_cancel)
+    token = _current.set(deadline)
+    if thread_id is not None:
+        with _active_lock:
+            _active.setdefault(thread_id, []).append(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+        if thread_id is not None:
+            with _active_lock:
+                running = _active.get(thread_id, [])
+                if deadline in running:
+                    running.remove(deadline)
+                if not running:
+                    _active.pop(thread_id, None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def check_deadline():
+    """Raise DeadlineExceeded if the current request should stop (no-op outside a deadline)"""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def timeout_for(default: Optional[float] = None) -> Optional[float]:
+    """
+    Timeout for a blocking call: the default, shortened to the time the request has left
+
+    Raises:
+        DeadlineExceeded: The request already has to stop
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return default
+    deadline.check()
+    remaining = deadline.remaining()
+    if remaining is None:
+        return default
+    return remaining if default is None else min(default, remaining)
+
+
+async def await_within_deadline(awaitable):
+    """
+    Await under the current request's remaining time, cancelling the awaitable when it runs out
+
+    Raises:
+        DeadlineExceeded: The deadline passed (or the request was cancelled) first
+    """
+    try:
+        return await asyncio.wait_for(awaitable, timeout_for())
+    except asyncio.TimeoutError as e:
+        if isinstance(e, DeadlineExceeded):
+            raise
+        check_deadline()
+        raise
+
+
+def add_partial_result(result: Any):
+    """Keep a finished intermediate result for the current request's partial answer"""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.add_partial(result)
+
+
+def cancel_thread(thread_id: str, reason: str = "cancelled") -> int:
+    """
+    Cancel the running requests of a conversation
+
+    Returns:
+        Number of requests cancelled
+    """
+    with _active_lock:
+        running = list(_active.get(thread_id, []))
+    for deadline in running:
+        deadline.cancel(reason)
+    return len(running)
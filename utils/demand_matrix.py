@@ -0,0 +1,242 @@
+"""
+Customer x Material Demand Matrix
+
+This module maintains a sparse (CSR) matrix of outbound volume per customer and
+material, built from the outbound table and updated incrementally as new shipments
+arrive. It backs affinity questions that are impractical as SQL joins:
+- which customers buy all of a set of materials
+- customers (or materials) with similar purchasing profiles (TF-IDF + cosine)
+"""
+
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from loguru import logger
+
+from .warehouse_data import load_outbound, data_version, format_transaction_date
+
+
+def tfidf_weight(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """
+    TF-IDF weighting with L2-normalized rows.
+
+    Term frequency is the row's share of volume per column; the IDF down-weights
+    columns bought by many rows (smoothed: log((1 + n) / (1 + df)) + 1).
+    """
+    matrix = sparse.csr_matrix(matrix, dtype=np.float64)
+    row_totals = np.asarray(matrix.sum(axis=1)).ravel()
+    row_totals[row_totals == 0] = 1.0
+    tf = sparse.diags(1.0 / row_totals) @ matrix
+
+    document_frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = np.log((1.0 + matrix.shape[0]) / (1.0 + document_frequency)) + 1.0
+    return l2_normalize(tf @ sparse.diags(idf))
+
+
+def l2_normalize(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Scale each row to unit L2 norm (empty rows stay empty)"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix)
+
+
+def top_k_similar(normalized: sparse.csr_matrix, row: int, k: int) -> List[tuple]:
+    """Top-k (row, cosine similarity) neighbors of a row in an L2-normalized matrix, excluding itself"""
+    scores = (normalized @ normalized[row].T).toarray().ravel()
+    scores[row] = -np.inf
+    k = min(k, len(scores) - 1)
+    if k <= 0:
+        return []
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    candidates = candidates[np.argsort(-scores[candidates])]
+    return [(int(i), float(scores[i])) for i in candidates if scores[i] > 0]
+
+
+class CustomerMaterialMatrix:
+    """
+    Sparse customer x material outbound volume matrix with incremental updates.
+
+    Rows strictly before the last loaded date are kept in a base matrix; rows of the
+    last loaded date are kept separately and replaced on each update, so late-arriving
+    shipments for that day are not double counted. New customers and materials grow
+    the matrix.
+
+    Updates replace the matrix, index dicts and label lists instead of mutating them,
+    so readers work on a consistent snapshot taken under the refresh lock.
+    """
+
+    def __init__(self, engine, check_interval_seconds: float = 60.0):
+        self.engine = engine
+        self.check_interval_seconds = check_interval_seconds
+        self.customer_index: Dict[str, int] = {}
+        self.material_index: Dict[str, int] = {}
+        self.customers: List[str] = []
+        self.materials: List[str] = []
+        self._base = sparse.csr_matrix((0, 0))
+        self._tail = sparse.csr_matrix((0, 0))
+        self._watermark: Optional[pd.Timestamp] = None
+        self._data_version: Optional[str] = None
+        self._last_checked: float = 0.0
+        self._lock = threading.Lock()
+        self._matrix: Optional[sparse.csr_matrix] = None
+        # (matrix, weights) pairs; stale once the matrix they were computed from is replaced
+        self._customer_tfidf: Optional[Tuple[sparse.csr_matrix, sparse.csr_matrix]] = None
+        self._material_tfidf: Optional[Tuple[sparse.csr_matrix, sparse.csr_matrix]] = None
+
+    def _ids(self, values: pd.Series, index: Dict[str, int], labels: List[str]) -> np.ndarray:
+        """Map labels to row/column ids, registering unseen labels"""
+        for value in pd.unique(values):
+            if value not in index:
+                index[value] = len(labels)
+                labels.append(value)
+        return values.map(index).to_numpy()
+
+    def _to_matrix(self, rows: pd.DataFrame) -> sparse.csr_matrix:
+        """Aggregate outbound rows into a CSR matrix in the current shape"""
+        shape = (len(self.customers), len(self.materials))
+        if rows.empty:
+            return sparse.csr_matrix(shape)
+        return sparse.coo_matrix(
+            (rows["net_quantity_mt"].to_numpy(dtype=np.float64), (rows["row"], rows["col"])),
+            shape=shape
+        ).tocsr()
+
+    def update(self, full: bool = False) -> sparse.csr_matrix:
+        """
+        Load outbound rows since the last loaded date (or everything if full=True).
+        Called by refresh_if_changed() with the lock held.
+
+        Returns:
+            The updated customer x material matrix
+        """
+        start_time = time.time()
+        since = None if full or self._watermark is None else format_transaction_date(self._watermark)
+        if since is None:
+            self.customer_index, self.material_index = {}, {}
+            self.customers, self.materials = [], []
+            self._base = sparse.csr_matrix((0, 0))
+        else:
+            # Copy before registering new labels; snapshots handed out earlier keep theirs
+            self.customer_index, self.material_index = dict(self.customer_index), dict(self.material_index)
+            self.customers, self.materials = list(self.customers), list(self.materials)
+
+        outbound = load_outbound(self.engine, since=since).dropna(subset=["customer_number", "material_name"])
+        outbound["row"] = self._ids(outbound["customer_number"], self.customer_index, self.customers)
+        outbound["col"] = self._ids(outbound["material_name"], self.material_index, self.materials)
+
+        shape = (len(self.customers), len(self.materials))
+        self._base.resize(shape)
+
+        if not outbound.empty:
+            self._watermark = outbound["outbound_date"].max()
+            closed_days = outbound["outbound_date"] < self._watermark
+            self._base = self._base + self._to_matrix(outbound[closed_days])
+            self._tail = self._to_matrix(outbound[~closed_days])
+        else:
+            self._tail.resize(shape)
+
+        self._matrix = (self._base + self._tail).tocsr()
+        self._matrix.eliminate_zeros()
+        self._customer_tfidf = None
+        self._material_tfidf = None
+
+        execution_time = time.time() - start_time
+        logger.info(f"Demand matrix updated: {shape[0]} customers x {shape[1]} materials, {self._matrix.nnz} non-zeros, {len(outbound)} rows loaded in {execution_time:.2f}s")
+        return self._matrix
+
+    def refresh_if_changed(self) -> sparse.csr_matrix:
+        """Apply an incremental update when the data fingerprint changed"""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> sparse.csr_matrix:
+        """refresh_if_changed() with the lock held"""
+        now = time.time()
+        if self._matrix is not None and now - self._last_checked < self.check_interval_seconds:
+            return self._matrix
+        self._last_checked = now
+
+        version = data_version(self.engine)
+        if self._matrix is None or version != self._data_version:
+            self.update()
+            self._data_version = version
+        return self._matrix
+
+    @property
+    def matrix(self) -> sparse.csr_matrix:
+        return self.refresh_if_changed()
+
+    def _snapshot(self) -> tuple:
+        """Refreshed matrix with the indexes and labels it was built with"""
+        with self._lock:
+            matrix = self._refresh()
+            return matrix, self.customer_index, self.customers, self.material_index, self.materials
+
+    def _weights(self, attr: str, matrix: sparse.csr_matrix, transpose: bool = False) -> sparse.csr_matrix:
+        """TF-IDF of the matrix rows (columns if transpose=True), computed once per matrix and cached in `attr`"""
+        with self._lock:
+            cached = getattr(self, attr)
+        if cached is not None and cached[0] is matrix:
+            return cached[1]
+        weights = tfidf_weight(matrix.T.tocsr() if transpose else matrix)
+        with self._lock:
+            if self._matrix is matrix:
+                setattr(self, attr, (matrix, weights))
+        return weights
+
+    def customers_buying_all(self, materials: List[str]) -> pd.DataFrame:
+        """
+        Customers who bought every one of the given materials.
+
+        Returns:
+            DataFrame with customer_number, one volume column per material and total_mt
+        """
+        matrix, _, customers, material_index, _ = self._snapshot()
+        unknown = [m for m in materials if m not in material_index]
+        if unknown:
+            raise ValueError(f"Unknown materials: {', '.join(unknown)}")
+
+        columns = [material_index[m] for m in materials]
+        volumes = matrix[:, columns].toarray()
+        buyers = np.flatnonzero((volumes > 0).all(axis=1))
+
+        result = pd.DataFrame(volumes[buyers], columns=[f"{m}_mt" for m in materials])
+        result.insert(0, "customer_number", [customers[i] for i in buyers])
+        result["total_mt"] = result.iloc[:, 1:].sum(axis=1)
+        return result.sort_values("total_mt", ascending=False).reset_index(drop=True)
+
+    def similar_customers(self, customer_number: str, k: int = 10) -> pd.DataFrame:
+        """Top-k customers with the most similar TF-IDF weighted material mix"""
+        matrix, customer_index, customers, _, _ = self._snapshot()
+        if customer_number not in customer_index:
+            raise ValueError(f"Unknown customer: {customer_number}")
+
+        weights = self._weights("_customer_tfidf", matrix)
+        neighbors = top_k_similar(weights, customer_index[customer_number], k)
+        target = matrix[customer_index[customer_number]]
+        rows = []
+        for i, score in neighbors:
+            shared = target.multiply(matrix[i]).nnz
+            rows.append({
+                "customer_number": customers[i],
+                "similarity": round(score, 4),
+                "shared_materials": shared,
+                "total_mt": float(matrix[i].sum())
+            })
+        return pd.DataFrame(rows, columns=["customer_number", "similarity", "shared_materials", "total_mt"])
+
+    def similar_materials(self, material_name: str, k: int = 10) -> pd.DataFrame:
+        """Top-k materials bought by the most similar set of customers"""
+        matrix, _, _, material_index, materials = self._snapshot()
+        if material_name not in material_index:
+            raise ValueError(f"Unknown material: {material_name}")
+
+        weights = self._weights("_material_tfidf", matrix, transpose=True)
+        neighbors = top_k_similar(weights, material_index[material_name], k)
+        return pd.DataFrame(
+            [{"material_name": materials[i], "similarity": round(score, 4)} for i, score in neighbors],
+            columns=["material_name", "similarity"]
+        )
@@ -0,0 +1,54 @@
+"""
+Shared Background Event Loop
+
+Sync callers (Streamlit handlers, speculative_handle_router) run coroutines on
+one long-lived event loop in a daemon thread instead of asyncio.run() per call.
+asyncio.run() creates and closes a loop every time, and everything bound to a
+loop (the async engines of database.get_async_engine and their asyncpg
+connection pools) would be rebuilt per request and left for the garbage
+collector to close.
+
+The coroutine runs with the caller's context variables (request deadline, stage
+timings, query capture scope), like asyncio.to_thread does.
+"""
+
+import asyncio
+import threading
+import contextvars
+from typing import Any, Awaitable, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """The process-wide background event loop (started on first use)"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="background-event-loop", daemon=True).start()
+        return _loop
+
+
+async def _in_context(context: contextvars.Context, awaitable: Awaitable) -> Any:
+    # The task has its own copy of the loop thread's context; adopt the caller's values
+    for var, value in context.items():
+        var.set(value)
+    return await awaitable
+
+
+def run_coroutine(coroutine: Awaitable) -> Any:
+    """
+    Run a coroutine on the background loop and wait for its result
+
+    Must not be called from the background loop itself. If the caller is interrupted
+    while waiting, the coroutine is cancelled.
+    """
+    loop = get_background_loop()
+    future = asyncio.run_coroutine_threadsafe(_in_context(contextvars.copy_context(), coroutine), loop)
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
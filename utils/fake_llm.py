@@ -0,0 +1,289 @@
+"""
+Record/Replay Chat Models
+
+Deterministic stand-ins for Gemini so the agent stack (process_query, the tools,
+the routers, the knowledge agent) can run and be measured without a live key:
+- ReplayChatModel answers from a fixture store: recorded tool-call sequences and
+  final answers, keyed by caller, the turn's user message and the step within the
+  turn. Latency is injected (fixed + jitter, or the recorded latency), and
+  streaming emits tool-call chunks or word chunks like a real model.
+- RecordingChatModel wraps a real model and appends every response to the store.
+
+Both plug in through the LLM pool factory, so every agent using the pool picks
+them up. Select with environment variables:
+    LLM_FAKE_MODE=replay|record
+    LLM_FIXTURES_PATH=fixtures/llm_fixtures.jsonl
+    LLM_FAKE_LATENCY=0.8 LLM_FAKE_JITTER=0.2 (seconds, replay only)
+    LLM_FAKE_RECORDED_LATENCY=1 (replay with the latency measured while recording)
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Iterator, AsyncIterator, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+from loguru import logger
+
+LLM_FAKE_MODE = os.environ.get("LLM_FAKE_MODE", "").lower()
+LLM_FIXTURES_PATH = os.environ.get("LLM_FIXTURES_PATH", "fixtures/llm_fixtures.jsonl")
+ANY_CALLER = "*"
+
+
+def _text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return " ".join(str(content).lower().split())
+
+
+def turn_key(messages: Sequence[BaseMessage]) -> Tuple[str, int]:
+    """
+    (normalized user message of the current turn, step within the turn)
+
+    The step is the number of messages after the last user message, so the first
+    model call of a turn is step 0 and the call after one tool round trip with
+    two tool calls is step 3.
+    """
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return _text(messages[index]), len(messages) - index - 1
+    return (_text(messages[-1]) if messages else ""), 0
+
+
+def _caller(model: BaseChatModel, run_manager) -> str:
+    # stream() does not hand a run manager to _stream, the pool's per-caller copy
+    # carries the caller in its own metadata as well
+    metadata = getattr(run_manager, "metadata", None) or model.metadata or {}
+    return metadata.get("llm_caller", ANY_CALLER)
+
+
+class FixtureStore:
+    """Recorded model responses in a JSON lines file, keyed by (caller, question, step)"""
+
+    def __init__(self, path: Optional[str] = LLM_FIXTURES_PATH):
+        self.path = path
+        self._fixtures: Dict[Tuple[str, str, int], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+            logger.info(f"Loaded {len(self._fixtures)} LLM fixtures from {path}")
+
+    def _index(self, record: Dict[str, Any]):
+        key = (record.get("caller", ANY_CALLER), " ".join(record["question"].lower().split()), int(record["step"]))
+        self._fixtures[key] = record
+
+    def __len__(self) -> int:
+        return len(self._fixtures)
+
+    def lookup(self, caller: str, messages: Sequence[BaseMessage]) -> Optional[Tuple[AIMessage, Optional[float]]]:
+        """Recorded (response, latency) for a model call, falling back to caller-independent fixtures"""
+        question, step = turn_key(messages)
+        with self._lock:
+            record = self._fixtures.get((caller, question, step)) or self._fixtures.get((ANY_CALLER, question, step))
+        if record is None:
+            return None
+        return messages_from_dict([record["response"]])[0], record.get("latency_seconds")
+
+    def record(self, caller: str, messages: Sequence[BaseMessage], response: BaseMessage, latency_seconds: Optional[float] = None):
+        """Store a response for the call's (caller, question, step) and append it to the file"""
+        question, step = turn_key(messages)
+        record = {
+            "caller": caller,
+            "question": question,
+            "step": step,
+            "response": message_to_dict(response),
+            "latency_seconds": round(latency_seconds, 4) if latency_seconds is not None else None,
+        }
+        with self._lock:
+            self._index(record)
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def add(
+        self,
+        question: str,
+        steps: List[AIMessage],
+        caller: str = ANY_CALLER,
+        latency_seconds: Optional[float] = None,
+        start_step: int = 0
+    ):
+        """
+        Register a scripted turn: tool-call steps followed by the final answer
+
+        Args:
+            question: User message of the turn
+            steps: Model responses in order; every tool call adds a tool message to the next step's offset
+            caller: Pool caller name, or '*' for any caller
+            start_step: Step of the first call, for prompts with messages after the user message
+        """
+        step = start_step
+        for response in steps:
+            record = {"caller": caller, "question": question, "step": step,
+                      "response": message_to_dict(response), "latency_seconds": latency_seconds}
+            with self._lock:
+                self._index(record)
+            step += 1 + len(response.tool_calls)
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that answers from a FixtureStore with injected latency"""
+
+    store: Any
+    model: str = "replay"
+    temperature: float = 0.0
+    latency_seconds: float = 0.0
+    latency_jitter_seconds: float = 0.0
+    use_recorded_latency: bool = False
+    stream_chunk_delay: float = 0.0
+    default_response: Optional[str] = None
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any):
+        super().model_post_init(__context)
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay-chat-model"
+
+    def bind_tools(self, tools, **kwargs):
+        # Tool calls are replayed from the fixtures, the schemas are not needed
+        return self
+
+    def _resolve(self, messages: List[BaseMessage], run_manager) -> Tuple[AIMessage, float]:
+        caller = _caller(self, run_manager)
+        found = self.store.lookup(caller, messages)
+        if found is None:
+            question, step = turn_key(messages)
+            if self.default_response is None:
+                raise KeyError(f"No LLM fixture for caller={caller!r} step={step} question={question[:80]!r}")
+            response, recorded = AIMessage(content=self.default_response), None
+        else:
+            response, recorded = found
+
+        if self.use_recorded_latency and recorded is not None:
+            latency = recorded
+        else:
+            latency = self.latency_seconds + self._rng.uniform(0, self.latency_jitter_seconds)
+        return response, latency
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        response, latency = self._resolve(messages, run_manager)
+        time.sleep(latency)
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        response, latency = self._resolve(messages, run_manager)
+        await asyncio.sleep(latency)
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    @staticmethod
+    def _chunks(response: AIMessage) -> List[ChatGenerationChunk]:
+        if response.tool_calls:
+            return [ChatGenerationChunk(message=AIMessageChunk(
+                content=response.content,
+                tool_call_chunks=[
+                    {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+                    for i, tc in enumerate(response.tool_calls)
+                ],
+                usage_metadata=response.usage_metadata,
+            ))]
+        words = str(response.content).split(" ")
+        chunks = [ChatGenerationChunk(message=AIMessageChunk(content=w + (" " if i < len(words) - 1 else "")))
+                  for i, w in enumerate(words)]
+        if response.usage_metadata:
+            chunks[-1].message.usage_metadata = response.usage_metadata
+        return chunks
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        response, latency = self._resolve(messages, run_manager)
+        time.sleep(latency)
+        for chunk in self._chunks(response):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+            time.sleep(self.stream_chunk_delay)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        response, latency = self._resolve(messages, run_manager)
+        await asyncio.sleep(latency)
+        for chunk in self._chunks(response):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(self.stream_chunk_delay)
+
+
+class RecordingChatModel(BaseChatModel):
+    """Chat model that forwards to a real model and records each response as a fixture"""
+
+    inner: Any
+    store: Any
+    model: str = "recording"
+    temperature: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording-chat-model"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"inner": self.inner.bind_tools(tools, **kwargs)})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        start = time.perf_counter()
+        response = self.inner.invoke(messages, stop=stop, **kwargs)
+        self.store.record(_caller(self, run_manager), messages, response, time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        start = time.perf_counter()
+        response = await self.inner.ainvoke(messages, stop=stop, **kwargs)
+        self.store.record(_caller(self, run_manager), messages, response, time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+
+def replay_factory(store: FixtureStore, **settings) -> Callable[..., BaseChatModel]:
+    """LLM pool factory building ReplayChatModels over one store"""
+    def factory(model: str, **kwargs) -> BaseChatModel:
+        return ReplayChatModel(store=store, model=model, **{**kwargs, **settings})
+    return factory
+
+
+def record_factory(store: FixtureStore, inner_factory: Callable[..., BaseChatModel]) -> Callable[..., BaseChatModel]:
+    """LLM pool factory wrapping real models built by inner_factory in RecordingChatModels"""
+    def factory(model: str, rate_limiter=None, callbacks=None, **kwargs) -> BaseChatModel:
+        return RecordingChatModel(
+            inner=inner_factory(model, **kwargs), store=store, model=model,
+            rate_limiter=rate_limiter, callbacks=callbacks
+        )
+    return factory
+
+
+def factory_from_env(inner_factory: Callable[..., BaseChatModel]) -> Optional[Callable[..., BaseChatModel]]:
+    """Pool factory for LLM_FAKE_MODE, or None for real models"""
+    if LLM_FAKE_MODE == "replay":
+        logger.info(f"LLM replay mode with fixtures from {LLM_FIXTURES_PATH}")
+        return replay_factory(
+            FixtureStore(LLM_FIXTURES_PATH),
+            latency_seconds=float(os.environ.get("LLM_FAKE_LATENCY", "0")),
+            latency_jitter_seconds=float(os.environ.get("LLM_FAKE_JITTER", "0")),
+            use_recorded_latency=os.environ.get("LLM_FAKE_RECORDED_LATENCY", "0") == "1",
+        )
+    if LLM_FAKE_MODE == "record":
+        logger.info(f"LLM record mode, appending fixtures to {LLM_FIXTURES_PATH}")
+        return record_factory(FixtureStore(LLM_FIXTURES_PATH), inner_factory)
+    return None
@@ -0,0 +1,125 @@
+"""
+Conversation History Management
+
+Keeps each thread's checkpointed message list bounded so per-turn cost does not
+grow with conversation length:
+- a rolling window of the last N turns (user question + final answer; tool
+  call/response traffic of finished turns is dropped)
+- one summary message of older turns, updated incrementally as turns leave the
+  window and capped at a token budget (oldest lines go first)
+
+Each turn the graph receives REMOVE_ALL_MESSAGES followed by the compacted
+history and the new question, so the stored state is rewritten to the bounded
+list, and the index where the current turn starts is known without scanning.
+
+Configure with HISTORY_WINDOW_TURNS (default 5) and HISTORY_SUMMARY_TOKENS
+(default 500).
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from loguru import logger
+
+from .schema_selector import estimate_tokens
+
+HISTORY_WINDOW_TURNS = int(os.environ.get("HISTORY_WINDOW_TURNS", "5"))
+HISTORY_SUMMARY_TOKENS = int(os.environ.get("HISTORY_SUMMARY_TOKENS", "500"))
+
+SUMMARY_MESSAGE_ID = "conversation-summary"
+SUMMARY_HEADER = "Summary of earlier conversation turns:"
+QUESTION_CHARS = 200
+ANSWER_CHARS = 300
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + "..."
+
+
+class ConversationHistory:
+    """Rolling window plus incremental summary over a thread's messages"""
+
+    def __init__(self, window_turns: int = HISTORY_WINDOW_TURNS, summary_tokens: int = HISTORY_SUMMARY_TOKENS):
+        self.window_turns = max(1, window_turns)
+        self.summary_tokens = summary_tokens
+
+    @staticmethod
+    def split(messages: List[BaseMessage]) -> Tuple[Optional[str], List[List[BaseMessage]]]:
+        """
+        Split stored messages into the existing summary text and turns
+
+        Returns:
+            (summary lines or None, list of turns, each starting with a HumanMessage)
+        """
+        summary = None
+        turns: List[List[BaseMessage]] = []
+        for msg in messages:
+            if isinstance(msg, SystemMessage) and msg.id == SUMMARY_MESSAGE_ID:
+                summary = msg.content[len(SUMMARY_HEADER):].strip()
+            elif isinstance(msg, HumanMessage) or not turns:
+                turns.append([msg])
+            else:
+                turns[-1].append(msg)
+        return summary, turns
+
+    @staticmethod
+    def condense(turn: List[BaseMessage]) -> List[BaseMessage]:
+        """A finished turn without its tool call/response traffic"""
+        return [
+            msg for msg in turn
+            if not isinstance(msg, ToolMessage) and not (isinstance(msg, AIMessage) and msg.tool_calls)
+        ]
+
+    @staticmethod
+    def summarize_turn(turn: List[BaseMessage]) -> str:
+        """One summary line for a turn: the question and the start of the final answer"""
+        question = next((m.content for m in turn if isinstance(m, HumanMessage)), "")
+        answer = next((m.content for m in reversed(turn) if isinstance(m, AIMessage) and not m.tool_calls), "")
+        return f"- User: {_clip(question, QUESTION_CHARS)} | Assistant: {_clip(answer, ANSWER_CHARS)}"
+
+    def _merge_summary(self, summary: Optional[str], evicted: List[List[BaseMessage]]) -> Optional[str]:
+        lines = summary.splitlines() if summary else []
+        lines += [self.summarize_turn(turn) for turn in evicted]
+        # Oldest lines go first once the budget is exceeded
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        return "\n".join(lines) or None
+
+    def compact(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """
+        Bounded version of a thread's messages
+
+        Returns:
+            [summary message] + the last window_turns turns without tool traffic
+        """
+        summary, turns = self.split(messages)
+        turns = [turn for turn in (self.condense(t) for t in turns) if turn]
+        evicted, window = turns[:-self.window_turns], turns[-self.window_turns:]
+        if evicted:
+            summary = self._merge_summary(summary, evicted)
+            logger.debug(f"Folded {len(evicted)} turns into the conversation summary")
+
+        compacted: List[BaseMessage] = []
+        if summary:
+            compacted.append(SystemMessage(content=f"{SUMMARY_HEADER}\n{summary}", id=SUMMARY_MESSAGE_ID))
+        for turn in window:
+            compacted.extend(turn)
+        return compacted
+
+    def prepare(self, messages: List[BaseMessage], new_messages: List[BaseMessage]) -> Tuple[List[BaseMessage], int]:
+        """
+        Graph input that replaces the stored messages with the compacted history plus new messages
+
+        Args:
+            messages: Messages currently stored for the thread
+            new_messages: Messages of the new turn (starting with the user's question)
+
+        Returns:
+            (input messages for the "messages" channel, index of the new turn's first message
+            in the resulting state)
+        """
+        history = self.compact(messages)
+        return [RemoveMessage(id=REMOVE_ALL_MESSAGES), *history, *new_messages], len(history)
@@ -1,4 +1,4 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
+from llm_pool import get_chat_model
 from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe_agent
 
 from langchain_core.prompts import ChatPromptTemplate
@@ -21,12 +21,8 @@ data_dictionary_prefix = """
 """
 
 # llm = OpenAI(temperature=0)
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=GOOGLE_API_KEY,
-    temperature=0.0,
-    verbose=True,          
-)
+# Shared client from the process-wide pool (rate limited, usage reported as "intent_router")
+llm = get_chat_model("intent_router", google_api_key=GOOGLE_API_KEY, verbose=True)
 
 # Give the agent a LIST of all your clean dataframes
 agent = create_pandas_dataframe_agent(
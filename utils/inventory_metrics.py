@@ -0,0 +1,184 @@
+"""
+Inventory Metrics Engine
+
+This module precomputes days of supply, inventory turnover and stock-out ETA per
+plant x material. The latest inventory snapshot is combined with trailing-window
+outbound velocity using vectorized pandas operations, so the agent can answer
+coverage questions from a table instead of generating multi-CTE SQL.
+
+Run nightly (e.g. from cron) to rebuild and publish the table:
+    python -m utils.inventory_metrics
+"""
+
+import time
+import threading
+from typing import Optional
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from .warehouse_data import (
+    load_outbound,
+    load_inventory_snapshots,
+    latest_inventory,
+    format_transaction_date,
+)
+
+INVENTORY_METRICS_TABLE = "inventory_metrics"
+DEFAULT_WINDOW_DAYS = 90
+DAYS_PER_YEAR = 365
+# Stock-out ETAs further out than this are left empty (slow movers)
+MAX_ETA_DAYS = 10 * DAYS_PER_YEAR
+
+
+def compute_inventory_metrics(
+    daily_outbound: pd.DataFrame,
+    snapshots: pd.DataFrame,
+    window_days: int = DEFAULT_WINDOW_DAYS,
+    as_of: Optional[pd.Timestamp] = None
+) -> pd.DataFrame:
+    """
+    Compute coverage metrics per plant x material.
+
+    Args:
+        daily_outbound: Outbound MT per plant_name, material_name, outbound_date
+        snapshots: Inventory snapshots from load_inventory_snapshots()
+        window_days: Trailing window used for outbound velocity
+        as_of: End of the velocity window (defaults to the latest outbound date)
+
+    Returns:
+        DataFrame with stock, velocity, days_of_supply, turnover_ratio and stockout_eta
+    """
+    keys = ["plant_name", "material_name"]
+    if as_of is None:
+        as_of = daily_outbound["outbound_date"].max() if not daily_outbound.empty else pd.Timestamp.now().normalize()
+    window_start = as_of - pd.Timedelta(days=window_days)
+
+    # Trailing-window outbound volume per plant x material
+    in_window = daily_outbound[
+        (daily_outbound["outbound_date"] > window_start) & (daily_outbound["outbound_date"] <= as_of)
+    ]
+    velocity = (
+        in_window.groupby(keys)["net_quantity_mt"].sum()
+        .rename("outbound_mt_window")
+        .reset_index()
+    )
+
+    # Average stock over the snapshots inside the same window
+    window_snapshots = snapshots[
+        (snapshots["balance_as_of_date"] > window_start) & (snapshots["balance_as_of_date"] <= as_of)
+    ]
+    avg_stock = (
+        window_snapshots.groupby(keys)["stock_mt"].mean()
+        .rename("avg_stock_mt")
+        .reset_index()
+    )
+
+    latest = latest_inventory(snapshots)
+    metrics = latest.merge(velocity, on=keys, how="outer").merge(avg_stock, on=keys, how="left")
+
+    metrics["stock_mt"] = metrics["stock_mt"].fillna(0.0)
+    metrics["outbound_mt_window"] = metrics["outbound_mt_window"].fillna(0.0)
+    metrics["balance_as_of_date"] = metrics["balance_as_of_date"].fillna(as_of)
+    metrics["avg_stock_mt"] = metrics["avg_stock_mt"].fillna(metrics["stock_mt"])
+    metrics["daily_outbound_mt"] = metrics["outbound_mt_window"] / window_days
+
+    velocity_values = metrics["daily_outbound_mt"].to_numpy()
+    stock_values = metrics["stock_mt"].to_numpy()
+    avg_stock_values = metrics["avg_stock_mt"].to_numpy()
+    annual_outbound = metrics["outbound_mt_window"].to_numpy() * DAYS_PER_YEAR / window_days
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        metrics["days_of_supply"] = np.where(velocity_values > 0, stock_values / velocity_values, np.nan)
+        metrics["turnover_ratio"] = np.where(avg_stock_values > 0, annual_outbound / avg_stock_values, np.nan)
+
+    eta_days = metrics["days_of_supply"].where(metrics["days_of_supply"] <= MAX_ETA_DAYS)
+    metrics["stockout_eta"] = metrics["balance_as_of_date"] + pd.to_timedelta(eta_days, unit="D")
+    metrics["window_days"] = window_days
+    metrics["as_of_date"] = as_of
+
+    columns = [
+        "plant_name", "material_name", "balance_as_of_date", "stock_mt", "avg_stock_mt",
+        "outbound_mt_window", "daily_outbound_mt", "days_of_supply", "turnover_ratio",
+        "stockout_eta", "window_days", "as_of_date"
+    ]
+    return metrics[columns].sort_values(keys).reset_index(drop=True)
+
+
+class InventoryMetricsEngine:
+    """
+    Maintains inventory coverage metrics with incremental outbound loading.
+
+    Outbound history is kept as daily aggregates; each refresh only reloads rows
+    from the last loaded date onwards (that day is replaced, so late-arriving rows
+    for it are picked up). Inventory snapshots are small and reloaded in full.
+    """
+
+    def __init__(self, engine, window_days: int = DEFAULT_WINDOW_DAYS, publish: bool = True):
+        self.engine = engine
+        self.window_days = window_days
+        self.publish = publish
+        self.metrics: Optional[pd.DataFrame] = None
+        self.last_refreshed: Optional[float] = None
+        self._daily_outbound = pd.DataFrame(columns=["plant_name", "material_name", "outbound_date", "net_quantity_mt"])
+        self._watermark: Optional[pd.Timestamp] = None
+        # Tool calls of concurrent requests share the engine
+        self._lock = threading.RLock()
+
+    def _load_outbound_increment(self, full: bool):
+        """Merge new outbound rows into the daily aggregates"""
+        since = None if full or self._watermark is None else format_transaction_date(self._watermark)
+        outbound = load_outbound(self.engine, since=since)
+        increment = (
+            outbound.groupby(["plant_name", "material_name", "outbound_date"], as_index=False)["net_quantity_mt"].sum()
+        )
+
+        if since is None:
+            self._daily_outbound = increment
+        else:
+            kept = self._daily_outbound[self._daily_outbound["outbound_date"] < self._watermark]
+            self._daily_outbound = pd.concat([kept, increment], ignore_index=True)
+
+        if not self._daily_outbound.empty:
+            self._watermark = self._daily_outbound["outbound_date"].max()
+        logger.debug(f"Outbound increment: {len(outbound)} rows loaded, watermark {self._watermark}")
+
+    def refresh(self, full: bool = False) -> pd.DataFrame:
+        """
+        Recompute metrics, loading only new outbound rows unless full=True.
+
+        Returns:
+            The refreshed metrics DataFrame
+        """
+        with self._lock:
+            start_time = time.time()
+            try:
+                self._load_outbound_increment(full)
+                snapshots = load_inventory_snapshots(self.engine)
+                self.metrics = compute_inventory_metrics(self._daily_outbound, snapshots, self.window_days)
+                self.last_refreshed = time.time()
+
+                if self.publish:
+                    self.metrics.to_sql(INVENTORY_METRICS_TABLE, self.engine, if_exists="replace", index=False)
+
+                execution_time = time.time() - start_time
+                logger.info(f"Inventory metrics refreshed: {len(self.metrics)} rows in {execution_time:.2f}s")
+                return self.metrics
+            except Exception as e:
+                logger.error(f"Inventory metrics refresh failed: {e}")
+                raise
+
+    def get_metrics(self, max_age_seconds: float = 24 * 3600) -> pd.DataFrame:
+        """Return cached metrics, refreshing incrementally when older than max_age_seconds"""
+        with self._lock:
+            if self.metrics is None or self.last_refreshed is None or time.time() - self.last_refreshed > max_age_seconds:
+                self.refresh()
+            return self.metrics
+
+
+if __name__ == "__main__":
+    from .database import create_database_connection
+
+    db = create_database_connection()
+    metrics = InventoryMetricsEngine(db._engine).refresh(full=True)
+    print(metrics.sort_values("days_of_supply").head(20))
@@ -2,7 +2,7 @@ from langchain.document_loaders import TextLoader
 from langchain_text_splitters import CharacterTextSplitter
 from langchain.vectorstores import Chroma
 
-from langchain_google_genai import ChatGoogleGenerativeAI
+from llm_pool import get_chat_model
 from langchain_community.embeddings.bedrock import BedrockEmbeddings
 from langchain.embeddings import HuggingFaceEmbeddings
 
@@ -48,12 +48,8 @@ retriever = vectordb.as_retriever()
 
 # --- 3. LLM Setup ---
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=GOOGLE_API_KEY,
-    temperature=0.0,
-    verbose=True,
-)
+# Shared client from the process-wide pool (rate limited, usage reported as "knowledge_agent")
+llm = get_chat_model("knowledge_agent", google_api_key=GOOGLE_API_KEY, verbose=True)
 
 # --- 4. Prompt Templates ---
 
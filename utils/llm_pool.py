@@ -0,0 +1,284 @@
+"""
+Shared LLM Client Pool
+
+One process-wide factory for the chat models used by the supply chain agent,
+its SQL agent, the intent router, the text2sql agent and the knowledge agents:
+- one underlying client per (model, settings); callers get a shallow copy that
+  shares its connection and only differs in the caller name it reports
+- a per-model token bucket (requests per minute) and a process-wide limit on
+  in-flight requests, both enforced through the model's rate_limiter hook
+- per-caller usage accounting (calls, errors, input/output tokens, latency),
+  also reported to the request's stage timings as llm:<caller>
+- the request deadline (deadline.py): a call is not started once it has passed,
+  waiting for a slot is bounded by it, and every client has an HTTP timeout
+
+This module only uses absolute imports so the script-style modules in utils/
+can import it as `llm_pool` as well as `utils.llm_pool`.
+
+Configure with LLM_MAX_CONCURRENCY (default 8), LLM_REQUESTS_PER_MINUTE
+(default 60), LLM_TIMEOUT_SECONDS (default 60) and per-model overrides such as
+LLM_MODEL_RPM="gemini-2.5-flash=120,gemini-2.5-pro=30". Set LLM_FAKE_MODE to
+replay or record to build the fixture-backed models from fake_llm.py instead.
+"""
+
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import LLMResult
+from langchain_core.rate_limiters import BaseRateLimiter, InMemoryRateLimiter
+from loguru import logger
+
+if __package__:
+    from .stage_timing import record_stage
+    from .deadline import check_deadline, timeout_for
+else:
+    from stage_timing import record_stage
+    from deadline import check_deadline, timeout_for
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "60"))
+SLOT_POLL_SECONDS = 0.05
+
+# Run id of the model call being started in the current thread/task, set by the usage
+# handler just before the model's rate limiter is asked for a slot
+_starting_run: contextvars.ContextVar[Optional[UUID]] = contextvars.ContextVar("llm_starting_run", default=None)
+
+
+def model_rpm_from_env() -> Dict[str, float]:
+    """Per-model requests per minute from LLM_MODEL_RPM="model=rpm,..." """
+    limits = {}
+    for pair in os.environ.get("LLM_MODEL_RPM", "").split(","):
+        if "=" in pair:
+            model, rpm = pair.split("=", 1)
+            limits[model.strip()] = float(rpm)
+    return limits
+
+
+def _google_chat_model(model: str, **kwargs) -> BaseChatModel:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    kwargs.setdefault("google_api_key", os.environ.get("GOOGLE_API_KEY"))
+    # A stuck call must not hold the request past its deadline indefinitely
+    kwargs.setdefault("timeout", LLM_TIMEOUT_SECONDS)
+    return ChatGoogleGenerativeAI(model=model, **kwargs)
+
+
+class _PoolRateLimiter(BaseRateLimiter):
+    """Token bucket for one model plus a slot of the pool's concurrency limit"""
+
+    def __init__(self, pool: "LLMClientPool", requests_per_minute: float):
+        self.pool = pool
+        self.bucket = InMemoryRateLimiter(
+            requests_per_second=requests_per_minute / 60.0,
+            check_every_n_seconds=SLOT_POLL_SECONDS,
+            max_bucket_size=max(1.0, requests_per_minute / 60.0),
+        )
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        check_deadline()
+        if not self.bucket.acquire(blocking=blocking):
+            return False
+        if not blocking:
+            if not self.pool._slots.acquire(blocking=False):
+                return False
+        else:
+            # Wait for a slot no longer than the request has left
+            while not self.pool._slots.acquire(timeout=timeout_for(SLOT_POLL_SECONDS * 20)):
+                pass
+        self.pool._hold_slot(_starting_run.get())
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        if not await self.bucket.aacquire(blocking=blocking):
+            return False
+        check_deadline()
+        # Poll instead of blocking so waiting calls don't occupy executor threads
+        while not self.pool._slots.acquire(blocking=False):
+            if not blocking:
+                return False
+            await asyncio.sleep(SLOT_POLL_SECONDS)
+            check_deadline()
+        run_id = _starting_run.get()
+        self.pool._hold_slot(run_id)
+        # A cancelled call (e.g. a discarded speculative branch) gets no end/error callback,
+        # so free its slot when the task running it is cancelled
+        task = asyncio.current_task()
+        if task is not None and run_id is not None:
+            task.add_done_callback(lambda t: t.cancelled() and self.pool._end_run(run_id, error=True))
+        return True
+
+
+class _UsageHandler(BaseCallbackHandler):
+    """Attributes each model call to its caller and frees its concurrency slot"""
+
+    # Inline so the run id is visible to the rate limiter in the same context
+    run_inline = True
+
+    def __init__(self, pool: "LLMClientPool"):
+        self.pool = pool
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs):
+        self.pool._start_run(run_id, (metadata or {}).get("llm_caller", "unknown"))
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata=None, **kwargs):
+        self.pool._start_run(run_id, (metadata or {}).get("llm_caller", "unknown"))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        self.pool._end_run(run_id, input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self.pool._end_run(run_id, error=True)
+
+
+class LLMClientPool:
+    """
+    Process-wide chat model factory with coordinated throttling and usage accounting.
+
+    get_chat_model() returns a real chat model (bind_tools, streaming and async all
+    work as before); copies for different callers share one underlying client.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        model_rpm: Optional[Dict[str, float]] = None,
+        factory: Optional[Callable[..., BaseChatModel]] = None,
+        requires_api_key: bool = True
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests_per_minute = requests_per_minute
+        self.model_rpm = model_rpm if model_rpm is not None else model_rpm_from_env()
+        self.factory = factory or _google_chat_model
+        self.requires_api_key = requires_api_key
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._clients: Dict[tuple, BaseChatModel] = {}
+        self._limiters: Dict[str, _PoolRateLimiter] = {}
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+        self._usage: Dict[str, Dict[str, float]] = {}
+        self._handler = _UsageHandler(self)
+
+    def rate_limiter(self, model: str) -> _PoolRateLimiter:
+        """The shared limiter of a model (created on first use)"""
+        with self._lock:
+            if model not in self._limiters:
+                rpm = self.model_rpm.get(model, self.requests_per_minute)
+                self._limiters[model] = _PoolRateLimiter(self, rpm)
+            return self._limiters[model]
+
+    def get_chat_model(self, caller: str, model: str = DEFAULT_MODEL, temperature: float = 0.0, **kwargs) -> BaseChatModel:
+        """
+        Chat model for a caller
+
+        Args:
+            caller: Name usage is reported under, e.g. 'intent_router'
+            model: Model name
+            temperature: Sampling temperature
+            **kwargs: Extra client settings (part of the client key)
+
+        Returns:
+            Chat model sharing the client, rate limiter and concurrency limit of the pool
+        """
+        key = (model, temperature, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+        limiter = self.rate_limiter(model)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self.factory(
+                    model, temperature=temperature, rate_limiter=limiter, callbacks=[self._handler], **kwargs
+                )
+                self._clients[key] = client
+                logger.info(f"LLM client created for {model} (temperature={temperature})")
+        # Shallow copy: same underlying connection, own caller metadata
+        return client.model_copy(update={"metadata": {**(client.metadata or {}), "llm_caller": caller}})
+
+    def _start_run(self, run_id: UUID, caller: str):
+        _starting_run.set(run_id)
+        with self._lock:
+            self._runs[run_id] = {"caller": caller, "start": time.perf_counter(), "slot": False}
+
+    def _hold_slot(self, run_id: Optional[UUID]):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None:
+                run["slot"] = True
+                return
+        # No run to attach the slot to (called outside a callback-managed run)
+        self._slots.release()
+
+    def _end_run(self, run_id: UUID, input_tokens: int = 0, output_tokens: int = 0, error: bool = False):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            if run is None:
+                return
+            usage = self._usage.setdefault(run["caller"], {
+                "calls": 0, "errors": 0, "input_tokens": 0, "output_tokens": 0, "seconds": 0.0
+            })
+            usage["calls"] += 1
+            usage["errors"] += int(error)
+            usage["input_tokens"] += input_tokens
+            usage["output_tokens"] += output_tokens
+            elapsed = time.perf_counter() - run["start"]
+            usage["seconds"] += elapsed
+        record_stage(f"llm:{run['caller']}", elapsed)
+        if run["slot"]:
+            self._slots.release()
+
+    @property
+    def in_flight(self) -> int:
+        """Model calls currently holding a concurrency slot"""
+        with self._lock:
+            return sum(1 for run in self._runs.values() if run["slot"])
+
+    def usage(self) -> Dict[str, Dict[str, float]]:
+        """Per-caller usage totals"""
+        with self._lock:
+            return {caller: dict(stats) for caller, stats in self._usage.items()}
+
+
+_pool: Optional[LLMClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def _fake_factory_from_env() -> Optional[Callable[..., BaseChatModel]]:
+    """Record/replay factory selected by LLM_FAKE_MODE (see fake_llm.py)"""
+    if not os.environ.get("LLM_FAKE_MODE"):
+        return None
+    if __package__:
+        from .fake_llm import factory_from_env
+    else:
+        from fake_llm import factory_from_env
+    return factory_from_env(_google_chat_model)
+
+
+def get_llm_pool() -> LLMClientPool:
+    """Process-wide pool (created on first use)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            factory = _fake_factory_from_env()
+            _pool = LLMClientPool(
+                factory=factory,
+                requires_api_key=os.environ.get("LLM_FAKE_MODE", "").lower() != "replay"
+            )
+        return _pool
+
+
+def get_chat_model(caller: str, **kwargs) -> BaseChatModel:
+    """Chat model for a caller from the process-wide pool"""
+    return get_llm_pool().get_chat_model(caller, **kwargs)
@@ -0,0 +1,126 @@
+"""
+Low-Stock Index
+
+This module maintains the list of materials whose latest unrestricted stock covers
+fewer than a configurable number of days of recent outbound demand. The index is
+derived from the inventory metrics engine, rebuilt only when the underlying data
+changes, and served directly to the chat UI without an LLM round trip.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, Optional
+import pandas as pd
+from loguru import logger
+
+from .inventory_metrics import InventoryMetricsEngine
+from .warehouse_data import data_version
+
+LOW_STOCK_TABLE = "low_stock_index"
+DEFAULT_COVERAGE_DAYS = float(os.environ.get("LOW_STOCK_COVERAGE_DAYS", "14"))
+
+# Sample question in the sidebar that is answered straight from the index
+LOW_STOCK_QUESTION = "Show me materials with low stock levels"
+
+
+class LowStockIndex:
+    """
+    Index of plant x material rows with days of supply below coverage_days.
+
+    Rows with no stock left but recent outbound demand are flagged as stocked out.
+    The data fingerprint is checked at most every check_interval_seconds; the
+    metrics and the index are only recomputed when it changes.
+    """
+
+    def __init__(
+        self,
+        metrics_engine: InventoryMetricsEngine,
+        coverage_days: float = DEFAULT_COVERAGE_DAYS,
+        check_interval_seconds: float = 60.0,
+        publish: bool = True
+    ):
+        self.metrics_engine = metrics_engine
+        self.coverage_days = coverage_days
+        self.check_interval_seconds = check_interval_seconds
+        self.publish = publish
+        self.index: Optional[pd.DataFrame] = None
+        self._data_version: Optional[str] = None
+        self._last_checked: float = 0.0
+        self._lock = threading.Lock()
+
+    def build(self, metrics: pd.DataFrame) -> pd.DataFrame:
+        """Select low-stock rows from inventory metrics"""
+        moving = metrics[metrics["daily_outbound_mt"] > 0]
+        low = moving[moving["days_of_supply"] < self.coverage_days].copy()
+        low["stock_out"] = low["stock_mt"] <= 0
+        low["coverage_threshold_days"] = self.coverage_days
+        columns = [
+            "plant_name", "material_name", "stock_mt", "daily_outbound_mt", "days_of_supply",
+            "stockout_eta", "stock_out", "coverage_threshold_days", "balance_as_of_date"
+        ]
+        return low[columns].sort_values(["days_of_supply", "daily_outbound_mt"], ascending=[True, False]).reset_index(drop=True)
+
+    def refresh_if_changed(self, force: bool = False) -> pd.DataFrame:
+        """Rebuild the index when the data fingerprint changed since the last build"""
+        with self._lock:
+            now = time.time()
+            if not force and self.index is not None and now - self._last_checked < self.check_interval_seconds:
+                return self.index
+            self._last_checked = now
+
+            try:
+                version = data_version(self.metrics_engine.engine)
+                if force or self.index is None or version != self._data_version:
+                    start_time = time.time()
+                    metrics = self.metrics_engine.refresh()
+                    self.index = self.build(metrics)
+                    self._data_version = version
+
+                    if self.publish:
+                        self.index.to_sql(LOW_STOCK_TABLE, self.metrics_engine.engine, if_exists="replace", index=False)
+
+                    execution_time = time.time() - start_time
+                    logger.info(f"Low-stock index rebuilt: {len(self.index)} rows below {self.coverage_days} days in {execution_time:.2f}s")
+            except Exception as e:
+                logger.error(f"Low-stock index refresh failed: {e}")
+                if self.index is None:
+                    raise
+            return self.index
+
+    def query(self, plant_name: Optional[str] = None, limit: int = 20) -> Dict[str, Any]:
+        """
+        Serve low-stock rows in the response format used by the chat UI.
+
+        Args:
+            plant_name: Optional plant filter
+            limit: Maximum number of rows
+
+        Returns:
+            Dict with type 'text_with_sql_and_dataframe'
+        """
+        df = self.refresh_if_changed()
+        sql_query = f"SELECT * FROM {LOW_STOCK_TABLE}"
+        if plant_name:
+            df = df[df["plant_name"] == plant_name]
+            sql_query += " WHERE plant_name = '" + plant_name.replace("'", "''") + "'"
+        total = len(df)
+        limit = int(limit)
+        df = df.head(limit).reset_index(drop=True)
+        sql_query += f" ORDER BY days_of_supply ASC LIMIT {limit}"
+
+        if total == 0:
+            text = f"No materials are below {self.coverage_days:g} days of supply based on recent outbound."
+        else:
+            stock_outs = int(df["stock_out"].sum())
+            text = (
+                f"{total} plant/material combinations have less than {self.coverage_days:g} days of supply "
+                f"at the current outbound rate ({stock_outs} of the {len(df)} shown are already out of stock)."
+            )
+
+        return {
+            "type": "text_with_sql_and_dataframe",
+            "text": text,
+            "sql_query": sql_query,
+            "dataframe": df
+        }
@@ -0,0 +1,299 @@
+"""
+Tiered Model Routing
+
+Picks the chat model for each agent run from an ordered list of tiers, cheapest
+first, instead of sending every question to the same model:
+- a question is scored for complexity from cheap local features (length,
+  analytical wording, grouping, several clauses or questions, chart requests),
+  with no model call; the first tier whose bound covers the score runs it
+- the tier is set for the run in a context variable, so the agent graph, its
+  nested SQL agent and the tool threads all use the tier's model
+- a finished run is validated (an answer was given, no malformed tool calls,
+  the last tool call did not fail); a failed run is repeated on the next tier
+  only if it executed no tool calls, since repeating those could repeat their
+  side effects
+
+Tiers can name a model of the shared LLM pool or hold any LangChain chat model.
+The router reports requests, escalations, latency percentiles, the agent
+model's token usage and its estimated cost per tier.
+
+Configure with MODEL_ROUTING (default 0), MODEL_ROUTING_DEFAULT_TIER (default
+standard; used for runs outside a routed request) and the tiers as
+name=model:max_complexity, the last tier taking everything above:
+    MODEL_TIERS="fast=gemini-2.5-flash-lite:0.35,standard=gemini-2.5-flash"
+"""
+
+import os
+import re
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from loguru import logger
+
+from .llm_pool import DEFAULT_MODEL, LLMClientPool, get_llm_pool
+
+MODEL_ROUTING = os.environ.get("MODEL_ROUTING", "0") == "1"
+MODEL_ROUTING_DEFAULT_TIER = os.environ.get("MODEL_ROUTING_DEFAULT_TIER", "standard")
+DEFAULT_MODEL_TIERS = "fast=gemini-2.5-flash-lite:0.35,standard=gemini-2.5-flash"
+# USD per million input/output tokens, for the cost estimate
+MODEL_PRICES = {
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+# Recent run times kept per tier for the metrics
+RECENT_SAMPLES = 1000
+
+ANALYTICAL_TERMS = re.compile(
+    r"\b(compar\w*|versus|vs|trends?|over time|forecast\w*|predict\w*|why|explain\w*|correlat\w*|"
+    r"growth|grow\w*|chang\w*|increas\w*|decreas\w*|seasonal\w*|anomal\w*|outliers?|optimi\w*|"
+    r"recommend\w*|impact|ratio|percent\w*|share|average|mean|breakdown|distribution|rank\w*|"
+    r"relationship|year over year|month over month|yoy|mom|variance|cumulative|rolling)\b"
+)
+GROUPING_TERMS = re.compile(r"\b(by|per|each|across|grouped|between|among)\b")
+CHART_TERMS = re.compile(r"\b(plot|chart|graph|visuali[sz]e|histogram|scatter)\b")
+SIMPLE_TERMS = re.compile(
+    r"^(show|list|give me|what is|what's|how many|get|display|format|reformat|sort|round|rename)\b"
+)
+CLAUSE_SEPARATORS = re.compile(r",|;|\band\b|\bthen\b|\balso\b")
+
+
+def score_complexity(question: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Complexity of a question from local features, without a model call
+
+    Returns:
+        (score between 0 and 1, contribution of each feature)
+    """
+    text = " ".join(question.lower().split())
+    words = len(text.split())
+    features = {
+        "length": 0.2 if words > 25 else 0.1 if words > 12 else 0.0,
+        "analytical": min(0.45, 0.15 * len(ANALYTICAL_TERMS.findall(text))),
+        "grouping": min(0.2, 0.1 * len(GROUPING_TERMS.findall(text))),
+        "clauses": min(0.2, 0.1 * max(0, len(CLAUSE_SEPARATORS.findall(text)) - 1)),
+        "questions": 0.15 if text.count("?") > 1 else 0.0,
+        "chart": 0.1 if CHART_TERMS.search(text) else 0.0,
+        "simple": -0.1 if SIMPLE_TERMS.match(text) and words <= 12 else 0.0,
+    }
+    return min(1.0, max(0.0, sum(features.values()))), features
+
+
+def validate_turn(messages: Sequence[BaseMessage]) -> Optional[str]:
+    """
+    Why a finished run's messages are not an acceptable answer, or None if they are
+
+    Args:
+        messages: Messages the run added after the user message
+    """
+    if any(isinstance(m, AIMessage) and m.invalid_tool_calls for m in messages):
+        return "invalid_tool_call"
+    tool_messages = [m for m in messages if isinstance(m, ToolMessage)]
+    if tool_messages:
+        last = tool_messages[-1]
+        artifact = last.artifact if isinstance(last.artifact, dict) else {}
+        # The model gave up after a failed tool call instead of correcting it
+        if last.status == "error" or artifact.get("type") == "error":
+            return "tool_error"
+    final = messages[-1] if messages else None
+    if not isinstance(final, AIMessage) or final.tool_calls:
+        return "empty_answer"
+    content = final.content
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    if not str(content).strip():
+        return "empty_answer"
+    return None
+
+
+class ModelTier:
+    """A named model with the highest question complexity it is used for"""
+
+    def __init__(
+        self,
+        name: str,
+        model: Union[str, BaseChatModel],
+        max_complexity: Optional[float] = None,
+        input_price: Optional[float] = None,
+        output_price: Optional[float] = None
+    ):
+        """
+        Args:
+            name: Tier name used in logs and metrics, e.g. 'fast'
+            model: Model name in the LLM pool, or any LangChain chat model
+            max_complexity: Highest score routed to this tier; None for no limit
+            input_price: USD per million input tokens (default: MODEL_PRICES)
+            output_price: USD per million output tokens (default: MODEL_PRICES)
+        """
+        self.name = name
+        self.model = model
+        self.max_complexity = max_complexity
+        model_name = model if isinstance(model, str) else getattr(model, "model", None)
+        default_prices = MODEL_PRICES.get(str(model_name).removeprefix("models/"), (0.0, 0.0))
+        self.input_price = default_prices[0] if input_price is None else input_price
+        self.output_price = default_prices[1] if output_price is None else output_price
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        """Estimated USD cost of the given token usage"""
+        return (input_tokens * self.input_price + output_tokens * self.output_price) / 1_000_000
+
+
+def tiers_from_env() -> List[ModelTier]:
+    """Tiers from MODEL_TIERS="name=model:max_complexity,..." (cheapest first)"""
+    tiers = []
+    for entry in os.environ.get("MODEL_TIERS", DEFAULT_MODEL_TIERS).split(","):
+        if "=" not in entry:
+            continue
+        name, spec = entry.split("=", 1)
+        model, _, bound = spec.partition(":")
+        tiers.append(ModelTier(name.strip(), model.strip(), float(bound) if bound.strip() else None))
+    return tiers
+
+
+_current_tier: contextvars.ContextVar[Optional[ModelTier]] = contextvars.ContextVar("model_tier", default=None)
+
+
+class ModelRouter:
+    """Complexity-based model tier selection with escalation and per-tier accounting"""
+
+    def __init__(
+        self,
+        tiers: Optional[List[ModelTier]] = None,
+        llm_pool: Optional[LLMClientPool] = None,
+        scorer: Callable[[str], Tuple[float, Dict[str, float]]] = score_complexity,
+        validator: Callable[[Sequence[BaseMessage]], Optional[str]] = validate_turn,
+        default_tier: str = MODEL_ROUTING_DEFAULT_TIER,
+        enabled: bool = MODEL_ROUTING,
+        **client_kwargs
+    ):
+        """
+        Args:
+            tiers: Tiers cheapest first; defaults to MODEL_TIERS
+            llm_pool: Pool for tiers given by model name; defaults to the process-wide pool
+            scorer: Question -> (complexity score, feature contributions)
+            validator: Messages of a finished run -> failure reason or None
+            default_tier: Tier for runs outside use(), and for every run when routing is disabled
+            enabled: Route by complexity; otherwise always use the default tier
+            **client_kwargs: Extra settings for the pool clients (e.g. google_api_key)
+        """
+        self.tiers = tiers or tiers_from_env()
+        if not self.tiers:
+            self.tiers = [ModelTier("standard", DEFAULT_MODEL)]
+        self.llm_pool = llm_pool or get_llm_pool()
+        self.scorer = scorer
+        self.validator = validator
+        self.default_tier = next((t for t in self.tiers if t.name == default_tier), self.tiers[-1])
+        self.enabled = enabled
+        self.client_kwargs = client_kwargs
+        self._lock = threading.Lock()
+        self._seconds = {tier.name: deque(maxlen=RECENT_SAMPLES) for tier in self.tiers}
+        self.stats = {
+            tier.name: {"routed": 0, "runs": 0, "failures": 0, "escalations": 0,
+                        "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+            for tier in self.tiers
+        }
+
+    def select(self, question: str) -> ModelTier:
+        """Tier for a question: the first whose bound covers its complexity score"""
+        if not self.enabled:
+            tier = self.default_tier
+        else:
+            score, features = self.scorer(question)
+            tier = next(
+                (t for t in self.tiers if t.max_complexity is None or score <= t.max_complexity),
+                self.tiers[-1]
+            )
+            top = ", ".join(f"{name}={value:+.2f}" for name, value in features.items() if value)
+            logger.info(f"Model tier {tier.name} for complexity {score:.2f} ({top or 'no features'}): {question[:80]}")
+        with self._lock:
+            self.stats[tier.name]["routed"] += 1
+        return tier
+
+    def escalate(self, tier: ModelTier, reason: str) -> Optional[ModelTier]:
+        """The tier to repeat a failed run on, or None if it already ran on the last tier"""
+        index = self.tiers.index(tier)
+        if index + 1 >= len(self.tiers):
+            return None
+        next_tier = self.tiers[index + 1]
+        with self._lock:
+            self.stats[tier.name]["escalations"] += 1
+        logger.warning(f"Escalating from model tier {tier.name} to {next_tier.name} ({reason})")
+        return next_tier
+
+    @contextmanager
+    def use(self, tier: ModelTier) -> Iterator[ModelTier]:
+        """Run the block (and the threads and tasks it starts) on a tier's models"""
+        token = _current_tier.set(tier)
+        try:
+            yield tier
+        finally:
+            _current_tier.reset(token)
+
+    def current_tier(self) -> ModelTier:
+        return _current_tier.get() or self.default_tier
+
+    def chat_model(self, caller: str, tier: Optional[ModelTier] = None) -> BaseChatModel:
+        """
+        Chat model of a tier (the current one by default) for a caller
+
+        Model names come from the LLM pool, so their clients, rate limits and usage
+        accounting are shared; chat model instances are used as they are.
+        """
+        tier = tier or self.current_tier()
+        if isinstance(tier.model, str):
+            return self.llm_pool.get_chat_model(caller, model=tier.model, **self.client_kwargs)
+        return tier.model
+
+    def validate(self, messages: Sequence[BaseMessage]) -> Optional[str]:
+        """Failure reason for a finished run's messages (see validate_turn), or None"""
+        return self.validator(messages)
+
+    def record(self, tier: ModelTier, seconds: float, messages: Sequence[BaseMessage] = (), failure: Optional[str] = None):
+        """
+        Account one run on a tier
+
+        Args:
+            tier: Tier the run used
+            seconds: Run time
+            messages: Messages the run added (their usage metadata gives the agent model's tokens)
+            failure: Failure reason if the run was not accepted
+        """
+        input_tokens = output_tokens = 0
+        for message in messages:
+            usage = getattr(message, "usage_metadata", None) or {}
+            input_tokens += usage.get("input_tokens", 0)
+            output_tokens += usage.get("output_tokens", 0)
+        with self._lock:
+            stats = self.stats[tier.name]
+            stats["runs"] += 1
+            stats["failures"] += int(failure is not None)
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+            stats["cost_usd"] += tier.cost(input_tokens, output_tokens)
+            self._seconds[tier.name].append(seconds)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-tier routing, escalation, latency (ms percentiles) and token cost totals"""
+        with self._lock:
+            total_cost = sum(stats["cost_usd"] for stats in self.stats.values())
+            report = {}
+            for tier in self.tiers:
+                stats = self.stats[tier.name]
+                seconds = np.array(self._seconds[tier.name]) * 1000
+                report[tier.name] = {
+                    **stats,
+                    "model": tier.model if isinstance(tier.model, str) else type(tier.model).__name__,
+                    "cost_usd": round(stats["cost_usd"], 6),
+                    "cost_share": round(stats["cost_usd"] / total_cost, 3) if total_cost else None,
+                    "latency_ms": {
+                        f"p{p}": round(float(np.percentile(seconds, p)), 1) if len(seconds) else None
+                        for p in (50, 95)
+                    },
+                }
+            return report
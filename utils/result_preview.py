@@ -0,0 +1,97 @@
+"""
+Result Previews
+
+Bounded text previews of tool results for the LLM. A DataFrame is described by
+its row count, column dtypes, summary statistics of the numeric columns and a
+few head/tail rows, shrunk until the preview fits a token budget. The full data
+stays server-side (see artifacts.py) for rendering in the chat UI.
+
+Configure the budget with RESULT_PREVIEW_TOKENS (default 600).
+"""
+
+import os
+from typing import Optional
+
+import pandas as pd
+
+from .schema_selector import estimate_tokens
+
+RESULT_PREVIEW_TOKENS = int(os.environ.get("RESULT_PREVIEW_TOKENS", "600"))
+MAX_HEAD_ROWS = 10
+MAX_TAIL_ROWS = 5
+MAX_CELL_WIDTH = 40
+
+
+def _format_rows(df: pd.DataFrame) -> str:
+    return df.to_string(index=False, max_colwidth=MAX_CELL_WIDTH, float_format=lambda v: f"{v:.4g}")
+
+
+def _numeric_summary(df: pd.DataFrame) -> str:
+    numeric = df.select_dtypes("number")
+    if numeric.empty:
+        return ""
+    lines = []
+    for column in numeric.columns:
+        values = numeric[column].dropna()
+        if values.empty:
+            continue
+        lines.append(
+            f"  {column}: min={values.min():.4g} mean={values.mean():.4g} max={values.max():.4g} sum={values.sum():.4g}"
+        )
+    return "Numeric summary:\n" + "\n".join(lines) if lines else ""
+
+
+def truncate_text(text: str, token_budget: int) -> str:
+    """Cut text to roughly token_budget tokens"""
+    max_chars = max(token_budget, 1) * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max(max_chars - 15, 0)].rstrip() + "\n... (truncated)"
+
+
+def preview_dataframe(df: Optional[pd.DataFrame], token_budget: int = RESULT_PREVIEW_TOKENS) -> str:
+    """
+    Describe a DataFrame for the LLM within a token budget
+
+    Args:
+        df: Result data
+        token_budget: Approximate maximum tokens of the preview
+
+    Returns:
+        Row count, dtypes, numeric summary and as many head/tail rows as fit
+    """
+    if df is None:
+        return "No result data."
+
+    header = f"Result: {len(df)} rows x {len(df.columns)} columns."
+    if len(df.columns):
+        header += "\nColumns: " + ", ".join(f"{column} ({dtype})" for column, dtype in df.dtypes.items())
+    if df.empty:
+        return truncate_text(header, token_budget)
+
+    # Statistics are only worth their tokens when the rows are not all shown
+    summary = _numeric_summary(df) if len(df) > MAX_HEAD_ROWS + MAX_TAIL_ROWS else ""
+    fixed = "\n".join(part for part in (header, summary) if part)
+    if estimate_tokens(fixed) > token_budget:
+        fixed = header
+
+    head_rows, tail_rows = MAX_HEAD_ROWS, MAX_TAIL_ROWS
+    while head_rows > 0:
+        if len(df) <= head_rows + tail_rows:
+            rows = _format_rows(df)
+        else:
+            omitted = len(df) - head_rows - tail_rows
+            rows = _format_rows(df.head(head_rows))
+            if tail_rows:
+                rows += f"\n... {omitted} rows omitted ...\n" + _format_rows(df.tail(tail_rows)).split("\n", 1)[-1]
+            else:
+                rows += f"\n... {omitted} more rows"
+        preview = f"{fixed}\n{rows}"
+        if estimate_tokens(preview) <= token_budget:
+            return preview
+        # Shrink the tail first, then the head
+        if tail_rows:
+            tail_rows = max(tail_rows - 2, 0)
+        else:
+            head_rows = head_rows // 2
+    return truncate_text(fixed, token_budget)
@@ -0,0 +1,351 @@
+"""
+Question-Aware Schema Selection for the SQL Agent Prompt
+
+The SQL agent's system prompt used to inline every table, business rule and the
+chart workflow on every call. This module keeps that content as a column catalog
+and renders only what a question needs:
+- tables and columns matched by keywords, column names and local embeddings
+- business rules tied to the selected tables
+- chart workflow text only for visualization questions
+Tables left out are still listed by name so the agent can fetch their schema.
+When nothing matches, the full prompt is used.
+
+Prompt sizes are estimated at ~4 characters per token; tokens saved per call and
+in total are logged and kept in SchemaSelector.stats.
+"""
+
+import re
+import math
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+from .sql_cache import HashingEmbeddings
+
+INTRO = "You are an expert supply chain data analyst with access to a PostgreSQL database containing warehouse management data."
+
+# table -> title, match keywords, columns as (name, description, always included)
+TABLES = {
+    "inventory": {
+        "title": "INVENTORY (Monthly snapshots at Plant + Material + Batch level)",
+        "keywords": ["inventory", "stock", "snapshot", "on hand", "batch", "lot", "sell value", "stock value", "warehouse level"],
+        "columns": [
+            ("balance_as_of_date", "Inventory snapshot date", True),
+            ("plant_name", "Plant/warehouse name", True),
+            ("material_name", "Product being stocked", True),
+            ("batch_number", "Production run/lot identifier", False),
+            ("unrestricted_stock", "Available quantity in warehouse", True),
+            ("stock_unit", "Unit of measurement (typically KG)", True),
+            ("stock_sell_value", "Inventory sell value", False),
+            ("currency", "Currency for stock_sell_value (CNY/SGD)", False),
+        ],
+    },
+    "inbound": {
+        "title": "INBOUND (Material imports into warehouses)",
+        "keywords": ["inbound", "import", "receipt", "received", "receiving", "arrival", "incoming", "throughput"],
+        "columns": [
+            ("inbound_date", "Transaction date", True),
+            ("plant_name", "Plant/warehouse name", True),
+            ("material_name", "Product imported", True),
+            ("net_quantity_mt", "Quantity in Metric Tons", True),
+        ],
+    },
+    "outbound": {
+        "title": "OUTBOUND (Material exports/sales from warehouses)",
+        "keywords": ["outbound", "sale", "sold", "sell", "shipment", "shipped", "ship", "export", "customer",
+                     "demand", "delivery", "transport", "truck", "marine", "throughput"],
+        "columns": [
+            ("outbound_date", "Transaction date", True),
+            ("plant_name", "Plant/warehouse name", True),
+            ("mode_of_transport", "Transportation method (Truck/Marine)", False),
+            ("material_name", "Product shipped", True),
+            ("customer_number", "Recipient identifier", False),
+            ("net_quantity_mt", "Quantity in Metric Tons", True),
+        ],
+    },
+    "material_master": {
+        "title": "MATERIAL_MASTER (Product specifications)",
+        "keywords": ["polymer", "shelf life", "expire", "expiry", "expired", "downgrade", "specification", "grade", "material type"],
+        "columns": [
+            ("material_name", "Product identifier", True),
+            ("polymer_type", "Material polymer classification", False),
+            ("shelf_life_in_month", "Storage duration before quality degradation", False),
+            ("downgrade_value_lost_percent", "Value loss percentage for expired materials", False),
+        ],
+    },
+    "operation_costs": {
+        "title": "OPERATION_COSTS (Storage and transfer costs)",
+        "keywords": ["cost", "expense", "price", "rate", "tariff", "storage", "transfer", "container", "spend"],
+        "columns": [
+            ("operation_category", "Cost category", False),
+            ("cost_type", "Specific cost type (Inventory Storage per MT per day, Transfer cost per container)", True),
+            ("entity_name", "Plant or entity name", True),
+            ("entity_type", "Type of entity", False),
+            ("cost_amount", "Cost value", True),
+            ("cost_unit", "Cost unit", True),
+            ("container_capacity_mt", "Container capacity (24.75 MT standard)", False),
+            ("currency", "Cost currency", True),
+        ],
+    },
+}
+
+# Precomputed tables -> prompt lines, match keywords
+PRECOMPUTED_TABLES = {
+    "inventory_metrics": (
+        "- inventory_metrics: plant_name, material_name, stock_mt, daily_outbound_mt, days_of_supply,\n"
+        "  turnover_ratio, stockout_eta (trailing 90-day outbound velocity vs latest inventory snapshot)",
+        ["days of supply", "coverage", "turnover", "stockout", "stock-out", "run out", "running out", "velocity"],
+    ),
+    "low_stock_index": (
+        "- low_stock_index: materials below the days-of-supply threshold, with a stock_out flag",
+        ["low stock", "running out", "run out", "stock out", "stock-out", "shortage"],
+    ),
+    "abc_xyz_classification": (
+        "- abc_xyz_classification: month, entity_type ('material'/'customer'), plant_name, entity,\n"
+        "  total_volume_mt, demand_cv, abc_class (volume share), xyz_class (demand variability)",
+        ["abc", "xyz", "classification", "classify", "pareto", "erratic", "volatile", "variability"],
+    ),
+    "transport_cost_rollup": (
+        "- transport_cost_rollup: month, plant_name, customer_number, mode_of_transport, alternative_mode,\n"
+        "  shipments, volume_mt, containers, realized_cost_usd, counterfactual_cost_usd, savings_potential_usd",
+        ["savings", "counterfactual", "cheaper mode", "truck vs marine", "marine vs truck", "transport cost", "transfer cost"],
+    ),
+}
+
+SQL_RULES = """SQL RULES & BEST PRACTICES:
+- All column names are lowercase without quotes
+- ALWAYS put LIMIT to a maximum of 20 rows for each query
+- Use proper PostgreSQL syntax (DATE_TRUNC, TO_CHAR, EXTRACT)
+- Example: SELECT material_name, SUM(net_quantity_mt) FROM outbound"""
+
+# Business rules -> tables they apply to (None = always)
+BUSINESS_RULES = [
+    ("Stock quantities: KG (inventory) vs MT (inbound/outbound)", {"inventory"}),
+    ("Currency varies by region: CNY (China), SGD (Singapore)", {"inventory", "operation_costs"}),
+    ("Container capacity: 24.75 MT standard", {"outbound", "operation_costs"}),
+    ("Unit conversions: 1 KT = 1,000 MT, 1 MT = 1,000 KG", None),
+    ("Batch tracking: Materials grouped by production runs with shelf life", {"inventory", "material_master"}),
+    ("Cost calculations: Storage costs are per MT per day, transfer costs per container", {"operation_costs"}),
+]
+
+KEY_ANALYSIS_AREAS = """KEY ANALYSIS AREAS:
+- Inventory levels and turnover by plant/material/batch
+- Inbound vs outbound transaction patterns and trends
+- Material shelf life management and downgrade risks
+- Transportation mode efficiency and costs
+- Plant capacity utilization and overflow prevention
+- Customer demand patterns and forecasting accuracy"""
+
+CHART_GUIDANCE = """CHART WORKFLOW:
+1. Only create charts when user explicitly requests visualization (words like "plot", "chart", "graph", "show me a chart")
+2. When user requests visualizations, first use analyze_supply_chain_data
+3. Then use appropriate chart tool with data_query='use_last'
+4. Never create new SQL for chart tools - reuse analyzed data
+
+FOLLOW-UP EFFICIENCY:
+- For chart follow-up questions, use analyze_existing_chart_data tool
+- Examples: "What's the peak month?", "Highest value?", "Trend analysis?"
+- More efficient than new SQL queries for chart data analysis"""
+
+# Optional columns pulled in by vocabulary that doesn't name them directly
+COLUMN_KEYWORDS = {
+    "batch_number": ["batch", "lot"],
+    "stock_sell_value": ["value", "worth", "sell"],
+    "mode_of_transport": ["truck", "marine", "transport", "mode"],
+    "customer_number": ["customer", "cst-", "client"],
+    "polymer_type": ["polymer", "type"],
+    "shelf_life_in_month": ["shelf life", "expir"],
+    "downgrade_value_lost_percent": ["downgrade", "expir", "value lost"],
+    "operation_category": ["category"],
+    "entity_type": ["entity"],
+    "container_capacity_mt": ["container", "capacity"],
+}
+
+CHART_KEYWORDS = ["plot", "chart", "graph", "visuali", "trend"]
+
+CLOSING = "Always provide actionable business insights considering operational costs, capacity constraints, shelf life impacts, and cross-plant optimization opportunities."
+
+# Literal ids that imply a table
+LITERAL_TABLE_HINTS = [
+    (re.compile(r"\bcst-\d+"), "outbound"),
+]
+
+DEFAULT_COLUMN_SIMILARITY = 0.45
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return math.ceil(len(text) / 4)
+
+
+def _mentions(text: str, phrase: str) -> bool:
+    """Whole-word (prefix) match of a keyword phrase in lowercased text"""
+    return re.search(r"\b" + re.escape(phrase), text) is not None
+
+
+def render_prefix(
+    tables: Optional[Dict[str, List[str]]] = None,
+    precomputed: Optional[List[str]] = None,
+    include_charts: bool = True,
+    include_analysis_areas: bool = True
+) -> str:
+    """
+    Render the SQL agent system prefix.
+
+    Args:
+        tables: table -> columns to describe (None = all tables and columns)
+        precomputed: precomputed tables to describe (None = all)
+        include_charts: Include the chart workflow and follow-up guidance
+        include_analysis_areas: Include the general analysis areas section
+
+    Returns:
+        Prompt text
+    """
+    pruned = tables is not None
+    tables = tables if pruned else {name: [c[0] for c in spec["columns"]] for name, spec in TABLES.items()}
+    precomputed = list(PRECOMPUTED_TABLES) if precomputed is None else precomputed
+
+    sections = [INTRO]
+
+    schema_lines = ["DATABASE SCHEMA:", ""]
+    for number, (table, columns) in enumerate(tables.items(), start=1):
+        spec = TABLES[table]
+        schema_lines.append(f"{number}. {spec['title']}:")
+        schema_lines.extend(f"   - {name}: {desc}" for name, desc, _ in spec["columns"] if name in columns)
+        schema_lines.append("")
+    other_tables = [t for t in TABLES if t not in tables] + [t for t in PRECOMPUTED_TABLES if t not in precomputed]
+    if pruned and other_tables:
+        schema_lines.append(f"Other tables (use sql_db_schema if needed): {', '.join(other_tables)}")
+        schema_lines.append("")
+    sections.append("\n".join(schema_lines).rstrip())
+
+    sections.append(SQL_RULES)
+
+    rules = [rule for rule, applies_to in BUSINESS_RULES if applies_to is None or applies_to & set(tables)]
+    sections.append("BUSINESS RULES & CONVERSIONS:\n" + "\n".join(f"- {rule}" for rule in rules))
+
+    if precomputed:
+        sections.append(
+            "PRECOMPUTED TABLES (refreshed nightly, prefer them over recomputing):\n"
+            + "\n".join(PRECOMPUTED_TABLES[t][0] for t in precomputed)
+        )
+
+    if include_analysis_areas:
+        sections.append(KEY_ANALYSIS_AREAS)
+    if include_charts:
+        sections.append(CHART_GUIDANCE)
+
+    sections.append(CLOSING)
+    return "\n" + "\n\n".join(sections) + "\n"
+
+
+FULL_PREFIX = render_prefix()
+
+
+class SchemaSelector:
+    """
+    Picks the tables and columns relevant to a question from the column catalog.
+
+    Column descriptions are embedded once at construction; selection is keyword
+    matching plus one matrix-vector product over the column embeddings.
+    """
+
+    def __init__(self, embeddings=None, column_similarity: float = DEFAULT_COLUMN_SIMILARITY):
+        self.embeddings = embeddings or HashingEmbeddings()
+        self.column_similarity = column_similarity
+        self._columns: List[Tuple[str, str]] = [
+            (table, name) for table, spec in TABLES.items() for name, _, _ in spec["columns"]
+        ]
+        documents = [
+            f"{table} {name.replace('_', ' ')} {desc}"
+            for table, spec in TABLES.items() for name, desc, _ in spec["columns"]
+        ]
+        self._column_matrix = np.array(self.embeddings.embed_documents(documents))
+        self.full_tokens = estimate_tokens(FULL_PREFIX)
+        self.stats = {"prompts": 0, "pruned": 0, "tokens_full": 0, "tokens_sent": 0}
+
+    def select(self, question: str) -> Tuple[Dict[str, List[str]], List[str]]:
+        """
+        Select relevant tables/columns and precomputed tables for a question.
+
+        Returns:
+            (table -> columns in catalog order, precomputed table names); both empty if nothing matched
+        """
+        text = question.lower()
+        vector = np.asarray(self.embeddings.embed_query(question))
+        similarities = self._column_matrix @ vector
+
+        matched_columns: Dict[str, set] = {}
+        for (table, name), similarity in zip(self._columns, similarities):
+            if (
+                name in text
+                or name.replace("_", " ") in text
+                or any(_mentions(text, keyword) for keyword in COLUMN_KEYWORDS.get(name, []))
+                or similarity >= self.column_similarity
+            ):
+                matched_columns.setdefault(table, set()).add(name)
+
+        matched_tables = {
+            table for table, spec in TABLES.items()
+            if any(_mentions(text, keyword) for keyword in spec["keywords"])
+        }
+        matched_tables |= {table for pattern, table in LITERAL_TABLE_HINTS if pattern.search(text)}
+        # A column match only selects its table when the column is specific to it
+        for table, names in matched_columns.items():
+            if any(sum(name == other for _, other in self._columns) == 1 for name in names):
+                matched_tables.add(table)
+
+        tables = {}
+        for table, spec in TABLES.items():
+            if table in matched_tables:
+                wanted = matched_columns.get(table, set())
+                tables[table] = [name for name, _, core in spec["columns"] if core or name in wanted]
+
+        precomputed = [
+            table for table, (_, keywords) in PRECOMPUTED_TABLES.items()
+            if any(_mentions(text, keyword) for keyword in keywords)
+        ]
+        return tables, precomputed
+
+    def build_prefix(self, question: str) -> str:
+        """
+        Minimal SQL agent prefix for a question (the full prefix if nothing matched).
+
+        Logs the estimated tokens saved and updates stats.
+        """
+        tables, precomputed = self.select(question)
+        if tables or precomputed:
+            include_charts = any(_mentions(question.lower(), keyword) for keyword in CHART_KEYWORDS)
+            prefix = render_prefix(tables, precomputed, include_charts=include_charts, include_analysis_areas=False)
+            self.stats["pruned"] += 1
+        else:
+            prefix = FULL_PREFIX
+
+        tokens = estimate_tokens(prefix)
+        self.stats["prompts"] += 1
+        self.stats["tokens_full"] += self.full_tokens
+        self.stats["tokens_sent"] += tokens
+        saved = self.full_tokens - tokens
+        logger.info(
+            f"SQL prompt schema: {', '.join(list(tables) + precomputed) or 'all tables'} - "
+            f"~{tokens} tokens (saved ~{saved}, {saved / self.full_tokens:.0%}; "
+            f"total saved ~{self.stats['tokens_full'] - self.stats['tokens_sent']})"
+        )
+        return prefix
+
+
+if __name__ == "__main__":
+    selector = SchemaSelector()
+    for sample in [
+        "What are the top 5 materials by outbound volume?",
+        "Which plants have the highest storage costs?",
+        "Show me the current inventory levels by material",
+        "What is the shelf life of polymer LDPE materials?",
+        "Plot monthly inbound for CHINA-WAREHOUSE",
+        "How many shipments did CST-00012 receive by truck?",
+        "Hello there",
+    ]:
+        tables, precomputed = selector.select(sample)
+        print(f"{sample!r}: {tables} {precomputed}")
+        selector.build_prefix(sample)
+    print(selector.stats)
@@ -0,0 +1,229 @@
+"""
+Semantic NL-to-SQL Cache
+
+This module caches validated (question -> SQL) pairs so near-identical questions
+("total outbound by plant" / "outbound totals per plant") skip the SQL agent's LLM
+round trips. Questions are embedded and matched by cosine similarity above a
+threshold; entries are scoped by schema version, and literal values (material and
+customer ids, numbers, dates) must match exactly so "top 5" never serves "top 10".
+
+Any LangChain Embeddings object can be used (e.g. HuggingFaceEmbeddings); the
+default HashingEmbeddings is local, dependency-free and sub-millisecond.
+"""
+
+import re
+import time
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect
+from loguru import logger
+
+from .warehouse_data import DATA_VERSION_TTL_SECONDS, cached_data_version
+
+DEFAULT_SIMILARITY_THRESHOLD = float(os.environ.get("SQL_CACHE_SIMILARITY_THRESHOLD", "0.9"))
+
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "by", "per", "in", "on", "to", "and", "with", "each",
+    "me", "show", "give", "what", "which", "is", "are", "was", "were", "our", "all", "please",
+    "list", "tell", "how", "much", "many", "do", "does", "we", "i", "can", "you", "from"
+}
+
+# Tokens carrying literal values that change the SQL (ids, numbers, dates)
+LITERAL_PATTERN = re.compile(r"\b(?:[a-z]+-\d+|\d+(?:[./-]\d+)*)\b")
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def normalize_question(question: str) -> List[str]:
+    """Lowercase, drop stopwords and reduce simple plurals"""
+    tokens = []
+    for token in WORD_PATTERN.findall(question.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def literal_tokens(question: str) -> frozenset:
+    """Literal values in a question that must match for a cache hit"""
+    return frozenset(LITERAL_PATTERN.findall(question.lower()))
+
+
+class HashingEmbeddings:
+    """
+    Local bag-of-words + character trigram embeddings using the hashing trick.
+
+    Implements the embed_query/embed_documents interface of LangChain Embeddings.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def _bucket(self, feature: str) -> int:
+        return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little") % self.dimensions
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions)
+        for token in normalize_question(text):
+            vector[self._bucket("w:" + token)] += 1.0
+            padded = f"#{token}#"
+            for i in range(len(padded) - 2):
+                vector[self._bucket("c:" + padded[i:i + 3])] += 0.25
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def compute_schema_version(engine, table_names: Optional[List[str]] = None) -> str:
+    """Hash of table and column names/types, used to scope cached SQL"""
+    inspector = inspect(engine)
+    tables = sorted(table_names or inspector.get_table_names())
+    parts = []
+    for table in tables:
+        columns = inspector.get_columns(table)
+        parts.append(table + "(" + ",".join(f"{c['name']}:{c['type']}" for c in columns) + ")")
+    return hashlib.sha1(";".join(parts).encode()).hexdigest()[:12]
+
+
+class SemanticSQLCache:
+    """
+    Embedding-indexed cache of validated SQL for natural language questions.
+
+    Entries are kept in LRU order up to max_entries. Lookups are a single
+    matrix-vector product over the stored embeddings. The cache is shared by
+    concurrent requests and pooled agent workers, so lookup, store and eviction
+    hold a lock (embeddings are computed outside it).
+    """
+
+    def __init__(
+        self,
+        schema_version: str,
+        embeddings=None,
+        threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = 500,
+        version_ttl_seconds: float = DATA_VERSION_TTL_SECONDS
+    ):
+        self.schema_version = schema_version
+        self.embeddings = embeddings or HashingEmbeddings()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.version_ttl_seconds = version_ttl_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[str] = []
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+        self._lock = threading.Lock()
+
+    def _rebuild_matrix(self):
+        """Re-stack the embeddings in LRU order (lock held)"""
+        self._keys = list(self._entries)
+        self._matrix = np.array([self._entries[k]["embedding"] for k in self._keys]) if self._keys else None
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached entry for a semantically equivalent question.
+
+        Returns:
+            The entry dict (question, sql_query, answer, data_version, similarity) or None
+        """
+        vector = np.asarray(self.embeddings.embed_query(question))
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else vector
+        literals = literal_tokens(question)
+
+        with self._lock:
+            if self._matrix is None:
+                self.stats["misses"] += 1
+                return None
+            scores = self._matrix @ vector
+
+            for i in np.argsort(-scores):
+                if scores[i] < self.threshold:
+                    break
+                entry = self._entries[self._keys[i]]
+                if entry["schema_version"] == self.schema_version and entry["literals"] == literals:
+                    self._entries.move_to_end(self._keys[i])
+                    entry["hits"] += 1
+                    self.stats["hits"] += 1
+                    logger.info(f"SQL cache hit ({scores[i]:.3f}): '{question[:60]}' ~ '{entry['question'][:60]}'")
+                    return dict(entry, similarity=float(scores[i]))
+
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, question: str, sql_query: str, answer: str = "", data_version: Optional[str] = None):
+        """Cache SQL that executed successfully for a question"""
+        if not sql_query or not sql_query.lstrip().upper().startswith(("SELECT", "WITH")):
+            return
+
+        vector = np.asarray(self.embeddings.embed_query(question))
+        norm = np.linalg.norm(vector)
+        key = " ".join(normalize_question(question))
+        entry = {
+            "question": question,
+            "sql_query": sql_query,
+            "answer": answer,
+            "data_version": data_version,
+            "literals": literal_tokens(question),
+            "embedding": vector / norm if norm else vector,
+            "created": time.time(),
+            "hits": 0,
+        }
+        with self._lock:
+            entry["schema_version"] = self.schema_version
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._rebuild_matrix()
+            self.stats["stores"] += 1
+
+    def invalidate(self, schema_version: Optional[str] = None):
+        """Drop all entries (or switch to a new schema version, which has the same effect)"""
+        with self._lock:
+            if schema_version:
+                self.schema_version = schema_version
+            self._entries.clear()
+            self._rebuild_matrix()
+
+    def data_version(self, engine) -> str:
+        """Data fingerprint stored with and compared against cached answers (see cached_data_version)"""
+        return cached_data_version(engine, self.version_ttl_seconds)
+
+    def answer_from_cache(self, question: str, engine) -> Optional[Dict[str, Any]]:
+        """
+        Execute the cached SQL for a question, bypassing the SQL agent.
+
+        The cached natural language answer is reused while the data version is
+        unchanged; otherwise a short answer is derived from the fresh result.
+
+        Returns:
+            Dict in the analyze_supply_chain_data format, or None on a miss
+        """
+        entry = self.lookup(question)
+        if entry is None:
+            return None
+
+        dataframe = pd.read_sql_query(entry["sql_query"], engine)
+        current_version = self.data_version(engine)
+        if entry["answer"] and entry["data_version"] == current_version:
+            text = entry["answer"]
+        else:
+            # The rows reach the LLM through the tool's bounded DataFrame preview
+            text = f"Query returned {len(dataframe)} rows."
+
+        return {
+            "type": "text_with_sql_and_dataframe",
+            "text": text,
+            "sql_query": entry["sql_query"],
+            "dataframe": dataframe
+        }
+
@@ -0,0 +1,70 @@
+"""
+Stage Timing
+
+Per-request wall time by stage (routing, LLM calls per caller, SQL execution,
+tools, charting). A caller opens capture_stages() around a request; code along
+the request path reports durations with timed_stage() / record_stage(), which
+are no-ops when nothing is capturing. The recorder lives in a context variable,
+so it follows the request into LangGraph's tool threads and async tasks.
+"""
+
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+
+class StageTimings:
+    """Durations recorded for one request, by stage name"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self._durations.setdefault(stage, []).append(seconds)
+
+    def totals(self) -> Dict[str, float]:
+        """Total seconds per stage (a stage can run several times per request)"""
+        with self._lock:
+            return {stage: sum(values) for stage, values in self._durations.items()}
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {stage: len(values) for stage, values in self._durations.items()}
+
+
+_current: contextvars.ContextVar[Optional[StageTimings]] = contextvars.ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def capture_stages() -> Iterator[StageTimings]:
+    """Record the stages of the code run inside the block"""
+    timings = StageTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def record_stage(stage: str, seconds: float):
+    """Add a duration to the capturing request, if any"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """Time the block as one run of a stage"""
+    if _current.get() is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start_time)
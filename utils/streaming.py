@@ -0,0 +1,32 @@
+"""
+Streaming Events
+
+Progress events pushed from inside tools (SQL known, DataFrame fetched) to
+SupplyChainAgent.stream_query() through LangGraph's "custom" stream mode.
+Outside a streaming graph run emit_event() is a no-op, so tools and the
+database wrapper can call it unconditionally.
+"""
+
+from typing import Any
+from loguru import logger
+
+
+def emit_event(event: str, **payload: Any):
+    """
+    Send a custom stream event to the running graph, if any
+
+    Args:
+        event: Event name, e.g. 'sql' or 'dataframe'
+        **payload: Event fields
+    """
+    try:
+        from langgraph.config import get_stream_writer
+        writer = get_stream_writer()
+    except Exception:
+        # Not running inside a graph
+        return
+
+    try:
+        writer({"event": event, **payload})
+    except Exception as e:
+        logger.debug(f"Stream event '{event}' dropped: {e}")
@@ -7,33 +7,52 @@ This module contains the main SupplyChainAgent class with separated concerns:
 - Cleaner, more maintainable code structure
 """
 import os
+import copy
 import time
+import asyncio
 import sqlite3
 import pandas as pd
-import plotly.express as px
-from typing import Dict, Any, List, TypedDict, Annotated
+from typing import Dict, Any, List, Iterator, Optional, Tuple, TypedDict, Annotated
 
 from langchain.tools import tool
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
 from langchain.memory import ConversationBufferWindowMemory
 from langchain_community.agent_toolkits.sql.base import create_sql_agent
 from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
 from langgraph.graph import StateGraph, END
-from langgraph.graph.message import add_messages
+from langgraph.graph.message import add_messages, REMOVE_ALL_MESSAGES
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.checkpoint.sqlite import SqliteSaver
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage, RemoveMessage
 from dotenv import load_dotenv
 
 # Import custom modules
-from .database import QueryCapturingSQLDatabase, create_database_connection
+from .database import QueryCapturingSQLDatabase, create_database_connection, query_scope, iterate_in_query_scope
+from .checkpointer import ThreadedSqliteSaver
+from .tool_execution import ConcurrentToolNode
 from .tools import create_supply_chain_tools
+from .inventory_metrics import InventoryMetricsEngine
+from .low_stock import LowStockIndex, LOW_STOCK_QUESTION
+from .abc_xyz import ABCXYZClassifier
+from .demand_matrix import CustomerMaterialMatrix
+from .transport_cost import TransportCostEngine
+from .sql_cache import SemanticSQLCache, compute_schema_version
+from .schema_selector import SchemaSelector
+from .canned_queries import CannedQueries, TEMPLATES
+from .artifacts import ArtifactStore
+from .history import ConversationHistory
+from .coalescing import RequestCoalescer, conversation_fingerprint
+from .thread_memory import ThreadMemoryStore, current_thread_id
+from .deadline import DeadlineExceeded, deadline_scope, current_deadline, check_deadline, await_within_deadline
+from .llm_pool import LLMClientPool, get_llm_pool
+from .model_router import ModelRouter, ModelTier
 from loguru import logger
 
 load_dotenv()
 
+# Tools whose results carry an SQL query and DataFrame for the chat UI
+DATAFRAME_TOOL_NAMES = ('analyze_supply_chain_data', 'get_inventory_coverage', 'find_low_stock_materials',
+                        'get_abc_xyz_classification', 'compare_transport_costs')
+
 
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
@@ -50,27 +69,39 @@ class SupplyChainAgent:
     - Session persistence
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        llm_pool: Optional[LLMClientPool] = None,
+        db: Optional[QueryCapturingSQLDatabase] = None,
+        checkpointer=None
+    ):
+        """
+        Args:
+            llm_pool: Shared LLM client pool; defaults to the process-wide pool
+            db: Database connection; defaults to the Supabase database from the environment
+            checkpointer: LangGraph checkpointer; defaults to SQLite in conversations.db
+        """
         try:
             logger.info("Agent initialization started")
             
-            # Validate API key
+            # LLM clients from the shared pool (one connection, coordinated rate/concurrency limits)
+            self.llm_pool = llm_pool or get_llm_pool()
+            
+            # Validate API key (not needed when replaying recorded responses)
             self.google_api_key = os.environ.get('GOOGLE_API_KEY')
-            if not self.google_api_key:
+            if not self.google_api_key and self.llm_pool.requires_api_key:
                 error_msg = "GOOGLE_API_KEY environment variable is required"
                 logger.error(f"Agent initialization failed: {error_msg}")
                 raise ValueError(error_msg)
-
-            # Initialize LLM
-            self.llm = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                google_api_key=self.google_api_key,
-                temperature=0.0,
-                verbose=True
-            )
+            
+            self.llm = self.llm_pool.get_chat_model("supply_chain_agent", google_api_key=self.google_api_key, verbose=True)
+            self.sql_llm = self.llm_pool.get_chat_model("sql_agent", google_api_key=self.google_api_key, verbose=True)
+            
+            # Simple questions run on a cheaper model tier, escalating when the answer fails validation
+            self.model_router = ModelRouter(llm_pool=self.llm_pool, google_api_key=self.google_api_key, verbose=True)
             
             # Initialize database connection
-            self.db = create_database_connection()
+            self.db = db or create_database_connection()
             
             # Log database connection info
             try:
@@ -81,27 +112,56 @@ class SupplyChainAgent:
             except Exception as e:
                 logger.error(f"Database logging error: {e}")
             
-            # Initialize LangChain memory for pandas agent
-            self.memory = ConversationBufferWindowMemory(
-                k=5,  # Keep last 5 conversation exchanges
-                memory_key="chat_history",
-                return_messages=True
+            # LangChain memory (for the SQL agent) and chart data for follow-up questions, per thread
+            self.thread_memory = ThreadMemoryStore(
+                memory_factory=lambda: ConversationBufferWindowMemory(
+                    k=5,  # Keep last 5 conversation exchanges
+                    memory_key="chat_history",
+                    return_messages=True
+                ),
+                max_charts=3  # Keep last 3 charts
             )
             
             # Initialize LangGraph memory saver with SQLite persistence
-            try:
-                import sqlite3
-                conn = sqlite3.connect("conversations.db", check_same_thread=False)
-                self.langgraph_memory = SqliteSaver(conn)
-                logger.info("SQLite memory initialized")
-            except Exception as e:
-                # Fallback to in-memory storage
-                logger.error(f"SQLite memory initialization failed, using in-memory storage: {e}")
-                self.langgraph_memory = MemorySaver()
+            if checkpointer is not None:
+                self.langgraph_memory = checkpointer
+            else:
+                try:
+                    import sqlite3
+                    conn = sqlite3.connect("conversations.db", check_same_thread=False)
+                    self.langgraph_memory = ThreadedSqliteSaver(conn)
+                    logger.info("SQLite memory initialized")
+                except Exception as e:
+                    # Fallback to in-memory storage
+                    logger.error(f"SQLite memory initialization failed, using in-memory storage: {e}")
+                    self.langgraph_memory = MemorySaver()
+            
+            # Precomputed analytics engines (shared with the tools)
+            self.inventory_metrics = InventoryMetricsEngine(self.db._engine)
+            self.low_stock_index = LowStockIndex(self.inventory_metrics)
+            self.abc_xyz = ABCXYZClassifier(self.db._engine)
+            self.demand_matrix = CustomerMaterialMatrix(self.db._engine)
+            self.transport_costs = TransportCostEngine(self.db._engine)
             
-            # Initialize chart data memory for follow-up questions
-            self.chart_memory = {}  # Store recent chart data for follow-ups
-            self.max_stored_charts = 3  # Keep last 3 charts
+            # Semantic cache of validated SQL, scoped to the current schema
+            self.sql_cache = SemanticSQLCache(
+                schema_version=compute_schema_version(self.db._engine, self.db.get_usable_table_names())
+            )
+            
+            # Picks the tables/columns each question needs for the SQL agent prompt
+            self.schema_selector = SchemaSelector()
+            
+            # Hand-written SQL templates that answer common questions without the LLM
+            self.canned_queries = CannedQueries(self.db._engine)
+            
+            # Full tool results (DataFrames, figures) referenced by ToolMessage artifacts
+            self.artifacts = ArtifactStore()
+            
+            # Bounded per-thread message history (rolling window + summary of older turns)
+            self.history = ConversationHistory()
+            
+            # Concurrent identical questions share one agent run
+            self.coalescer = RequestCoalescer(self.db._engine)
             
             # Setup tools and agent
             self._setup_tools()
@@ -113,7 +173,21 @@ class SupplyChainAgent:
             logger.error(f"Agent initialization failed: {e}")
             raise
     
-    def store_chart_data(self, chart_type: str, dataframe, sql_query: str, description: str = ""):
+    def spawn_worker(self) -> "SupplyChainAgent":
+        """
+        Another agent for the worker pool, sharing this one's clients and state stores
+        
+        The database, LLM clients, checkpointer, precomputed engines, caches, artifacts,
+        per-thread memory, request coalescer and model router are shared (they are safe
+        for concurrent requests); the tools and compiled graph are the worker's own.
+        """
+        worker = copy.copy(self)
+        worker._setup_tools()
+        worker._setup_agent()
+        return worker
+    
+    def store_chart_data(self, chart_type: str, dataframe, sql_query: str, description: str = "",
+                         thread_id: Optional[str] = None):
         """
         Store chart data for follow-up questions
         
@@ -122,6 +196,7 @@ class SupplyChainAgent:
             dataframe: The pandas DataFrame used to create the chart
             sql_query: The SQL query used to generate the data
             description: Optional description of the chart
+            thread_id: Conversation the chart belongs to; defaults to the running graph's thread
         """
         try:
             import time
@@ -139,15 +214,8 @@ class SupplyChainAgent:
                 "columns": list(dataframe.columns) if dataframe is not None else []
             }
             
-            # Store the chart data
-            self.chart_memory[chart_id] = chart_data
-            
-            # Keep only the most recent charts
-            if len(self.chart_memory) > self.max_stored_charts:
-                # Remove oldest chart
-                oldest_id = min(self.chart_memory.keys(), 
-                              key=lambda k: self.chart_memory[k]["timestamp"])
-                del self.chart_memory[oldest_id]
+            # Store the chart data (only the thread's most recent charts are kept)
+            self.thread_memory.add_chart(thread_id or current_thread_id(), chart_data)
             
             logger.info(f"Stored chart data for {chart_type}: {len(dataframe) if dataframe is not None else 0} rows")
         except Exception as e:
@@ -175,194 +243,58 @@ class SupplyChainAgent:
     
     
     def _create_time_series_chart(self, query: str) -> Dict[str, Any]:
-        """Create time-series visualizations"""
+        """Create time-series visualizations from the canned monthly trends query"""
         try:
-            # SQL query for monthly transaction trends (lowercase columns)
-            sql_query = """
-            WITH combined_transactions AS (
-                SELECT 
-                    inbound_date as transaction_date,
-                    'INBOUND' as transaction_type,
-                    net_quantity_mt as net_quantity_mt
-                FROM inbound
-                UNION ALL
-                SELECT 
-                    outbound_date as transaction_date,
-                    'OUTBOUND' as transaction_type,
-                    net_quantity_mt as net_quantity_mt
-                FROM outbound
-            ),
-            monthly_data AS (
-                SELECT 
-                    DATE_TRUNC('month', transaction_date::DATE) as month,
-                    transaction_type,
-                    SUM(net_quantity_mt) as total_quantity
-                FROM combined_transactions
-                WHERE transaction_date IS NOT NULL
-                GROUP BY DATE_TRUNC('month', transaction_date::DATE), transaction_type
-                ORDER BY month, transaction_type
-            )
-            SELECT 
-                TO_CHAR(month, 'YYYY-MM') as month_str,
-                transaction_type,
-                total_quantity
-            FROM monthly_data;
-            """
-            
-            # Execute query and get results
-            df = pd.read_sql_query(sql_query, self.db._engine)
+            matched = self.canned_queries.match(query)
+            template, params = matched if matched else (TEMPLATES["monthly_transaction_trends"], {})
+            if template.name != "monthly_transaction_trends":
+                template, params = TEMPLATES["monthly_transaction_trends"], {"plant": params.get("plant")}
             
+            df = self.canned_queries.run(template, params)
             if df.empty:
                 return {"type": "error", "message": "No transaction data found for time series"}
             
-            fig = px.line(
-                df, 
-                x='month_str', 
-                y='total_quantity', 
-                color='transaction_type',
-                title='Monthly Transaction Trends',
-                labels={'total_quantity': 'Quantity (MT)', 'month_str': 'Month', 'transaction_type': 'Transaction Type'}
-            )
-            
-            fig.update_layout(xaxis_tickangle=-45)
+            fig = template.build_chart(df, params)
             return {"type": "plotly", "chart": fig, "description": "Monthly transaction trends showing inbound vs outbound volumes"}
             
         except Exception as e:
             return {"type": "error", "message": f"Error creating time series chart: {str(e)}"}
     
     def _create_ranking_chart(self, query: str) -> Dict[str, Any]:
-        """Create ranking/top N visualizations"""
+        """Create ranking/top N visualizations from the canned top-N queries"""
         try:
-            if 'material' in query.lower():
-                # Top materials by volume (lowercase columns)
-                sql_query = """
-                WITH combined_transactions AS (
-                    SELECT 
-                        material_name, 
-                        net_quantity_mt 
-                    FROM inbound
-                    UNION ALL
-                    SELECT 
-                        material_name, 
-                        net_quantity_mt 
-                    FROM outbound
-                ),
-                material_totals AS (
-                    SELECT 
-                        material_name,
-                        SUM(net_quantity_mt) as total_volume
-                    FROM combined_transactions
-                    WHERE material_name IS NOT NULL AND net_quantity_mt IS NOT NULL
-                    GROUP BY material_name
-                    ORDER BY total_volume DESC
-                    LIMIT 10
-                )
-                SELECT material_name, total_volume FROM material_totals;
-                """
-                
-                df = pd.read_sql_query(sql_query, self.db._engine)
-                
-                fig = px.bar(
-                    df, 
-                    x='total_volume', 
-                    y='material_name',
-                    orientation='h',
-                    title='Top 10 Materials by Total Volume',
-                    labels={'total_volume': 'Total Volume (MT)', 'material_name': 'Material'}
-                )
-                
-            elif 'plant' in query.lower():
-                # Top plants by volume (lowercase columns)
-                sql_query = """
-                WITH combined_transactions AS (
-                    SELECT 
-                        plant_name, 
-                        net_quantity_mt 
-                    FROM inbound
-                    UNION ALL
-                    SELECT 
-                        plant_name, 
-                        net_quantity_mt 
-                    FROM outbound
-                ),
-                plant_totals AS (
-                    SELECT 
-                        plant_name,
-                        SUM(net_quantity_mt) as total_volume
-                    FROM combined_transactions
-                    WHERE plant_name IS NOT NULL AND net_quantity_mt IS NOT NULL
-                    GROUP BY plant_name
-                    ORDER BY total_volume DESC
-                    LIMIT 10
-                )
-                SELECT plant_name, total_volume FROM plant_totals;
-                """
-                
-                df = pd.read_sql_query(sql_query, self.db._engine)
-                
-                fig = px.bar(
-                    df, 
-                    x='plant_name', 
-                    y='total_volume',
-                    title='Top 10 Plants by Total Volume',
-                    labels={'total_volume': 'Total Volume (MT)', 'plant_name': 'Plant'}
-                )
-                
+            matched = self.canned_queries.match(query)
+            if matched and matched[0].name.startswith("top_"):
+                template, params = matched
             else:
-                # Default: top materials (lowercase columns)
-                sql_query = """
-                WITH combined_transactions AS (
-                    SELECT 
-                        material_name, 
-                        net_quantity_mt 
-                    FROM inbound
-                    UNION ALL
-                    SELECT 
-                        material_name, 
-                        net_quantity_mt 
-                    FROM outbound
-                ),
-                material_totals AS (
-                    SELECT 
-                        material_name,
-                        SUM(net_quantity_mt) as total_volume
-                    FROM combined_transactions
-                    WHERE material_name IS NOT NULL AND net_quantity_mt IS NOT NULL
-                    GROUP BY material_name
-                    ORDER BY total_volume DESC
-                    LIMIT 10
-                )
-                SELECT material_name, total_volume FROM material_totals;
-                """
-                
-                df = pd.read_sql_query(sql_query, self.db._engine)
-                
-                fig = px.bar(df, x='material_name', y='total_volume', title='Top 10 Materials by Volume')
+                # Default: top materials (plants when the question is about plants)
+                entity = "plant" if 'plant' in query.lower() and 'material' not in query.lower() else "material"
+                template, params = TEMPLATES[f"top_{entity}s_by_total_volume"], {}
             
+            df = self.canned_queries.run(template, params)
             if df.empty:
                 return {"type": "error", "message": "No data found for ranking chart"}
             
-            fig.update_layout(xaxis_tickangle=-45)
+            fig = template.build_chart(df, params)
             return {"type": "plotly", "chart": fig, "description": "Ranking chart based on your query"}
             
         except Exception as e:
             logger.error(f"Error creating ranking chart for query '{query}': {e}")
             return {"type": "error", "message": f"Error creating ranking chart: {str(e)}"}
     
-    def get_latest_chart_data(self):
-        """Get the most recently stored chart data"""
-        if not self.chart_memory:
+    def get_latest_chart_data(self, thread_id: Optional[str] = None):
+        """Get the most recently stored chart data of a thread (defaults to the running graph's thread)"""
+        charts = self.thread_memory.charts(thread_id or current_thread_id())
+        if not charts:
             return None
         
         # Return the most recent chart
-        latest_id = max(self.chart_memory.keys(), 
-                       key=lambda k: self.chart_memory[k]["timestamp"])
-        return self.chart_memory[latest_id]
+        return max(charts, key=lambda c: c["timestamp"])
     
-    def get_chart_data_by_type(self, chart_type: str):
-        """Get the most recent chart data of a specific type"""
+    def get_chart_data_by_type(self, chart_type: str, thread_id: Optional[str] = None):
+        """Get the most recent chart data of a specific type in a thread"""
         matching_charts = [
-            chart for chart in self.chart_memory.values() 
+            chart for chart in self.thread_memory.charts(thread_id or current_thread_id())
             if chart["type"] == chart_type
         ]
         
@@ -372,9 +304,9 @@ class SupplyChainAgent:
         # Return the most recent of this type
         return max(matching_charts, key=lambda c: c["timestamp"])
     
-    def has_recent_chart_data(self) -> bool:
-        """Check if there's any recent chart data available"""
-        return len(self.chart_memory) > 0
+    def has_recent_chart_data(self, thread_id: Optional[str] = None) -> bool:
+        """Check if there's any recent chart data available in a thread"""
+        return len(self.thread_memory.charts(thread_id or current_thread_id())) > 0
     
     def _setup_tools(self):
         """Setup tools using the tools module"""
@@ -386,11 +318,17 @@ class SupplyChainAgent:
             self.scatter_plot_tool,
             self.histogram_tool,
             self.monthly_trends_tool,
-            self.analyze_chart_data_tool
+            self.analyze_chart_data_tool,
+            self.inventory_coverage_tool,
+            self.low_stock_tool,
+            self.abc_xyz_tool,
+            self.customers_buying_tool,
+            self.similar_customers_tool,
+            self.transport_cost_tool
         ) = create_supply_chain_tools(
             db=self.db,
-            llm=self.llm,
-            memory=self.memory,
+            llm=self.sql_llm,
+            memory=None,
             agent=self
         )
     
@@ -404,12 +342,30 @@ class SupplyChainAgent:
             self.scatter_plot_tool,
             self.histogram_tool,
             self.monthly_trends_tool,
-            self.analyze_chart_data_tool
+            self.analyze_chart_data_tool,
+            self.inventory_coverage_tool,
+            self.low_stock_tool,
+            self.abc_xyz_tool,
+            self.customers_buying_tool,
+            self.similar_customers_tool,
+            self.transport_cost_tool
         ]
         
+        # Chat model of the request's model tier, with the tools bound (built once per tier)
+        tier_models = {}
+        
+        def tier_model(state, runtime):
+            tier = self.model_router.current_tier()
+            if tier.name not in tier_models:
+                tier_models[tier.name] = self.model_router.chat_model("supply_chain_agent", tier).bind_tools(tools)
+            return tier_models[tier.name]
+        
+        # Independent tool calls of one step run concurrently on a bounded pool
+        # (v1 hands all calls of a step to one tool node, which keeps them in order)
         agent_node = create_react_agent(
-            model=self.llm,
-            tools=tools,
+            model=tier_model,
+            tools=ConcurrentToolNode(tools),
+            version="v1",
         )
         
         graph = StateGraph(AgentState)
@@ -420,10 +376,193 @@ class SupplyChainAgent:
         # Compile with MemorySaver for persistence
         self.app = graph.compile(checkpointer=self.langgraph_memory)
     
+    def _prepare_messages(self, query: str, existing_state) -> Tuple[List[BaseMessage], int]:
+        """
+        Graph input for a new turn: the thread's compacted history (rolling window plus
+        summary, no tool call/response pairs) followed by the new user message
+        
+        Returns:
+            (input messages, index of the new user message in the resulting state)
+        """
+        return self.history.prepare(self._stored_messages(existing_state), [HumanMessage(content=query)])
+    
+    @staticmethod
+    def _stored_messages(existing_state) -> List[BaseMessage]:
+        return list(existing_state.values.get("messages", [])) if existing_state and existing_state.values else []
+    
+    def _next_tier(
+        self,
+        tier: ModelTier,
+        messages: Optional[List[BaseMessage]],
+        turn_start: int,
+        attempt_start: float,
+        error: Optional[Exception] = None
+    ) -> Optional[ModelTier]:
+        """
+        Validate and account a graph run on a model tier
+        
+        Args:
+            tier: Tier the run used
+            messages: Graph messages after the run (None if it raised)
+            turn_start: Index of the run's user message, from _prepare_messages
+            attempt_start: perf_counter() when the run started
+            error: Exception the run raised
+        
+        Returns:
+            The tier to repeat the run on, or None to keep this run's answer
+        
+        Raises:
+            The run's error when it cannot be repeated (no tier left, tools already ran,
+            or the request has to stop)
+        """
+        turn = messages[turn_start + 1:] if messages is not None else []
+        failure = f"error: {error}" if error is not None else self.model_router.validate(turn)
+        self.model_router.record(tier, time.perf_counter() - attempt_start, turn, failure)
+        # Only runs without tool calls are repeated, so tool results recorded for the request
+        # (also those of a run that raised) can only come from this run
+        deadline = current_deadline()
+        ran_tools = any(isinstance(m, ToolMessage) for m in turn) or bool(deadline and deadline.partial_results())
+        next_tier = None
+        if failure is not None and ran_tools:
+            logger.warning(f"Not escalating a run that executed tool calls ({failure})")
+        elif failure is not None and not isinstance(error, DeadlineExceeded):
+            next_tier = self.model_router.escalate(tier, failure)
+        if next_tier is None and error is not None:
+            raise error
+        return next_tier
+    
+    def _build_response(
+        self,
+        query: str,
+        messages: List[BaseMessage],
+        start_time: float,
+        turn_start: Optional[int] = None,
+        thread_id: str = "default"
+    ) -> Dict[str, Any]:
+        """
+        Build the response dict from the graph messages of a finished run
+        
+        Args:
+            query: User's natural language query
+            messages: Full message list from the graph state
+            start_time: Time the query started processing
+            turn_start: Index of the current user message, from _prepare_messages
+            thread_id: Session the turn belongs to
+            
+        Returns:
+            Dict with response type, content, and optional chart/SQL data
+        """
+        processing_time = time.time() - start_time
+
+        # Extract final response text
+        final_message = messages[-1]
+        response_text = final_message.content if hasattr(final_message, 'content') else str(final_message)
+
+        # Check for tool calls in the conversation to extract charts and SQL data
+        chart_data = None
+        sql_query = "No SQL query captured"
+        dataframe = None
+
+        # Debug: Log the full result structure
+        logger.debug(f"LangGraph returned {len(messages)} messages")
+
+        # Index of the current user message (the one we just sent); search backwards if unknown
+        user_message_index = turn_start if turn_start is not None else -1
+        if turn_start is None:
+            for i in range(len(messages) - 1, -1, -1):
+                if isinstance(messages[i], HumanMessage) and messages[i].content == query:
+                    user_message_index = i
+                    break
+
+        # Only look at messages AFTER the current user input
+        if user_message_index >= 0:
+            current_request_messages = messages[user_message_index + 1:]
+        else:
+            # Fallback: just look at the last few messages
+            current_request_messages = messages[-4:] if len(messages) > 4 else messages
+
+        logger.debug(f"Processing {len(current_request_messages)} messages from index {user_message_index}")
+
+        # Per-tool wall times recorded by the tool node
+        tool_timings = [
+            {"tool": msg.name, "seconds": msg.response_metadata["elapsed_seconds"]}
+            for msg in current_request_messages
+            if isinstance(msg, ToolMessage) and "elapsed_seconds" in (msg.response_metadata or {})
+        ]
+        if tool_timings:
+            logger.info("Tool timings: " + ", ".join(f"{t['tool']}={t['seconds']:.2f}s" for t in tool_timings))
+
+        # Resolve the full results behind the artifact references of this turn's tool calls
+        for msg in current_request_messages:
+            if not isinstance(msg, ToolMessage):
+                continue
+            tool_result = self.artifacts.get(msg.artifact)
+            logger.debug(f"Tool {msg.name} artifact type: {type(tool_result).__name__}")
+
+            if msg.name in DATAFRAME_TOOL_NAMES:
+                if isinstance(tool_result, dict) and tool_result.get('type') == 'text_with_sql_and_dataframe':
+                    sql_query = tool_result.get('sql_query', 'No SQL query captured')
+                    dataframe = tool_result.get('dataframe')
+                elif tool_result is None:
+                    # Artifact evicted or missing, fall back to the database's last query
+                    query_info = self.db.get_last_query_info()
+                    sql_query = query_info.get("query", "No SQL query captured")
+                    if sql_query and sql_query != "No SQL query captured":
+                        try:
+                            dataframe = pd.read_sql_query(sql_query, self.db._engine)
+                        except Exception as e:
+                            logger.error(f"Could not re-run last query: {e}")
+
+            elif isinstance(tool_result, dict) and tool_result.get('type') == 'plotly':
+                chart_data = tool_result
+
+        # Store in the thread's memory
+        self.thread_memory.conversation(thread_id).save_context(
+            {"input": query},
+            {"output": response_text}
+        )
+
+        # Disabled auto-visualization - only create charts when explicitly requested
+        # chart_keywords = ['plot', 'chart', 'graph', 'trend', 'visuali']
+        # is_chart_request = any(keyword in query.lower() for keyword in chart_keywords)
+
+        # Auto-visualization disabled - charts only created when user explicitly requests them
+
+        # Return appropriate format based on what was found
+        if chart_data:
+            logger.info(f"Generated text with chart response: {len(response_text)} chars in {processing_time:.2f}s")
+            return {
+                "type": "text_with_chart",
+                "text": response_text,
+                "chart": chart_data.get("chart"),
+                "sql_query": sql_query,
+                "dataframe": dataframe,
+                "tool_timings": tool_timings
+            }
+        elif dataframe is not None or sql_query != "No SQL query captured":
+            logger.info(f"Generated text with SQL and dataframe response: {len(response_text)} chars in {processing_time:.2f}s")
+            return {
+                "type": "text_with_sql_and_dataframe",
+                "text": response_text,
+                "sql_query": sql_query,
+                "dataframe": dataframe,
+                "tool_timings": tool_timings
+            }
+        else:
+            logger.info(f"Generated text response: {len(response_text)} chars in {processing_time:.2f}s")
+            return {
+                "type": "text",
+                "content": response_text,
+                "tool_timings": tool_timings
+            }
+    
     def process_query(self, query: str, thread_id: str = "default") -> Dict[str, Any]:
         """
         Process user query with proper memory management
         
+        Concurrent requests for the same question in the same conversation context share
+        one run (see coalescing.py).
+        
         Args:
             query: User's natural language query
             thread_id: Session identifier for conversation persistence
@@ -431,12 +570,38 @@ class SupplyChainAgent:
         Returns:
             Dict with response type, content, and optional chart/SQL data
         """
+        # Only requests asked in the same conversation context share a run
+        context = conversation_fingerprint(self.get_conversation_history(thread_id))
+        flight, leader = self.coalescer.join(query, context)
+        if not leader:
+            shared = flight.wait()
+            if shared is not None:
+                return self._serve_coalesced(query, thread_id, shared)
+            self.coalescer.record_fallback()
+            flight = None
+        
+        response = None
+        try:
+            # Queries captured for this request only (tools may run concurrently with other requests)
+            with query_scope():
+                response = self._process_query(query, thread_id)
+            return response
+        finally:
+            self.coalescer.complete(flight, response)
+    
+    def _process_query(self, query: str, thread_id: str) -> Dict[str, Any]:
+        with deadline_scope(thread_id=thread_id):
+            return self._run_query(query, thread_id)
+    
+    def _run_query(self, query: str, thread_id: str) -> Dict[str, Any]:
         start_time = time.time()
         logger.info(f"Processing query: {query[:100]}...")
         
         try:
-            # Clear any previous query cache to avoid stale data
-            self.db.clear_query_cache()
+            # Common questions are answered from canned SQL without the LLM
+            canned_response = self.get_canned_response(query, thread_id)
+            if canned_response:
+                return canned_response
             
             # Create thread configuration for session persistence
             config = {"configurable": {"thread_id": thread_id}}
@@ -444,166 +609,395 @@ class SupplyChainAgent:
             # Get existing conversation history to append to
             try:
                 existing_state = self.app.get_state(config)
-                existing_messages = existing_state.values.get("messages", []) if existing_state and existing_state.values else []
             except:
-                existing_messages = []
-            
-            # Filter out incomplete tool calls to avoid the tool_use/tool_result mismatch
-            clean_messages = []
-            for msg in existing_messages:
-                # Skip messages that are tool calls without proper responses
-                if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                    # This is a tool call - skip it to avoid format issues
-                    continue
-                elif hasattr(msg, 'name') and msg.name:
-                    # This is a tool response - skip it too
-                    continue
-                else:
-                    # This is a regular message - keep it
-                    clean_messages.append(msg)
-            
-            # Add the new user message
-            clean_messages.append(HumanMessage(content=query))
-            
-            # Invoke with clean message history
-            result = self.app.invoke({"messages": clean_messages}, config)
+                existing_state = None
+            
+            tier = self.model_router.select(query)
+            while True:
+                input_messages, turn_start = self._prepare_messages(query, existing_state)
+                attempt_start = time.perf_counter()
+                messages, error = None, None
+                try:
+                    # Invoke with the bounded message history
+                    with self.model_router.use(tier):
+                        messages = self.app.invoke({"messages": input_messages}, config)["messages"]
+                except Exception as e:
+                    error = e
+                next_tier = self._next_tier(tier, messages, turn_start, attempt_start, error)
+                if next_tier is None:
+                    break
+                self.restore_thread(thread_id, self._stored_messages(existing_state))
+                tier = next_tier
             
+            return self._build_response(query, messages, start_time, turn_start, thread_id)
+        
+        except DeadlineExceeded as e:
+            return self._partial_response(query, thread_id, start_time, e)
+                
+        except Exception as e:
             processing_time = time.time() - start_time
+            error_msg = f"Error processing query: {str(e)}"
+            logger.error(f"Query processing failed in {processing_time:.2f}s: {e}")
+            return {"type": "error", "content": error_msg}
+    
+    async def aprocess_query(self, query: str, thread_id: str = "default") -> Dict[str, Any]:
+        """
+        Async process_query: awaits the graph with ainvoke so LLM, database and webhook
+        waits don't pin a thread, and many sessions can share one event loop
+        
+        Args:
+            query: User's natural language query
+            thread_id: Session identifier for conversation persistence
             
-            # Extract final response text
-            final_message = result["messages"][-1]
-            response_text = final_message.content if hasattr(final_message, 'content') else str(final_message)
+        Returns:
+            Dict with response type, content, and optional chart/SQL data
+        """
+        try:
+            context = conversation_fingerprint(await self.athread_messages(thread_id))
+        except Exception as e:
+            logger.error(f"Failed to get conversation history for thread {thread_id}: {e}")
+            context = conversation_fingerprint([])
+        flight, leader = await asyncio.to_thread(self.coalescer.join, query, context)
+        if not leader:
+            shared = await flight.await_result()
+            if shared is not None:
+                return await asyncio.to_thread(self._serve_coalesced, query, thread_id, shared)
+            self.coalescer.record_fallback()
+            flight = None
+        
+        response = None
+        try:
+            with query_scope():
+                response = await self._aprocess_query(query, thread_id)
+            return response
+        finally:
+            self.coalescer.complete(flight, response)
+    
+    async def _aprocess_query(self, query: str, thread_id: str) -> Dict[str, Any]:
+        with deadline_scope(thread_id=thread_id):
+            return await self._arun_query(query, thread_id)
+    
+    async def _arun_query(self, query: str, thread_id: str) -> Dict[str, Any]:
+        start_time = time.time()
+        logger.info(f"Processing query (async): {query[:100]}...")
+        
+        try:
+            canned_response = await asyncio.to_thread(self.get_canned_response, query, thread_id)
+            if canned_response:
+                return canned_response
             
-            # Check for tool calls in the conversation to extract charts and SQL data
-            chart_data = None
-            sql_query = "No SQL query captured"
-            dataframe = None
+            config = {"configurable": {"thread_id": thread_id}}
             
-            # Debug: Log the full result structure
-            logger.debug(f"LangGraph returned {len(result['messages'])} messages")
+            try:
+                existing_state = await self.app.aget_state(config)
+            except:
+                existing_state = None
             
-            # Find the index of the current user message (the one we just sent)
-            user_message_index = -1
-            for i, msg in enumerate(result["messages"]):
-                if hasattr(msg, 'content') and msg.content == query:
-                    user_message_index = i
+            tier = self.model_router.select(query)
+            while True:
+                input_messages, turn_start = self._prepare_messages(query, existing_state)
+                attempt_start = time.perf_counter()
+                messages, error = None, None
+                try:
+                    # Cancelled outright (not just at the next checkpoint) when the deadline passes
+                    with self.model_router.use(tier):
+                        result = await await_within_deadline(self.app.ainvoke({"messages": input_messages}, config))
+                    messages = result["messages"]
+                except Exception as e:
+                    error = e
+                next_tier = self._next_tier(tier, messages, turn_start, attempt_start, error)
+                if next_tier is None:
                     break
+                await self.arestore_thread(thread_id, self._stored_messages(existing_state))
+                tier = next_tier
             
-            # Only look at messages AFTER the current user input
-            if user_message_index >= 0:
-                current_request_messages = result["messages"][user_message_index + 1:]
-            else:
-                # Fallback: just look at the last few messages
-                current_request_messages = result["messages"][-4:] if len(result["messages"]) > 4 else result["messages"]
-            
-            logger.debug(f"Processing {len(current_request_messages)} messages from index {user_message_index}")
-            
-            for i, msg in enumerate(current_request_messages):
-                # Debug logging
-                if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                    for tc in msg.tool_calls:
-                        logger.debug(f"Found tool call: {tc['name']}")
-                
-                # Check for analyze_supply_chain_data tool calls
-                if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                    for tool_call in msg.tool_calls:
-                        if tool_call['name'] == 'analyze_supply_chain_data':
-                            # Find the corresponding tool response
-                            if i + 1 < len(current_request_messages):
-                                next_msg = current_request_messages[i + 1]
-                                if hasattr(next_msg, 'content'):
-                                    try:
-                                        # The content might be a string representation of the dict
-                                        import ast
-                                        if isinstance(next_msg.content, str) and next_msg.content.startswith('{'):
-                                            tool_result = ast.literal_eval(next_msg.content)
-                                        else:
-                                            tool_result = next_msg.content
-                                        
-                                        if isinstance(tool_result, dict):
-                                            sql_query = tool_result.get('sql_query', 'No SQL query captured')
-                                            dataframe = tool_result.get('dataframe')
-                                    except:
-                                        # If parsing fails, try to get from database cache
-                                        query_info = self.db.get_last_query_info()
-                                        sql_query = query_info.get("query", "No SQL query captured")
-                                        if sql_query and sql_query != "No SQL query captured":
-                                            try:
-                                                import pandas as pd
-                                                dataframe = pd.read_sql_query(sql_query, self.db._engine)
-                                            except:
-                                                pass
-                        
-                        # Check for chart tool calls
-                        elif tool_call['name'] in ['create_bar_chart', 'create_line_chart', 'create_scatter_plot', 'create_histogram', 'plot_monthly_transaction_trends']:
-                            # Find the corresponding tool response
-                            if i + 1 < len(current_request_messages):
-                                next_msg = current_request_messages[i + 1]
-                                if hasattr(next_msg, 'content'):
-                                    logger.debug(f"Chart tool response type: {type(next_msg.content)}")
-                                    try:
-                                        import ast
-                                        if isinstance(next_msg.content, str) and next_msg.content.startswith('{'):
-                                            tool_result = ast.literal_eval(next_msg.content)
-                                            logger.debug(f"Parsed tool result type: {tool_result.get('type')}")
-                                            if isinstance(tool_result, dict) and tool_result.get('type') == 'plotly':
-                                                # Convert JSON back to Plotly figure
-                                                try:
-                                                    import plotly.io as pio
-                                                    chart_json = tool_result.get('chart')
-                                                    if isinstance(chart_json, str):
-                                                        chart_fig = pio.from_json(chart_json)
-                                                        tool_result['chart'] = chart_fig
-                                                    chart_data = tool_result
-                                                except Exception as chart_error:
-                                                    logger.error(f"Chart reconstruction error: {chart_error}")
-                                                    chart_data = tool_result  # Use as-is if conversion fails
-                                    except:
-                                        pass
-            
-            # Store in memory
-            self.memory.save_context(
-                {"input": query},
-                {"output": response_text}
-            )
+            # Response assembly may re-read a DataFrame, keep it off the event loop
+            return await asyncio.to_thread(self._build_response, query, messages, start_time, turn_start, thread_id)
+        
+        except DeadlineExceeded as e:
+            return await asyncio.to_thread(self._partial_response, query, thread_id, start_time, e)
             
-            # Disabled auto-visualization - only create charts when explicitly requested
-            # chart_keywords = ['plot', 'chart', 'graph', 'trend', 'visuali']
-            # is_chart_request = any(keyword in query.lower() for keyword in chart_keywords)
-            
-            # Auto-visualization disabled - charts only created when user explicitly requests them
-            
-            # Return appropriate format based on what was found
-            if chart_data:
-                logger.info(f"Generated text with chart response: {len(response_text)} chars in {processing_time:.2f}s")
-                return {
-                    "type": "text_with_chart",
-                    "text": response_text,
-                    "chart": chart_data.get("chart"),
-                    "sql_query": sql_query,
-                    "dataframe": dataframe
-                }
-            elif dataframe is not None or sql_query != "No SQL query captured":
-                logger.info(f"Generated text with SQL and dataframe response: {len(response_text)} chars in {processing_time:.2f}s")
-                return {
-                    "type": "text_with_sql_and_dataframe",
-                    "text": response_text,
-                    "sql_query": sql_query,
-                    "dataframe": dataframe
-                }
-            else:
-                logger.info(f"Generated text response: {len(response_text)} chars in {processing_time:.2f}s")
-                return {
-                    "type": "text",
-                    "content": response_text
-                }
-                
         except Exception as e:
             processing_time = time.time() - start_time
             error_msg = f"Error processing query: {str(e)}"
             logger.error(f"Query processing failed in {processing_time:.2f}s: {e}")
             return {"type": "error", "content": error_msg}
     
+    def stream_query(self, query: str, thread_id: str = "default") -> Iterator[Dict[str, Any]]:
+        """
+        Process user query like process_query, yielding progress events as they happen
+        
+        Events (dicts with an "event" key):
+            tool_start: {"tool", "args"} when the agent calls a tool
+            sql: {"sql_query"} as soon as a query is executed or served
+            dataframe: {"sql_query", "dataframe"} as soon as result data is fetched
+            tool_timing: {"tool", "tool_call_id", "seconds"} as soon as each tool call finishes
+            tool_end: {"tool"} when a tool's result is added to the conversation
+            token: {"content"} answer text chunks as the model generates them
+            escalate: {"tier"} the run is repeated on a stronger model tier; discard the events so far
+            final: {"response"} the same dict process_query returns
+            error: {"content"} if processing failed
+        
+        A request for a question that is already running in the same conversation context
+        receives that run's events.
+        
+        Args:
+            query: User's natural language query
+            thread_id: Session identifier for conversation persistence
+        """
+        # Only requests asked in the same conversation context share a run
+        context = conversation_fingerprint(self.get_conversation_history(thread_id))
+        flight, leader = self.coalescer.join(query, context)
+        if not leader:
+            answered = False
+            for event in flight.events():
+                if event["event"] == "final":
+                    event = {"event": "final", "response": self._serve_coalesced(query, thread_id, event["response"])}
+                answered = answered or event["event"] in ("final", "error")
+                yield event
+            if answered:
+                return
+            self.coalescer.record_fallback()
+            flight = None
+        
+        response = None
+        try:
+            for event in iterate_in_query_scope(self._stream_query(query, thread_id)):
+                if flight is not None:
+                    flight.publish(event)
+                if event["event"] == "final":
+                    response = event["response"]
+                elif event["event"] == "error":
+                    response = {"type": "error", "content": event["content"]}
+                yield event
+        finally:
+            # Also runs when the consumer stops early; followers then run the question themselves
+            self.coalescer.complete(flight, response)
+    
+    def _stream_query(self, query: str, thread_id: str) -> Iterator[Dict[str, Any]]:
+        with deadline_scope(thread_id=thread_id):
+            yield from self._run_stream(query, thread_id)
+    
+    def _run_stream(self, query: str, thread_id: str) -> Iterator[Dict[str, Any]]:
+        start_time = time.time()
+        first_event_time = None
+        logger.info(f"Streaming query: {query[:100]}...")
+        
+        try:
+            canned_response = self.get_canned_response(query, thread_id)
+            if canned_response:
+                yield {"event": "sql", "sql_query": canned_response["sql_query"]}
+                yield {"event": "dataframe", "sql_query": canned_response["sql_query"], "dataframe": canned_response["dataframe"]}
+                yield {"event": "token", "content": canned_response["text"]}
+                yield {"event": "final", "response": canned_response}
+                return
+            
+            config = {"configurable": {"thread_id": thread_id}}
+            try:
+                existing_state = self.app.get_state(config)
+            except:
+                existing_state = None
+            tier = self.model_router.select(query)
+            while True:
+                input_messages, turn_start = self._prepare_messages(query, existing_state)
+                attempt_start = time.perf_counter()
+                messages, error = None, None
+                try:
+                    with self.model_router.use(tier):
+                        for event in self._graph_events(input_messages, config):
+                            if first_event_time is None:
+                                first_event_time = time.time() - start_time
+                                logger.info(f"First stream event ({event['event']}) after {first_event_time:.2f}s")
+                            yield event
+                    messages = self.app.get_state(config).values.get("messages", [])
+                except Exception as e:
+                    error = e
+                next_tier = self._next_tier(tier, messages, turn_start, attempt_start, error)
+                if next_tier is None:
+                    break
+                self.restore_thread(thread_id, self._stored_messages(existing_state))
+                # The events so far belong to the discarded run
+                yield {"event": "escalate", "tier": next_tier.name}
+                tier = next_tier
+            
+            yield {"event": "final", "response": self._build_response(query, messages, start_time, turn_start, thread_id)}
+        
+        except DeadlineExceeded as e:
+            yield {"event": "final", "response": self._partial_response(query, thread_id, start_time, e)}
+            
+        except Exception as e:
+            processing_time = time.time() - start_time
+            logger.error(f"Query streaming failed in {processing_time:.2f}s: {e}")
+            yield {"event": "error", "content": f"Error processing query: {str(e)}"}
+    
+    def _graph_events(self, input_messages: List[BaseMessage], config: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Progress events (see stream_query) of one streamed graph run"""
+        stream = self.app.stream(
+            {"messages": input_messages},
+            config,
+            stream_mode=["messages", "updates", "custom"],
+            subgraphs=True
+        )
+        for namespace, mode, chunk in stream:
+            check_deadline()
+            events = []
+            if mode == "custom" and isinstance(chunk, dict) and "event" in chunk:
+                events.append(chunk)
+            
+            elif mode == "messages":
+                message, metadata = chunk
+                # Answer tokens from the agent model only (not the nested SQL agent or tool output)
+                if (
+                    isinstance(message, AIMessage)
+                    and metadata.get("langgraph_node") == "agent"
+                    and not message.tool_calls
+                    and not getattr(message, "tool_call_chunks", None)
+                    and isinstance(message.content, str)
+                    and message.content
+                ):
+                    events.append({"event": "token", "content": message.content})
+            
+            elif mode == "updates" and namespace:
+                # Node updates inside the react agent subgraph
+                for update in chunk.values():
+                    for message in (update or {}).get("messages", []):
+                        if isinstance(message, AIMessage) and message.tool_calls:
+                            events.extend(
+                                {"event": "tool_start", "tool": tc["name"], "args": tc["args"]}
+                                for tc in message.tool_calls
+                            )
+                        elif isinstance(message, ToolMessage):
+                            events.append({"event": "tool_end", "tool": message.name})
+            
+            yield from events
+    
+    def get_canned_response(self, query: str, thread_id: str = "default") -> Optional[Dict[str, Any]]:
+        """
+        Answer a common question from a canned query template (no LLM call)
+        
+        The exchange is still added to the thread's conversation and the query is
+        recorded, so follow-ups ("plot that") work as after an agent answer.
+        
+        Returns:
+            Dict in the same format as process_query, or None when no template matches
+        """
+        start_time = time.time()
+        try:
+            result = self.canned_queries.answer(query)
+        except Exception as e:
+            logger.error(f"Canned query failed, falling back to the agent: {e}")
+            return None
+        if result is None:
+            return None
+        
+        self.db.record_query(result["sql_query"])
+        self.thread_memory.conversation(thread_id).save_context({"input": query}, {"output": result["text"]})
+        self._record_turn(query, thread_id, result["text"])
+        
+        processing_time = time.time() - start_time
+        logger.info(f"Served canned query {result['template']} in {processing_time:.3f}s")
+        tool_timings = [{"tool": f"canned:{result['template']}", "seconds": round(processing_time, 4)}]
+        if "chart" in result:
+            self.store_chart_data(result["template"], result["dataframe"], result["sql_query"], result["text"], thread_id)
+            return {
+                "type": "text_with_chart",
+                "text": result["text"],
+                "chart": result["chart"],
+                "sql_query": result["sql_query"],
+                "dataframe": result["dataframe"],
+                "tool_timings": tool_timings
+            }
+        return {
+            "type": "text_with_sql_and_dataframe",
+            "text": result["text"],
+            "sql_query": result["sql_query"],
+            "dataframe": result["dataframe"],
+            "tool_timings": tool_timings
+        }
+    
+    def _partial_response(self, query: str, thread_id: str, start_time: float, error: DeadlineExceeded) -> Dict[str, Any]:
+        """
+        Response for a run stopped by its deadline or by cancellation
+        
+        Built like a finished answer from the tool results that completed before the stop,
+        with a note that the answer is incomplete; an error when none of them produced data.
+        """
+        deadline = current_deadline()
+        tool_messages = [m for m in (deadline.partial_results() if deadline else []) if isinstance(m, ToolMessage)]
+        processing_time = time.time() - start_time
+        stopped = "timed out" if error.reason == "deadline" else "was cancelled"
+        logger.warning(f"Query {stopped} after {processing_time:.2f}s with {len(tool_messages)} tool results: {query[:100]}")
+        
+        if tool_messages:
+            note = f"The request {stopped} after {processing_time:.1f}s, before the answer was complete. Showing the results retrieved so far."
+            messages = [HumanMessage(content=query), *tool_messages, AIMessage(content=note)]
+            response = self._build_response(query, messages, start_time, turn_start=0, thread_id=thread_id)
+            # Only worth showing when a finished tool produced data or a chart
+            if response["type"] != "text":
+                self._record_turn(query, thread_id, note)
+                return {**response, "partial": True, "stopped": error.reason}
+        
+        return {
+            "type": "error",
+            "content": f"The request {stopped} after {processing_time:.1f}s before any results were ready.",
+            "partial": True,
+            "stopped": error.reason
+        }
+    
+    def _record_turn(self, query: str, thread_id: str, answer: str):
+        """Add a question and an answer produced outside the graph to the thread's conversation"""
+        try:
+            config = {"configurable": {"thread_id": thread_id}}
+            stored = self.app.get_state(config).values.get("messages", [])
+            # A run stopped part way has already stored the question
+            if stored and isinstance(stored[-1], HumanMessage) and stored[-1].content == query:
+                stored = stored[:-1]
+            messages, _ = self.history.prepare(stored, [HumanMessage(content=query), AIMessage(content=answer)])
+            self.app.update_state(config, {"messages": messages}, as_node="agent")
+        except Exception as e:
+            logger.error(f"Could not add answer to conversation {thread_id}: {e}")
+    
+    def _serve_coalesced(self, query: str, thread_id: str, shared: Dict[str, Any]) -> Dict[str, Any]:
+        """A coalesced request's copy of the shared response, recorded in its own thread"""
+        if shared.get("type") != "error":
+            self._record_turn(query, thread_id, shared.get("text") or shared.get("content") or "")
+        logger.info(f"Served coalesced answer to thread {thread_id}")
+        return {**shared, "coalesced": True}
+    
+    def get_low_stock_response(
+        self,
+        plant_name: str = None,
+        thread_id: Optional[str] = None,
+        query: str = LOW_STOCK_QUESTION
+    ) -> Dict[str, Any]:
+        """
+        Answer the low-stock question straight from the maintained index (no LLM call)
+        
+        Like a canned answer, the exchange is added to the thread's conversation so
+        follow-ups ("which of those are in plant X?") have it as context.
+        
+        Args:
+            plant_name: Restrict to one plant
+            thread_id: Session to record the exchange in; None to not record it
+            query: The user's question as asked
+        
+        Returns:
+            Dict in the same format as process_query
+        """
+        start_time = time.time()
+        try:
+            response = self.low_stock_index.query(plant_name=plant_name)
+            if thread_id is not None:
+                self.db.record_query(response["sql_query"])
+                self.thread_memory.conversation(thread_id).save_context({"input": query}, {"output": response["text"]})
+                self._record_turn(query, thread_id, response["text"])
+            processing_time = time.time() - start_time
+            logger.info(f"Served low-stock index: {len(response['dataframe'])} rows in {processing_time:.2f}s")
+            return response
+        except Exception as e:
+            logger.error(f"Low-stock index lookup failed: {e}")
+            return {"type": "error", "content": f"Error getting low stock materials: {str(e)}"}
+    
     def get_conversation_history(self, thread_id: str = "default") -> List[BaseMessage]:
         """Get conversation history for a specific thread"""
         try:
@@ -614,44 +1008,50 @@ class SupplyChainAgent:
             logger.error(f"Failed to get conversation history for thread {thread_id}: {e}")
             return []
     
+    async def athread_messages(self, thread_id: str = "default") -> List[BaseMessage]:
+        """Messages currently stored for a thread"""
+        state = await self.app.aget_state({"configurable": {"thread_id": thread_id}})
+        return list(state.values.get("messages", [])) if state and state.values else []
+    
+    def restore_thread(self, thread_id: str, messages: List[BaseMessage]):
+        """
+        Replace a thread's messages, e.g. to undo a run that is repeated on another model tier
+        
+        Args:
+            thread_id: Session identifier
+            messages: Messages to store (as read from the thread before the run)
+        """
+        config = {"configurable": {"thread_id": thread_id}}
+        self.app.update_state(
+            config, {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *messages]}, as_node="agent"
+        )
+    
+    async def arestore_thread(self, thread_id: str, messages: List[BaseMessage]):
+        """
+        Replace a thread's messages, e.g. to undo a speculative run whose answer was not used
+        
+        Args:
+            thread_id: Session identifier
+            messages: Messages to store (as returned by athread_messages before the run)
+        """
+        config = {"configurable": {"thread_id": thread_id}}
+        await self.app.aupdate_state(
+            config, {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *messages]}, as_node="agent"
+        )
+    
     def clear_memory(self, thread_id: str = "default"):
-        """Clear conversation memory for a specific thread"""
+        """Clear conversation memory for a specific thread (other threads are kept)"""
         try:
-            # Clear LangChain memory
-            self.memory.clear()
-            
-            # Clear LangGraph state by updating with empty messages
-            config = {"configurable": {"thread_id": thread_id}}
+            # Clear the thread's LangChain and chart memory
+            self.thread_memory.clear(thread_id)
             
-            # Update the thread state with empty messages
-            self.app.update_state(config, {"messages": []})
-            
-            # Also clear chart memory
-            self.chart_memory.clear()
-            
-            # Clear the SQLite database completely to ensure no cross-session memory
+            # Delete the thread's LangGraph checkpoints
             try:
-                if hasattr(self.langgraph_memory, 'conn'):
-                    cursor = self.langgraph_memory.conn.cursor()
-                    
-                    # Get all tables in the database
-                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-                    tables = cursor.fetchall()
-                    
-                    # Clear all tables that exist
-                    cleared_tables = []
-                    for table in tables:
-                        table_name = table[0]
-                        try:
-                            cursor.execute(f"DELETE FROM {table_name}")
-                            cleared_tables.append(table_name)
-                        except Exception as table_error:
-                            logger.debug(f"Could not clear table {table_name}: {table_error}")
-                    
-                    self.langgraph_memory.conn.commit()
-                    logger.info(f"SQLite conversation database cleared ({len(cleared_tables)} tables)")
-            except Exception as db_error:
-                logger.warning(f"Could not clear SQLite database: {db_error}")
+                self.langgraph_memory.delete_thread(thread_id)
+            except NotImplementedError:
+                # Checkpointer without deletion: update the thread state with empty messages
+                config = {"configurable": {"thread_id": thread_id}}
+                self.app.update_state(config, {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES)]})
             
             logger.info(f"Memory cleared successfully for thread {thread_id}")
             
@@ -0,0 +1,95 @@
+"""
+Per-Thread Agent Memory
+
+The LangChain conversation memory (used by the SQL agent) and the chart memory
+(DataFrames of recent charts, read by analyze_existing_chart_data) belong to a
+conversation, not to the agent object: a pool worker serves many threads, and
+one thread may be served by different workers. Both are kept here, keyed by
+thread_id, in one store shared by all workers of a pool.
+
+Tools don't receive the thread_id as an argument; current_thread_id() reads it
+from the configuration of the graph run they are executing in.
+
+Configure with THREAD_MEMORY_MAX_THREADS (default 1024); the least recently
+used threads are forgotten first.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.runnables.config import ensure_config
+
+THREAD_MEMORY_MAX_THREADS = int(os.environ.get("THREAD_MEMORY_MAX_THREADS", "1024"))
+DEFAULT_MAX_CHARTS = 3
+
+
+def current_thread_id(default: str = "default") -> str:
+    """thread_id of the graph run the caller is part of, e.g. inside a tool"""
+    return ensure_config().get("configurable", {}).get("thread_id") or default
+
+
+class _ThreadMemory:
+    def __init__(self, conversation: Any):
+        self.conversation = conversation
+        self.charts: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+class ThreadMemoryStore:
+    """Thread-safe LRU of conversation and chart memory, keyed by thread_id"""
+
+    def __init__(
+        self,
+        memory_factory: Callable[[], Any],
+        max_threads: int = THREAD_MEMORY_MAX_THREADS,
+        max_charts: int = DEFAULT_MAX_CHARTS
+    ):
+        """
+        Args:
+            memory_factory: Builds the LangChain memory of a new thread
+            max_threads: Threads kept before the least recently used is dropped
+            max_charts: Charts kept per thread
+        """
+        self.memory_factory = memory_factory
+        self.max_threads = max(1, max_threads)
+        self.max_charts = max(1, max_charts)
+        self._threads: "OrderedDict[str, _ThreadMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _thread(self, thread_id: str) -> _ThreadMemory:
+        """Memory of a thread, created on first use (lock held)"""
+        memory = self._threads.get(thread_id)
+        if memory is None:
+            memory = self._threads[thread_id] = _ThreadMemory(self.memory_factory())
+            while len(self._threads) > self.max_threads:
+                self._threads.popitem(last=False)
+        self._threads.move_to_end(thread_id)
+        return memory
+
+    def conversation(self, thread_id: str) -> Any:
+        """The thread's LangChain conversation memory"""
+        with self._lock:
+            return self._thread(thread_id).conversation
+
+    def add_chart(self, thread_id: str, chart: Dict[str, Any]):
+        """Store a chart of the thread, dropping its oldest beyond max_charts"""
+        with self._lock:
+            charts = self._thread(thread_id).charts
+            charts[chart["id"]] = chart
+            charts.move_to_end(chart["id"])
+            while len(charts) > self.max_charts:
+                charts.popitem(last=False)
+
+    def charts(self, thread_id: str) -> List[Dict[str, Any]]:
+        """The thread's stored charts, oldest first"""
+        with self._lock:
+            memory = self._threads.get(thread_id)
+            return list(memory.charts.values()) if memory else []
+
+    def clear(self, thread_id: str):
+        """Forget a thread's conversation and chart memory"""
+        with self._lock:
+            memory: Optional[_ThreadMemory] = self._threads.pop(thread_id, None)
+        if memory is not None:
+            memory.conversation.clear()
@@ -0,0 +1,83 @@
+"""
+Concurrent Tool Execution
+
+ToolNode that dispatches the independent tool calls of one agent step
+concurrently on a bounded pool (worker threads for invoke, a semaphore-bounded
+gather for ainvoke). ToolMessages come back in the order of the tool calls, and
+each carries its wall time in response_metadata["elapsed_seconds"].
+
+Each call runs in its own query_scope(), so concurrent calls don't read each
+other's captured SQL (record_query / "use_last"). Calls are not started once the
+request's deadline has passed, and finished results are kept for a partial answer.
+"""
+
+import os
+import time
+import asyncio
+import contextvars
+from typing import Optional
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.prebuilt import ToolNode
+from langgraph.runtime import Runtime
+from loguru import logger
+
+from .streaming import emit_event
+from .stage_timing import record_stage
+from .database import query_scope
+from .deadline import check_deadline, add_partial_result
+
+TOOL_MAX_CONCURRENCY = int(os.environ.get("TOOL_MAX_CONCURRENCY", "4"))
+
+# Semaphore bounding the async tool calls of the current step
+_step_semaphore: contextvars.ContextVar[Optional[asyncio.Semaphore]] = contextvars.ContextVar(
+    "tool_step_semaphore", default=None
+)
+
+
+class ConcurrentToolNode(ToolNode):
+    """ToolNode with bounded concurrent dispatch, per-call query capture and per-call timing"""
+
+    def __init__(self, tools, max_concurrency: int = TOOL_MAX_CONCURRENCY, **kwargs):
+        super().__init__(tools, **kwargs)
+        self.max_concurrency = max(1, int(max_concurrency))
+
+    # RunnableCallable passes config/runtime by inspecting these signatures, keep them explicit
+    def _func(self, input, config: RunnableConfig, runtime: Runtime):
+        # ToolNode maps the calls over an executor sized by the config's max_concurrency
+        config = {**config, "max_concurrency": self.max_concurrency}
+        return super()._func(input, config, runtime)
+
+    async def _afunc(self, input, config: RunnableConfig, runtime: Runtime):
+        token = _step_semaphore.set(asyncio.Semaphore(self.max_concurrency))
+        try:
+            return await super()._afunc(input, config, runtime)
+        finally:
+            _step_semaphore.reset(token)
+
+    def _run_one(self, call, *args, **kwargs):
+        check_deadline()
+        start_time = time.perf_counter()
+        with query_scope():
+            output = super()._run_one(call, *args, **kwargs)
+        return self._record_timing(call, output, time.perf_counter() - start_time)
+
+    async def _arun_one(self, call, *args, **kwargs):
+        semaphore = _step_semaphore.get() or asyncio.Semaphore(self.max_concurrency)
+        async with semaphore:
+            check_deadline()
+            start_time = time.perf_counter()
+            with query_scope():
+                output = await super()._arun_one(call, *args, **kwargs)
+            return self._record_timing(call, output, time.perf_counter() - start_time)
+
+    def _record_timing(self, call, output, elapsed: float):
+        """Log the call duration and attach it to the ToolMessage"""
+        logger.info(f"Tool {call['name']} finished in {elapsed:.2f}s")
+        emit_event("tool_timing", tool=call["name"], tool_call_id=call.get("id"), seconds=elapsed)
+        record_stage(f"tool:{call['name']}", elapsed)
+        if isinstance(output, ToolMessage):
+            output.response_metadata = {**(output.response_metadata or {}), "elapsed_seconds": round(elapsed, 4)}
+            add_partial_result(output)
+        return output
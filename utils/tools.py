@@ -7,6 +7,7 @@ based on user context rather than keyword matching.
 """
 
 import time
+import asyncio
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -14,6 +15,26 @@ from typing import Dict, Any, Optional
 from langchain.tools import tool
 from loguru import logger
 
+from .inventory_metrics import InventoryMetricsEngine, INVENTORY_METRICS_TABLE
+from .low_stock import LowStockIndex
+from .abc_xyz import ABCXYZClassifier, ABC_XYZ_TABLE
+from .demand_matrix import CustomerMaterialMatrix
+from .transport_cost import TransportCostEngine, TRANSPORT_COST_TABLE
+from .sql_cache import SemanticSQLCache, compute_schema_version
+from .schema_selector import SchemaSelector
+from .canned_queries import CannedQueries
+from .artifacts import ArtifactStore, with_artifacts
+from .result_preview import RESULT_PREVIEW_TOKENS
+from .streaming import emit_event
+from .stage_timing import timed_stage
+from .database import read_sql_async
+from .thread_memory import current_thread_id
+
+
+def _sql_literal(value) -> str:
+    """Quote a value as a SQL string literal"""
+    return "'" + str(value).replace("'", "''") + "'"
+
 
 def create_supply_chain_tools(db, llm, memory, agent=None):
     """
@@ -22,13 +43,118 @@ def create_supply_chain_tools(db, llm, memory, agent=None):
     Args:
         db: QueryCapturingSQLDatabase instance
         llm: Language model instance
-        memory: ConversationBufferWindowMemory instance
-        agent: SupplyChainAgent instance for chart memory access
+        memory: ConversationBufferWindowMemory instance, used when the agent has no per-thread memory
+        agent: SupplyChainAgent instance for chart and per-thread memory access
     
     Returns:
-        tuple: (analyze_tool, sql_tool, bar_tool, line_tool, scatter_tool, histogram_tool, trends_tool, chart_analysis_tool)
+        tuple: (analyze_tool, sql_tool, bar_tool, line_tool, scatter_tool, histogram_tool, trends_tool,
+                chart_analysis_tool, inventory_coverage_tool, low_stock_tool, abc_xyz_tool,
+                customers_buying_tool, similar_customers_tool, transport_cost_tool)
+        Each tool answers with a text summary (DataFrames reduced to a preview within the
+        token budget) plus an artifact reference to its full result.
     """
     
+    # Precomputed engines shared with the agent (refreshed lazily, see get_metrics)
+    inventory_metrics = getattr(agent, "inventory_metrics", None) or InventoryMetricsEngine(db._engine)
+    low_stock_index = getattr(agent, "low_stock_index", None) or LowStockIndex(inventory_metrics)
+    abc_xyz = getattr(agent, "abc_xyz", None) or ABCXYZClassifier(db._engine)
+    demand_matrix = getattr(agent, "demand_matrix", None) or CustomerMaterialMatrix(db._engine)
+    transport_costs = getattr(agent, "transport_costs", None) or TransportCostEngine(db._engine)
+    sql_cache = getattr(agent, "sql_cache", None) or SemanticSQLCache(
+        schema_version=compute_schema_version(db._engine, db.get_usable_table_names())
+    )
+    schema_selector = getattr(agent, "schema_selector", None) or SchemaSelector()
+    canned_queries = getattr(agent, "canned_queries", None) or CannedQueries(db._engine)
+    artifacts = getattr(agent, "artifacts", None) or ArtifactStore()
+    model_router = getattr(agent, "model_router", None)
+    thread_memory = getattr(agent, "thread_memory", None)
+    
+    def _build_sql_agent(query: str):
+        """SQL agent over the warehouse database with a business context prompt for the question"""
+        from langchain_community.agent_toolkits.sql.base import create_sql_agent
+        from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+        
+        # Business context prompt, pruned to the tables and rules this question needs
+        system_prefix = schema_selector.build_prefix(query)
+        
+        # Same model tier as the request's agent run
+        sql_llm = model_router.chat_model("sql_agent") if model_router else llm
+        
+        # Create SQL toolkit
+        toolkit = SQLDatabaseToolkit(db=db, llm=sql_llm)
+        
+        # Create SQL agent with the conversation memory of the request's thread
+        try:
+            return create_sql_agent(
+                llm=sql_llm,
+                toolkit=toolkit,
+                verbose=True,
+                agent_type="openai-tools",
+                prefix=system_prefix,
+                handle_parsing_errors=True,
+                memory=thread_memory.conversation(current_thread_id()) if thread_memory else memory
+            )
+        except Exception as e:
+            logger.error(f"SQL agent creation failed, trying without memory: {e}")
+            # Fallback without memory if it causes issues
+            return create_sql_agent(
+                llm=sql_llm,
+                toolkit=toolkit,
+                verbose=True,
+                agent_type="openai-tools",
+                prefix=system_prefix,
+                handle_parsing_errors=True
+            )
+    
+    def _canned_answer(query: str, start_time: float) -> Optional[Dict[str, Any]]:
+        """Answer from a canned query template if one matches (skips the SQL agent's LLM calls)"""
+        try:
+            result = canned_queries.answer(query)
+        except Exception as canned_error:
+            logger.error(f"Canned query failed: {canned_error}")
+            return None
+        if result is None:
+            return None
+        db.record_query(result["sql_query"])
+        emit_event("dataframe", sql_query=result["sql_query"], dataframe=result["dataframe"])
+        execution_time = time.time() - start_time
+        logger.info(f"Tool analyze_supply_chain_data served canned query {result['template']} in {execution_time:.2f}s")
+        return {
+            "type": "text_with_sql_and_dataframe",
+            "text": result["text"],
+            "sql_query": result["sql_query"],
+            "dataframe": result["dataframe"]
+        }
+    
+    def _serve_cached_answer(cached_result: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+        """Record and announce a semantic SQL cache hit"""
+        db.record_query(cached_result["sql_query"])
+        emit_event("dataframe", sql_query=cached_result["sql_query"], dataframe=cached_result["dataframe"])
+        execution_time = time.time() - start_time
+        logger.info(f"Tool analyze_supply_chain_data served from SQL cache in {execution_time:.2f}s")
+        return cached_result
+    
+    def _sql_agent_response(query: str, result: str, dataframe, start_time: float) -> Dict[str, Any]:
+        """Structured response for a SQL agent answer; caches the SQL once it produced a DataFrame"""
+        sql_query = db.get_last_query_info().get("query") or "No SQL query captured"
+        if dataframe is not None:
+            logger.info(f"Created DataFrame from SQL query result: shape {dataframe.shape}")
+            emit_event("dataframe", sql_query=sql_query, dataframe=dataframe)
+            
+            # The SQL executed successfully, so it is safe to reuse for similar questions
+            sql_cache.store(query, sql_query, answer=result, data_version=sql_cache.data_version(db._engine))
+        
+        execution_time = time.time() - start_time
+        logger.info(f"Tool analyze_supply_chain_data completed successfully in {execution_time:.2f}s")
+        
+        # Return structured response
+        return {
+            "type": "text_with_sql_and_dataframe",
+            "text": result,
+            "sql_query": sql_query,
+            "dataframe": dataframe
+        }
+    
     @tool
     def analyze_supply_chain_data(query: str) -> Dict[str, Any]:
         """Analyze supply chain data using SQL queries. Returns SQL, DataFrame, and natural language answer."""
@@ -37,160 +163,93 @@ def create_supply_chain_tools(db, llm, memory, agent=None):
         logger.info(f"Tool call: analyze_supply_chain_data with query: {query[:100]}")
         
         try:
-            from langchain_community.agent_toolkits.sql.base import create_sql_agent
-            from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
-            
             # Clear previous query cache
             db.clear_query_cache()
             
-            # Enhanced system prompt for SQL agent with business context
-            system_prefix = """
-You are an expert supply chain data analyst with access to a PostgreSQL database containing warehouse management data.
-
-DATABASE SCHEMA:
-
-1. INVENTORY (Monthly snapshots at Plant + Material + Batch level):
-   - balance_as_of_date: Inventory snapshot date
-   - plant_name: Plant/warehouse name
-   - material_name: Product being stocked
-   - batch_number: Production run/lot identifier
-   - unrestricted_stock: Available quantity in warehouse
-   - stock_unit: Unit of measurement (typically KG)
-   - stock_sell_value: Inventory sell value
-   - currency: Currency for stock_sell_value (CNY/SGD)
-
-2. INBOUND (Material imports into warehouses):
-   - inbound_date: Transaction date
-   - plant_name: Plant/warehouse name
-   - material_name: Product imported
-   - net_quantity_mt: Quantity in Metric Tons
-
-3. OUTBOUND (Material exports/sales from warehouses):
-   - outbound_date: Transaction date
-   - plant_name: Plant/warehouse name
-   - mode_of_transport: Transportation method (Truck/Marine)
-   - material_name: Product shipped
-   - customer_number: Recipient identifier
-   - net_quantity_mt: Quantity in Metric Tons
-
-4. MATERIAL_MASTER (Product specifications):
-   - material_name: Product identifier
-   - polymer_type: Material polymer classification
-   - shelf_life_in_month: Storage duration before quality degradation
-   - downgrade_value_lost_percent: Value loss percentage for expired materials
-
-5. OPERATION_COSTS (Storage and transfer costs):
-   - operation_category: Cost category
-   - cost_type: Specific cost type (Inventory Storage per MT per day, Transfer cost per container)
-   - entity_name: Plant or entity name
-   - entity_type: Type of entity
-   - cost_amount: Cost value
-   - cost_unit: Cost unit
-   - container_capacity_mt: Container capacity (24.75 MT standard)
-   - currency: Cost currency
-
-SQL RULES & BEST PRACTICES:
-- All column names are lowercase without quotes
-- ALWAYS put LIMIT to a maximum of 20 rows for each query
-- Use proper PostgreSQL syntax (DATE_TRUNC, TO_CHAR, EXTRACT)
-- Example: SELECT material_name, SUM(net_quantity_mt) FROM outbound
-
-BUSINESS RULES & CONVERSIONS:
-- Stock quantities: KG (inventory) vs MT (inbound/outbound)
-- Currency varies by region: CNY (China), SGD (Singapore)
-- Container capacity: 24.75 MT standard
-- Unit conversions: 1 KT = 1,000 MT, 1 MT = 1,000 KG
-- Batch tracking: Materials grouped by production runs with shelf life
-- Cost calculations: Storage costs are per MT per day, transfer costs per container
-
-KEY ANALYSIS AREAS:
-- Inventory levels and turnover by plant/material/batch
-- Inbound vs outbound transaction patterns and trends
-- Material shelf life management and downgrade risks
-- Transportation mode efficiency and costs
-- Plant capacity utilization and overflow prevention
-- Customer demand patterns and forecasting accuracy
-
-CHART WORKFLOW:
-1. Only create charts when user explicitly requests visualization (words like "plot", "chart", "graph", "show me a chart")
-2. When user requests visualizations, first use analyze_supply_chain_data
-3. Then use appropriate chart tool with data_query='use_last'
-4. Never create new SQL for chart tools - reuse analyzed data
-
-FOLLOW-UP EFFICIENCY:
-- For chart follow-up questions, use analyze_existing_chart_data tool
-- Examples: "What's the peak month?", "Highest value?", "Trend analysis?"
-- More efficient than new SQL queries for chart data analysis
-
-Always provide actionable business insights considering operational costs, capacity constraints, shelf life impacts, and cross-plant optimization opportunities.
-"""
-            
-            # Create SQL toolkit
-            toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+            canned_result = _canned_answer(query, start_time)
+            if canned_result:
+                return canned_result
             
-            # Create SQL agent with proper memory integration
+            # Serve repeated questions from the semantic SQL cache (skips the SQL agent's LLM calls)
             try:
-                agent = create_sql_agent(
-                    llm=llm,
-                    toolkit=toolkit,
-                    verbose=True,
-                    agent_type="openai-tools",
-                    prefix=system_prefix,
-                    handle_parsing_errors=True,
-                    memory=memory
-                )
-            except Exception as e:
-                logger.error(f"SQL agent creation failed, trying without memory: {e}")
-                # Fallback without memory if it causes issues
-                agent = create_sql_agent(
-                    llm=llm,
-                    toolkit=toolkit,
-                    verbose=True,
-                    agent_type="openai-tools",
-                    prefix=system_prefix,
-                    handle_parsing_errors=True
-                )
+                cached_result = sql_cache.answer_from_cache(query, db._engine)
+            except Exception as cache_error:
+                logger.error(f"SQL cache lookup failed: {cache_error}")
+                cached_result = None
             
-            # Use memory-aware invocation
-            result = agent.invoke({"input": query})["output"]
+            if cached_result:
+                return _serve_cached_answer(cached_result, start_time)
             
-            # Get the captured SQL query and create DataFrame
-            query_info = db.get_last_query_info()
-            sql_query = query_info.get("query", "No SQL query captured")
+            # Use memory-aware invocation
+            result = _build_sql_agent(query).invoke({"input": query})["output"]
             
-            # Create DataFrame from the executed query if available
+            # Create DataFrame from the captured SQL query if available
             dataframe = None
-            if sql_query and sql_query != "No SQL query captured":
+            sql_query = db.get_last_query_info().get("query")
+            if sql_query:
                 try:
                     # Execute the same query to get DataFrame
-                    dataframe = pd.read_sql_query(sql_query, db._engine)
-                    logger.info(f"Created DataFrame from SQL query result: shape {dataframe.shape}")
+                    with timed_stage("sql_execution"):
+                        dataframe = pd.read_sql_query(sql_query, db._engine)
                 except Exception as df_error:
-                    logger.error(f"DataFrame creation failed for SQL query: {df_error}")
                     # If DataFrame creation fails, still return the text result
-                    pass
+                    logger.error(f"DataFrame creation failed for SQL query: {df_error}")
             
+            return _sql_agent_response(query, result, dataframe, start_time)
+            
+        except Exception as e:
             execution_time = time.time() - start_time
-            logger.info(f"Tool analyze_supply_chain_data completed successfully in {execution_time:.2f}s")
+            logger.error(f"Tool analyze_supply_chain_data failed for query '{query[:100]}': {e}")
             
-            # Return structured response
+            # Return error as text-only response
             return {
-                "type": "text_with_sql_and_dataframe",
-                "text": result,
-                "sql_query": sql_query,
-                "dataframe": dataframe
+                "type": "text",
+                "content": f"Error analyzing data: {str(e)}"
             }
+    
+    async def _aanalyze_supply_chain_data(query: str) -> Dict[str, Any]:
+        """Async analyze_supply_chain_data: awaits the SQL agent's LLM calls and reads the DataFrame without blocking"""
+        
+        start_time = time.time()
+        logger.info(f"Tool call (async): analyze_supply_chain_data with query: {query[:100]}")
+        
+        try:
+            db.clear_query_cache()
+            
+            canned_result = await asyncio.to_thread(_canned_answer, query, start_time)
+            if canned_result:
+                return canned_result
+            
+            try:
+                cached_result = await asyncio.to_thread(sql_cache.answer_from_cache, query, db._engine)
+            except Exception as cache_error:
+                logger.error(f"SQL cache lookup failed: {cache_error}")
+                cached_result = None
+            
+            if cached_result:
+                return _serve_cached_answer(cached_result, start_time)
+            
+            result = (await _build_sql_agent(query).ainvoke({"input": query}))["output"]
+            
+            dataframe = None
+            sql_query = db.get_last_query_info().get("query")
+            if sql_query:
+                try:
+                    dataframe = await read_sql_async(sql_query, db._engine)
+                except Exception as df_error:
+                    logger.error(f"DataFrame creation failed for SQL query: {df_error}")
+            
+            return _sql_agent_response(query, result, dataframe, start_time)
             
         except Exception as e:
-            execution_time = time.time() - start_time
             logger.error(f"Tool analyze_supply_chain_data failed for query '{query[:100]}': {e}")
-            
-            # Return error as text-only response
             return {
                 "type": "text",
                 "content": f"Error analyzing data: {str(e)}"
             }
     
+    analyze_supply_chain_data.coroutine = _aanalyze_supply_chain_data
+    
     @tool
     def execute_sql_for_chart(sql_query: str) -> Dict[str, Any]:
         """
@@ -222,7 +281,8 @@ Always provide actionable business insights considering operational costs, capac
                 sql_query = str(sql_query)
             
             # Execute the SQL query
-            df = pd.read_sql_query(sql_query, db._engine)
+            with timed_stage("sql_execution"):
+                df = pd.read_sql_query(sql_query, db._engine)
             
             execution_time = time.time() - start_time
             logger.info(f"Tool execute_sql_for_chart completed successfully: shape {df.shape} in {execution_time:.2f}s")
@@ -243,6 +303,34 @@ Always provide actionable business insights considering operational costs, capac
                 "message": f"Error executing SQL query: {str(e)}. Query was: {sql_query[:200]}..."
             }
     
+    async def _aexecute_sql_for_chart(sql_query: str) -> Dict[str, Any]:
+        """Async execute_sql_for_chart: reads through the async engine instead of blocking a thread"""
+        start_time = time.time()
+        logger.info(f"Tool call (async): execute_sql_for_chart with SQL: {str(sql_query)[:100]}")
+        
+        try:
+            sql_query = str(sql_query)
+            df = await read_sql_async(sql_query, db._engine)
+            
+            execution_time = time.time() - start_time
+            logger.info(f"Tool execute_sql_for_chart completed successfully: shape {df.shape} in {execution_time:.2f}s")
+            
+            return {
+                "type": "dataframe",
+                "data": df,
+                "sql_query": sql_query,
+                "shape": df.shape
+            }
+            
+        except Exception as e:
+            logger.error(f"Tool execute_sql_for_chart failed: {e}")
+            return {
+                "type": "error",
+                "message": f"Error executing SQL query: {str(e)}. Query was: {sql_query[:200]}..."
+            }
+    
+    execute_sql_for_chart.coroutine = _aexecute_sql_for_chart
+    
     @tool
     def create_bar_chart(
         data_query: str,
@@ -359,7 +447,7 @@ Always provide actionable business insights considering operational costs, capac
             
             return {
                 "type": "plotly",
-                "chart": fig.to_json(),  # Convert to JSON for LangGraph compatibility
+                "chart": fig,
                 "description": f"Bar chart: {title}"
             }
             
@@ -492,7 +580,7 @@ Always provide actionable business insights considering operational costs, capac
             
             return {
                 "type": "plotly",
-                "chart": fig.to_json(),  # Convert to JSON for LangGraph compatibility
+                "chart": fig,
                 "description": f"Line chart: {title}"
             }
             
@@ -611,7 +699,7 @@ Always provide actionable business insights considering operational costs, capac
             
             return {
                 "type": "plotly",
-                "chart": fig.to_json(),  # Convert to JSON for LangGraph compatibility
+                "chart": fig,
                 "description": f"Scatter plot: {title}"
             }
             
@@ -726,7 +814,7 @@ Always provide actionable business insights considering operational costs, capac
             
             return {
                 "type": "plotly", 
-                "chart": fig.to_json(),  # Convert to JSON for LangGraph compatibility
+                "chart": fig,
                 "description": f"Histogram: {title}"
             }
             
@@ -959,7 +1047,7 @@ Always provide actionable business insights considering operational costs, capac
             
             return {
                 "type": "plotly",
-                "chart": fig.to_json(),
+                "chart": fig,
                 "description": "Monthly transaction trends showing inbound vs outbound volumes over time"
             }
             
@@ -968,7 +1056,395 @@ Always provide actionable business insights considering operational costs, capac
             logger.error(f"Tool plot_monthly_transaction_trends failed: {e}")
             return {"type": "error", "message": f"Error creating monthly trends chart: {str(e)}"}
     
-    return (
+    @tool
+    def get_inventory_coverage(
+        plant_name: Optional[str] = None,
+        material_name: Optional[str] = None,
+        max_days_of_supply: Optional[float] = None,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Get precomputed days of supply, inventory turnover ratio and stock-out ETA per plant and material.
+        Use this instead of analyze_supply_chain_data for questions about:
+        - Days of supply / inventory coverage
+        - Inventory turnover
+        - When a material will run out of stock
+        
+        Args:
+            plant_name: Optional plant filter (e.g. 'CHINA-WAREHOUSE')
+            material_name: Optional material filter (e.g. 'MAT-0013')
+            max_days_of_supply: Optional upper bound on days of supply
+            limit: Maximum number of rows, sorted by ascending days of supply
+            
+        Returns:
+            Dict with SQL over the inventory_metrics table, DataFrame, and summary text
+        """
+        start_time = time.time()
+        logger.info(f"Tool call: get_inventory_coverage - plant={plant_name}, material={material_name}, max_dos={max_days_of_supply}")
+        
+        try:
+            df = inventory_metrics.get_metrics()
+            conditions = []
+            
+            if plant_name:
+                df = df[df["plant_name"] == plant_name]
+                conditions.append(f"plant_name = {_sql_literal(plant_name)}")
+            if material_name:
+                df = df[df["material_name"] == material_name]
+                conditions.append(f"material_name = {_sql_literal(material_name)}")
+            if max_days_of_supply is not None:
+                df = df[df["days_of_supply"] <= float(max_days_of_supply)]
+                conditions.append(f"days_of_supply <= {float(max_days_of_supply)}")
+            
+            limit = int(limit)
+            df = df.sort_values("days_of_supply", na_position="last").head(limit).reset_index(drop=True)
+            
+            sql_query = f"SELECT * FROM {INVENTORY_METRICS_TABLE}"
+            if conditions:
+                sql_query += " WHERE " + " AND ".join(conditions)
+            sql_query += f" ORDER BY days_of_supply ASC NULLS LAST LIMIT {limit}"
+            
+            # Make the result available to chart tools via data_query='use_last'
+            db.record_query(sql_query)
+            emit_event("dataframe", sql_query=sql_query, dataframe=df)
+            
+            if df.empty:
+                text = "No plant/material combinations match these coverage filters."
+            else:
+                lowest = df.iloc[0]
+                text = (
+                    f"{len(df)} plant/material rows (trailing {int(lowest['window_days'])}-day velocity). "
+                    f"Lowest coverage: {lowest['material_name']} at {lowest['plant_name']} with "
+                    f"{lowest['days_of_supply']:.1f} days of supply."
+                )
+            
+            execution_time = time.time() - start_time
+            logger.info(f"Tool get_inventory_coverage completed successfully: {len(df)} rows in {execution_time:.2f}s")
+            
+            return {
+                "type": "text_with_sql_and_dataframe",
+                "text": text,
+                "sql_query": sql_query,
+                "dataframe": df
+            }
+            
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.error(f"Tool get_inventory_coverage failed: {e}")
+            return {"type": "error", "message": f"Error getting inventory coverage: {str(e)}"}
+    
+    @tool
+    def find_low_stock_materials(plant_name: Optional[str] = None, limit: int = 20) -> Dict[str, Any]:
+        """
+        List materials with low stock levels: latest unrestricted stock covers fewer days than the
+        configured threshold at the recent outbound rate. Includes materials that are already out of stock.
+        Use this for "low stock", "running out" or "stock-out risk" questions.
+        
+        Args:
+            plant_name: Optional plant filter (e.g. 'SINGAPORE-WAREHOUSE')
+            limit: Maximum number of rows, most urgent first
+            
+        Returns:
+            Dict with SQL over the low_stock_index table, DataFrame, and summary text
+        """
+        start_time = time.time()
+        logger.info(f"Tool call: find_low_stock_materials - plant={plant_name}")
+        
+        try:
+            result = low_stock_index.query(plant_name=plant_name, limit=limit)
+            
+            # Make the result available to chart tools via data_query='use_last'
+            db.record_query(result["sql_query"])
+            emit_event("dataframe", sql_query=result["sql_query"], dataframe=result["dataframe"])
+            
+            execution_time = time.time() - start_time
+            logger.info(f"Tool find_low_stock_materials completed successfully: {len(result['dataframe'])} rows in {execution_time:.2f}s")
+            return result
+            
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.error(f"Tool find_low_stock_materials failed: {e}")
+            return {"type": "error", "message": f"Error finding low stock materials: {str(e)}"}
+    
+    @tool
+    def get_abc_xyz_classification(
+        entity: str = "material",
+        plant_name: Optional[str] = None,
+        abc_class: Optional[str] = None,
+        xyz_class: Optional[str] = None,
+        month: Optional[str] = None,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Get the ABC/XYZ classification of materials or customers per plant over the trailing 12 months.
+        ABC = cumulative outbound volume share (A: top 80%, B: next 15%, C: rest).
+        XYZ = coefficient of variation of monthly demand (X: stable <= 0.5, Y: <= 1.0, Z: erratic).
+        Use this for "which materials/customers drive volume" or "which are erratic" questions.
+        
+        Args:
+            entity: 'material' or 'customer'
+            plant_name: Optional plant filter (e.g. 'CHINA-WAREHOUSE')
+            abc_class: Optional filter, one of 'A', 'B', 'C'
+            xyz_class: Optional filter, one of 'X', 'Y', 'Z'
+            month: Optional last month of the history as 'YYYY-MM' (defaults to last complete month)
+            limit: Maximum number of rows, largest volume first
+            
+        Returns:
+            Dict with SQL over the abc_xyz_classification table, DataFrame, and summary text
+        """
+        start_time = time.time()
+        logger.info(f"Tool call: get_abc_xyz_classification - entity={entity}, plant={plant_name}, abc={abc_class}, xyz={xyz_class}, month={month}")
+        
+        try:
+            entity = str(entity).lower().rstrip("s")
+            df = abc_xyz.classify(entity, month)
+            conditions = [
+                f"month = {_sql_literal(df['month'].iloc[0] if not df.empty else month)}",
+                f"entity_type = {_sql_literal(entity)}"
+            ]
+            
+            if plant_name:
+                df = df[df["plant_name"] == plant_name]
+                conditions.append(f"plant_name = {_sql_literal(plant_name)}")
+            if abc_class:
+                df = df[df["abc_class"] == abc_class.upper()]
+                conditions.append(f"abc_class = {_sql_literal(abc_class.upper())}")
+            if xyz_class:
+                df = df[df["xyz_class"] == xyz_class.upper()]
+                conditions.append(f"xyz_class = {_sql_literal(xyz_class.upper())}")
+            
+            class_counts = df["abc_xyz_class"].value_counts().sort_index()
+            limit = int(limit)
+            df = df.sort_values("total_volume_mt", ascending=False).head(limit).reset_index(drop=True)
+            
+            sql_query = (
+                f"SELECT * FROM {ABC_XYZ_TABLE} WHERE " + " AND ".join(conditions)
+                + f" ORDER BY total_volume_mt DESC LIMIT {limit}"
+            )
+            
+            # Make the result available to chart tools via data_query='use_last'
+            db.record_query(sql_query)
+            emit_event("dataframe", sql_query=sql_query, dataframe=df)
+            
+            if class_counts.empty:
+                text = f"No {entity}s match these classification filters."
+            else:
+                counts = ", ".join(f"{cls}: {count}" for cls, count in class_counts.items())
+                text = f"{int(class_counts.sum())} {entity}s classified for the 12 months ending {df['month'].iloc[0]} ({counts})."
+            
+            execution_time = time.time() - start_time
+            logger.info(f"Tool get_abc_xyz_classification completed successfully: {len(df)} rows in {execution_time:.2f}s")
+            
+            return {
+                "type": "text_with_sql_and_dataframe",
+                "text": text,
+                "sql_query": sql_query,
+                "dataframe": df
+            }
+            
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.error(f"Tool get_abc_xyz_classification failed: {e}")
+            return {"type": "error", "message": f"Error getting ABC/XYZ classification: {str(e)}"}
+    
+    @tool
+    def find_customers_buying_materials(material_names: str) -> Dict[str, Any]:
+        """
+        Find customers who bought ALL of the given materials, with their outbound volume per material.
+        Use this for questions like "which customers buy both MAT-0013 and MAT-0045".
+        
+        Args:
+            material_names: Comma-separated material names (e.g. 'MAT-0013, MAT-0045')
+            
+        Returns:
+            Dict with DataFrame of matching customers or error message
+        """
+        start_time = time.time()
+        logger.info(f"Tool call: find_customers_buying_materials - {material_names}")
+        
+        try:
+            materials = [m.strip() for m in str(material_names).split(",") if m.strip()]
+            if not materials:
+                return {"type": "error", "message": "Provide at least one material name"}
+            
+            df = demand_matrix.customers_buying_all(materials)
+            total = len(df)
+            df = df.head(20)
+            
+            # The matrix is built from the outbound table; this query returns the same rows
+            volumes = [
+                f"SUM(CASE WHEN material_name = {_sql_literal(m)} THEN net_quantity_mt ELSE 0 END)" for m in materials
+            ]
+            sql_query = (
+                "SELECT customer_number, "
+                + ", ".join(f"{volume} AS \"{m}_mt\"" for volume, m in zip(volumes, materials))
+                + ", SUM(net_quantity_mt) AS total_mt FROM outbound"
+                + " WHERE outbound_date IS NOT NULL AND net_quantity_mt IS NOT NULL"
+                + f" AND material_name IN ({', '.join(_sql_literal(m) for m in materials)})"
+                + " GROUP BY customer_number HAVING " + " AND ".join(f"{volume} > 0" for volume in volumes)
+                + " ORDER BY total_mt DESC LIMIT 20"
+            )
+            
+            # Make the result available to chart tools via data_query='use_last'
+            db.record_query(sql_query)
+            emit_event("dataframe", sql_query=sql_query, dataframe=df)
+            
+            execution_time = time.time() - start_time
+            logger.info(f"Tool find_customers_buying_materials completed successfully: {total} customers in {execution_time:.2f}s")
+            
+            return {
+                "type": "text_with_sql_and_dataframe",
+                "text": f"{total} customers bought all of {', '.join(materials)} (top 20 by combined volume shown).",
+                "sql_query": sql_query,
+                "dataframe": df
+            }
+            
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.error(f"Tool find_customers_buying_materials failed: {e}")
+            return {"type": "error", "message": f"Error finding customers: {str(e)}"}
+    
+    @tool
+    def find_similar_customers(customer_number: str, k: int = 10) -> Dict[str, Any]:
+        """
+        Find the k customers with the most similar material purchasing mix (TF-IDF weighted cosine similarity).
+        Use this for questions like "customers similar to CST-00001".
+        
+        Args:
+            customer_number: Customer identifier (e.g. 'CST-00001')
+            k: Number of similar customers to return
+            
+        Returns:
+            Dict with DataFrame of similar customers or error message
+        """
+        start_time = time.time()
+        logger.info(f"Tool call: find_similar_customers - {customer_number} (k={k})")
+        
+        try:
+            customer_number = str(customer_number).strip()
+            df = demand_matrix.similar_customers(customer_number, int(k))
+            
+            # Similarity comes from the in-memory matrix; the query returns the neighbors with their scores and volumes
+            customers = ", ".join(_sql_literal(c) for c in df["customer_number"]) or "NULL"
+            scores = " ".join(f"WHEN {_sql_literal(c)} THEN {s}" for c, s in zip(df["customer_number"], df["similarity"]))
+            sql_query = (
+                "SELECT customer_number, "
+                + (f"CASE customer_number {scores} END" if scores else "NULL")
+                + " AS similarity, SUM(net_quantity_mt) AS total_mt FROM outbound"
+                + " WHERE outbound_date IS NOT NULL AND net_quantity_mt IS NOT NULL"
+                + f" AND customer_number IN ({customers}) GROUP BY customer_number ORDER BY similarity DESC"
+            )
+            
+            # Make the result available to chart tools via data_query='use_last'
+            db.record_query(sql_query)
+            emit_event("dataframe", sql_query=sql_query, dataframe=df)
+            
+            execution_time = time.time() - start_time
+            logger.info(f"Tool find_similar_customers completed successfully: {len(df)} neighbors in {execution_time:.2f}s")
+            
+            return {
+                "type": "text_with_sql_and_dataframe",
+                "text": f"Top {len(df)} customers similar to {customer_number} by material mix.",
+                "sql_query": sql_query,
+                "dataframe": df
+            }
+            
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.error(f"Tool find_similar_customers failed: {e}")
+            return {"type": "error", "message": f"Error finding similar customers: {str(e)}"}
+    
+    @tool
+    def compare_transport_costs(
+        group_by: str = "plant",
+        plant_name: Optional[str] = None,
+        month: Optional[str] = None,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Compare realized outbound transfer cost (Truck vs Marine) with the cost under the other mode
+        and the savings potential, all converted to USD. Costs are per 24.75 MT container.
+        Use this for transport mode cost, lane cost or "how much could we save by switching mode" questions.
+        
+        Args:
+            group_by: 'plant' (plant x mode), 'month' (month x plant x mode) or 'lane' (plant x customer x mode)
+            plant_name: Optional plant filter (e.g. 'CHINA-WAREHOUSE')
+            month: Optional month filter as 'YYYY-MM'
+            limit: Maximum number of rows, largest savings potential first
+            
+        Returns:
+            Dict with SQL over the transport_cost_rollup table, DataFrame, and summary text
+        """
+        start_time = time.time()
+        logger.info(f"Tool call: compare_transport_costs - group_by={group_by}, plant={plant_name}, month={month}")
+        
+        group_columns = {
+            "plant": ["plant_name", "mode_of_transport", "alternative_mode"],
+            "month": ["month", "plant_name", "mode_of_transport", "alternative_mode"],
+            "lane": ["plant_name", "customer_number", "mode_of_transport", "alternative_mode"],
+        }
+        value_columns = [
+            "shipments", "volume_mt", "containers",
+            "realized_cost_usd", "counterfactual_cost_usd", "savings_potential_usd"
+        ]
+        
+        try:
+            group_by = str(group_by).lower()
+            if group_by not in group_columns:
+                return {"type": "error", "message": f"Invalid group_by '{group_by}', use one of {list(group_columns)}"}
+            
+            df = transport_costs.get_rollup()
+            conditions = []
+            if plant_name:
+                df = df[df["plant_name"] == plant_name]
+                conditions.append(f"plant_name = {_sql_literal(plant_name)}")
+            if month:
+                df = df[df["month"] == month]
+                conditions.append(f"month = {_sql_literal(month)}")
+            
+            keys = group_columns[group_by]
+            limit = int(limit)
+            df = (
+                df.groupby(keys, as_index=False)[value_columns].sum()
+                .sort_values("savings_potential_usd", ascending=False)
+            )
+            totals = df[value_columns].sum()
+            df = df.head(limit).reset_index(drop=True)
+            
+            sql_query = (
+                f"SELECT {', '.join(keys)}, "
+                + ", ".join(f"SUM({col}) AS {col}" for col in value_columns)
+                + f" FROM {TRANSPORT_COST_TABLE}"
+                + (" WHERE " + " AND ".join(conditions) if conditions else "")
+                + f" GROUP BY {', '.join(keys)} ORDER BY savings_potential_usd DESC LIMIT {limit}"
+            )
+            
+            # Make the result available to chart tools via data_query='use_last'
+            db.record_query(sql_query)
+            emit_event("dataframe", sql_query=sql_query, dataframe=df)
+            
+            text = (
+                f"Realized transfer cost {totals['realized_cost_usd']:,.0f} USD for {totals['containers']:,.0f} containers; "
+                f"switching eligible shipments to the cheaper mode could save up to {totals['savings_potential_usd']:,.0f} USD "
+                f"(counterfactual assumes the other mode is available on the lane)."
+            )
+            
+            execution_time = time.time() - start_time
+            logger.info(f"Tool compare_transport_costs completed successfully: {len(df)} rows in {execution_time:.2f}s")
+            
+            return {
+                "type": "text_with_sql_and_dataframe",
+                "text": text,
+                "sql_query": sql_query,
+                "dataframe": df
+            }
+            
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.error(f"Tool compare_transport_costs failed: {e}")
+            return {"type": "error", "message": f"Error comparing transport costs: {str(e)}"}
+    
+    tools = (
         analyze_supply_chain_data,
         execute_sql_for_chart, 
         create_bar_chart,
@@ -976,5 +1452,15 @@ Always provide actionable business insights considering operational costs, capac
         create_scatter_plot,
         create_histogram,
         plot_monthly_transaction_trends,
-        analyze_existing_chart_data
-    )
\ No newline at end of file
+        analyze_existing_chart_data,
+        get_inventory_coverage,
+        find_low_stock_materials,
+        get_abc_xyz_classification,
+        find_customers_buying_materials,
+        find_similar_customers,
+        compare_transport_costs
+    )
+    
+    # The LLM gets a short summary; DataFrames and figures stay server-side as artifacts
+    token_budget = getattr(agent, "result_preview_tokens", RESULT_PREVIEW_TOKENS)
+    return tuple(with_artifacts(t, artifacts, token_budget) for t in tools)
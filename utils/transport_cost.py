@@ -0,0 +1,145 @@
+"""
+Transport Mode Cost Comparison Engine
+
+This module computes realized transfer cost of outbound shipments per lane
+(plant -> customer) and month, together with the counterfactual cost had the
+cheapest other mode of transport been used, and the resulting savings potential.
+
+Costs are per container (24.75 MT by default); each shipment line uses
+ceil(quantity / capacity) containers. Rates in different currencies are converted
+to USD with configurable FX rates. The rollup is cached per data version and
+published to the transport_cost_rollup table.
+"""
+
+import os
+import time
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from .warehouse_data import load_outbound, load_transfer_costs, cached_data_version
+
+TRANSPORT_COST_TABLE = "transport_cost_rollup"
+REPORT_CURRENCY = "USD"
+
+# Units of report currency per unit of currency; override with FX_RATES_TO_USD="SGD=0.74,CNY=0.14"
+DEFAULT_FX_RATES = {"USD": 1.0, "SGD": 0.74, "CNY": 0.14}
+
+
+def fx_rates_from_env() -> Dict[str, float]:
+    """Default FX rates updated with overrides from the FX_RATES_TO_USD environment variable"""
+    rates = dict(DEFAULT_FX_RATES)
+    for pair in os.environ.get("FX_RATES_TO_USD", "").split(","):
+        if "=" in pair:
+            currency, rate = pair.split("=", 1)
+            rates[currency.strip().upper()] = float(rate)
+    return rates
+
+
+def compute_transport_costs(
+    outbound: pd.DataFrame,
+    transfer_costs: pd.DataFrame,
+    fx_rates: Optional[Dict[str, float]] = None
+) -> pd.DataFrame:
+    """
+    Roll up realized vs counterfactual transfer cost per month x lane x mode.
+
+    Args:
+        outbound: Outbound rows from load_outbound()
+        transfer_costs: Rates from load_transfer_costs()
+        fx_rates: Currency -> report currency conversion rates
+
+    Returns:
+        DataFrame with shipments, volume, containers, realized and counterfactual cost
+        (in USD), the alternative mode and savings_potential_usd (>= 0)
+    """
+    fx_rates = fx_rates or DEFAULT_FX_RATES
+    rates = transfer_costs.copy()
+    missing = set(rates["currency"].str.upper()) - set(fx_rates)
+    if missing:
+        raise ValueError(f"No FX rate configured for: {', '.join(sorted(missing))}")
+    rates["cost_per_container_usd"] = rates["cost_per_container"] * rates["currency"].str.upper().map(fx_rates)
+    rates = rates.set_index("mode_of_transport")
+
+    modes = rates.index.to_numpy()
+    shipments = outbound[outbound["mode_of_transport"].isin(modes)]
+    unknown = len(outbound) - len(shipments)
+    if unknown:
+        logger.warning(f"Skipped {unknown} outbound rows with a mode of transport that has no transfer rate")
+
+    # Containers per shipment line under each mode (capacity may differ by mode)
+    quantity = shipments["net_quantity_mt"].to_numpy(dtype=np.float64)[:, None]
+    containers = np.ceil(quantity / rates["container_capacity_mt"].to_numpy()[None, :])
+    cost_by_mode = containers * rates["cost_per_container_usd"].to_numpy()[None, :]
+
+    actual = pd.Index(modes).get_indexer(shipments["mode_of_transport"])
+    rows = np.arange(len(shipments))
+    realized = cost_by_mode[rows, actual]
+
+    # Cheapest alternative mode for each shipment
+    alternatives = cost_by_mode.copy()
+    alternatives[rows, actual] = np.inf
+    best_alternative = alternatives.argmin(axis=1) if len(modes) > 1 else actual
+    counterfactual = alternatives[rows, best_alternative] if len(modes) > 1 else realized
+
+    detail = pd.DataFrame({
+        "month": shipments["outbound_date"].dt.strftime("%Y-%m").to_numpy(),
+        "plant_name": shipments["plant_name"].to_numpy(),
+        "customer_number": shipments["customer_number"].to_numpy(),
+        "mode_of_transport": shipments["mode_of_transport"].to_numpy(),
+        "alternative_mode": modes[best_alternative],
+        "volume_mt": quantity[:, 0],
+        "containers": containers[rows, actual],
+        "realized_cost_usd": realized,
+        "counterfactual_cost_usd": counterfactual,
+    })
+
+    keys = ["month", "plant_name", "customer_number", "mode_of_transport", "alternative_mode"]
+    rollup = detail.groupby(keys, as_index=False).agg(
+        shipments=("volume_mt", "size"),
+        volume_mt=("volume_mt", "sum"),
+        containers=("containers", "sum"),
+        realized_cost_usd=("realized_cost_usd", "sum"),
+        counterfactual_cost_usd=("counterfactual_cost_usd", "sum"),
+    )
+    rollup["savings_potential_usd"] = (rollup["realized_cost_usd"] - rollup["counterfactual_cost_usd"]).clip(lower=0)
+    return rollup
+
+
+class TransportCostEngine:
+    """Caches the transport cost rollup for the current data version"""
+
+    def __init__(self, engine, fx_rates: Optional[Dict[str, float]] = None, publish: bool = True):
+        self.engine = engine
+        self.fx_rates = fx_rates or fx_rates_from_env()
+        self.publish = publish
+        self.rollup: Optional[pd.DataFrame] = None
+        self._data_version: Optional[str] = None
+
+    def get_rollup(self) -> pd.DataFrame:
+        """Return the cached rollup, recomputing it when the data fingerprint changed"""
+        version = cached_data_version(self.engine)
+        if self.rollup is None or version != self._data_version:
+            start_time = time.time()
+            try:
+                self.rollup = compute_transport_costs(
+                    load_outbound(self.engine), load_transfer_costs(self.engine), self.fx_rates
+                )
+                self._data_version = version
+                if self.publish:
+                    self.rollup.to_sql(TRANSPORT_COST_TABLE, self.engine, if_exists="replace", index=False)
+                execution_time = time.time() - start_time
+                logger.info(f"Transport cost rollup computed: {len(self.rollup)} rows in {execution_time:.2f}s")
+            except Exception as e:
+                logger.error(f"Transport cost rollup failed: {e}")
+                raise
+        return self.rollup
+
+
+if __name__ == "__main__":
+    from .database import create_database_connection
+
+    db = create_database_connection()
+    rollup = TransportCostEngine(db._engine).get_rollup()
+    print(rollup.groupby(["plant_name", "mode_of_transport"])[["realized_cost_usd", "savings_potential_usd"]].sum())
@@ -0,0 +1,159 @@
+"""
+Warehouse Data Loading Module
+
+This module contains the shared loaders used by the precomputed analytics engines.
+Raw tables are pulled from the database once and normalized in pandas (date parsing,
+KG -> MT conversion) so every engine works on the same clean frames.
+
+Configure with DATA_VERSION_TTL_SECONDS (default 5; how long cached_data_version()
+reuses a data fingerprint before scanning the tables again).
+"""
+
+import os
+import time
+import weakref
+import threading
+from typing import Optional, Tuple
+import pandas as pd
+from sqlalchemy import text
+from loguru import logger
+
+# Unit conversions (see business rules in the SQL agent prompt)
+KG_PER_MT = 1000.0
+CONTAINER_CAPACITY_MT = 24.75
+
+# Transaction dates are stored as 'YYYY/MM/DD' text, which sorts chronologically
+TRANSACTION_DATE_FORMAT = "%Y/%m/%d"
+
+DATA_VERSION_TTL_SECONDS = float(os.environ.get("DATA_VERSION_TTL_SECONDS", "5"))
+
+# Last fingerprint read per engine, with the monotonic time it was read
+_versions: "weakref.WeakKeyDictionary[object, Tuple[str, float]]" = weakref.WeakKeyDictionary()
+_versions_lock = threading.Lock()
+
+
+def format_transaction_date(value) -> str:
+    """Format a date the way inbound/outbound dates are stored in the database"""
+    return pd.Timestamp(value).strftime(TRANSACTION_DATE_FORMAT)
+
+
+def load_outbound(engine, since: Optional[str] = None) -> pd.DataFrame:
+    """
+    Load outbound transactions with parsed dates.
+
+    Args:
+        engine: SQLAlchemy engine for the warehouse database
+        since: Optional 'YYYY/MM/DD' date; only rows on or after it are loaded
+
+    Returns:
+        DataFrame with outbound_date (datetime), plant_name, mode_of_transport,
+        material_name, customer_number and net_quantity_mt
+    """
+    sql_query = """
+    SELECT outbound_date, plant_name, mode_of_transport, material_name,
+           customer_number, net_quantity_mt
+    FROM outbound
+    WHERE outbound_date IS NOT NULL AND net_quantity_mt IS NOT NULL
+    """
+    params = {}
+    if since:
+        sql_query += " AND outbound_date >= :since"
+        params["since"] = since
+
+    df = pd.read_sql_query(text(sql_query), engine, params=params)
+    df["outbound_date"] = pd.to_datetime(df["outbound_date"], errors="coerce")
+    df = df.dropna(subset=["outbound_date"])
+    logger.debug(f"Loaded {len(df)} outbound rows (since={since})")
+    return df
+
+
+def load_inventory_snapshots(engine) -> pd.DataFrame:
+    """
+    Load inventory snapshots aggregated over batches per plant x material x date.
+
+    Returns:
+        DataFrame with balance_as_of_date (datetime), plant_name, material_name
+        and stock_mt (unrestricted stock converted from KG to MT)
+    """
+    sql_query = """
+    SELECT balance_as_of_date, plant_name, material_name,
+           SUM(unrestricted_stock) AS unrestricted_stock
+    FROM inventory
+    WHERE balance_as_of_date IS NOT NULL
+    GROUP BY balance_as_of_date, plant_name, material_name
+    """
+    df = pd.read_sql_query(sql_query, engine)
+    df["balance_as_of_date"] = pd.to_datetime(df["balance_as_of_date"], errors="coerce")
+    df = df.dropna(subset=["balance_as_of_date"])
+    df["stock_mt"] = df.pop("unrestricted_stock").fillna(0) / KG_PER_MT
+    logger.debug(f"Loaded {len(df)} aggregated inventory snapshot rows")
+    return df
+
+
+def latest_inventory(snapshots: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduce inventory snapshots to the latest snapshot of each plant.
+
+    Materials missing from a plant's latest snapshot are treated as out of stock
+    and are therefore not returned.
+    """
+    latest_dates = snapshots.groupby("plant_name")["balance_as_of_date"].transform("max")
+    latest = snapshots[snapshots["balance_as_of_date"] == latest_dates]
+    return latest[["plant_name", "material_name", "balance_as_of_date", "stock_mt"]].reset_index(drop=True)
+
+
+def data_version(engine) -> str:
+    """
+    Cheap fingerprint of the transactional tables.
+
+    Changes whenever rows are added to or removed from inbound/outbound/inventory
+    or inventory quantities are restated, so caches can detect stale data.
+    """
+    sql_query = """
+    SELECT
+        (SELECT COUNT(*) FROM inbound) AS inbound_rows,
+        (SELECT COUNT(*) FROM outbound) AS outbound_rows,
+        (SELECT MAX(outbound_date) FROM outbound) AS last_outbound_date,
+        (SELECT COUNT(*) FROM inventory) AS inventory_rows,
+        (SELECT SUM(unrestricted_stock) FROM inventory) AS inventory_total
+    """
+    with engine.connect() as conn:
+        row = conn.execute(text(sql_query)).one()
+    return "|".join(str(value) for value in row)
+
+
+def cached_data_version(engine, ttl_seconds: float = DATA_VERSION_TTL_SECONDS) -> str:
+    """
+    data_version() reused for up to ttl_seconds per engine.
+
+    data_version() scans the transactional tables, so checks on the request path
+    (cache hits, precomputed engines, request coalescing) share one recent reading
+    instead of running the aggregates on every request.
+    """
+    now = time.monotonic()
+    with _versions_lock:
+        cached = _versions.get(engine)
+    if cached is not None and now - cached[1] <= ttl_seconds:
+        return cached[0]
+    version = data_version(engine)
+    with _versions_lock:
+        _versions[engine] = (version, now)
+    return version
+
+
+def load_transfer_costs(engine) -> pd.DataFrame:
+    """
+    Load per-container transfer costs by mode of transport.
+
+    Returns:
+        DataFrame with mode_of_transport, cost_per_container, currency, container_capacity_mt
+    """
+    sql_query = """
+    SELECT entity_name AS mode_of_transport, cost_amount AS cost_per_container,
+           currency, container_capacity_mt
+    FROM operation_costs
+    WHERE cost_type LIKE 'Transfer%'
+    """
+    df = pd.read_sql_query(sql_query, engine)
+    df["container_capacity_mt"] = df["container_capacity_mt"].fillna(CONTAINER_CAPACITY_MT)
+    return df